@@ -4,7 +4,7 @@ import pandas as pd
 import plotly.graph_objects as go
 
 # BARU: Ganti import data_loader dengan elastic_client
-from src import config, styles, elastic_client as es
+from src import config, styles, elastic_client as es, prefetch
 from src.components.sidebar import render  # Ganti dengan sidebar dinamis
 
 
@@ -30,13 +30,14 @@ def main():
 
     # GANTI: sidebar.render_sidebar(df_all) menjadi render()
     # Tidak ada lagi df_all atau df_filtered, semua kalkulasi dilakukan di ES
-    filters = render()
+    # Ringkasan kecamatan anak di-prefetch setelah kabupaten dipilih
+    filters = render(prefetch_view=prefetch.summary_view)
     st.session_state["filters"] = filters
 
     # --- BARU: Pengambilan Data Terpusat dari Elasticsearch ---
     try:
         with st.spinner("Mengambil dan memproses data dari Elasticsearch..."):
-            summary_data = es.get_main_page_summary(filters)
+            summary_data = es.get_cached_main_page_summary(filters, es.get_accuracy())
     except Exception as e:
         st.error(f"Terjadi kesalahan saat mengambil data: {e}")
         st.stop()
@@ -53,6 +54,13 @@ def main():
     # --- GANTI: Sumber data KPI menggunakan hasil dari ES ---
     kpi_data = summary_data["kpi"]
     chart_data = summary_data["charts"]
+    meta = summary_data.get("meta", {})
+    approx = "≈ " if meta.get("approximate") else ""
+    if approx:
+        st.caption(
+            f"≈ Angka perkiraan dari sampel acak ({meta['sampling_probability']:.1%} dokumen). "
+            "Aktifkan **Hitung tepat** di sidebar untuk angka pasti."
+        )
 
     total_bayi_lahir = kpi_data["total_bayi_lahir"]
     total_bayi_stunting = kpi_data["total_bayi_stunting"]
@@ -70,7 +78,7 @@ def main():
         )
         st.metric(
             "Total Bayi Stunting / Total Bayi Lahir",
-            f"{total_bayi_stunting:,} / {total_bayi_lahir:,}",
+            f"{approx}{total_bayi_stunting:,} / {total_bayi_lahir:,}",
             label_visibility="hidden",
         )
         st.markdown(
@@ -157,7 +165,9 @@ def main():
             """<div class="metric-card"><div class="metric-card-title">Cakupan Imunisasi</div>""",
             unsafe_allow_html=True,
         )
-        st.metric("Cakupan Imunisasi", f"{imun_cov:.1f}%", label_visibility="hidden")
+        st.metric(
+            "Cakupan Imunisasi", f"{approx}{imun_cov:.1f}%", label_visibility="hidden"
+        )
         st.markdown(
             '<div class="small-muted">indikator kunci SSGI</div></div>',
             unsafe_allow_html=True,
@@ -192,7 +202,9 @@ def main():
             """<div class="metric-card"><div class="metric-card-title">Akses Air Layak</div>""",
             unsafe_allow_html=True,
         )
-        st.metric("Akses Air Layak", f"{air_cov:.1f}%", label_visibility="hidden")
+        st.metric(
+            "Akses Air Layak", f"{approx}{air_cov:.1f}%", label_visibility="hidden"
+        )
         st.markdown(
             '<div class="small-muted">sektor WASH</div></div>', unsafe_allow_html=True
         )
@@ -1,85 +1,47 @@
 import streamlit as st
-import os
-import json
-import openai  # Mengganti requests dengan library resmi OpenAI
-from src import styles, elastic_client as es
+from typing import Iterable
+from src import styles, llm_client, insight_engine, insight_tools
 from src.components import sidebar
 
-
-# --- FUNGSI AKSES LLM (DI-UPGRADE KE OPENAI) ---
-def _get_openai_api_key():
-    # Mencari OPENAI_API_KEY
-    env_key = os.getenv("OPENAI_API_KEY", "")
-    if env_key:
-        return env_key
-    try:
-        return st.secrets.get("OPENAI_API_KEY", "")
-    except Exception:
-        return ""
+# Jumlah pesan yang disimpan untuk tampilan (riwayat prompt diatur oleh InsightConversation)
+MAX_DISPLAYED_MESSAGES = 40
 
 
-def get_ai_insight(filters: dict, user_question: str) -> str:
+# --- FUNGSI AKSES LLM (STREAMING) ---
+def get_ai_insight(
+    filters: dict,
+    user_question: str,
+    conversation: insight_engine.InsightConversation,
+    use_tools: bool = False,
+) -> Iterable[str]:
     """
-    Menghasilkan insight dari AI berdasarkan data agregat yang terfilter dan pertanyaan pengguna.
+    Menghasilkan insight dari AI berdasarkan data agregat yang terfilter, riwayat
+    percakapan yang dibatasi, dan pertanyaan pengguna.
+    Jawaban dikembalikan sebagai stream potongan teks untuk `st.write_stream`.
+    Dengan `use_tools`, model mengambil sendiri agregat yang dibutuhkan lewat tool.
     """
-    api_key = _get_openai_api_key()
-    if not api_key:
-        return "**Insight AI tidak tersedia.** `OPENAI_API_KEY` belum diatur."
+    if not llm_client.get_api_key():
+        return ["**Insight AI tidak tersedia.** `OPENAI_API_KEY` belum diatur."]
 
-    try:
-        client = openai.OpenAI(api_key=api_key)
-    except Exception as e:
-        return f"Gagal menginisialisasi client OpenAI: {e}"
+    if use_tools:
+        messages = insight_tools.build_tool_messages(
+            filters, conversation, user_question
+        )
+        return insight_tools.ToolCallingStream(messages, filters, timeout=60)
 
-    # 1. Tarik data ringkasan dari Elasticsearch berdasarkan filter
+    # 1. Konteks ringkasan (di-cache per fingerprint filter)
     try:
         with st.spinner("Mengumpulkan data ringkasan dari server..."):
-            summary_data = es.get_main_page_summary(filters)
-            summary_data.pop(
-                "charts", None
-            )  # Hapus data yang tidak relevan untuk prompt
-            summary_json = json.dumps(summary_data, indent=2, ensure_ascii=False)
+            context = insight_engine.get_summary_context(filters)
     except Exception as e:
         st.error(f"Gagal mengambil data ringkasan dari Elasticsearch: {e}")
-        return "Gagal memproses permintaan karena tidak bisa mengambil data."
-
-    # 2. Buat prompt yang kuat, terinspirasi dari beta.py
-    prompt = f"""
-    Anda adalah seorang analis data kesehatan masyarakat senior yang ahli dalam analisis stunting di Jawa Barat.
-    Anda sedang melihat dasbor data yang sudah difilter.
+        return ["Gagal memproses permintaan karena tidak bisa mengambil data."]
 
-    **Konteks Filter Aktif:**
-    {json.dumps(filters, indent=2)}
+    # 2. Susun prompt dari konteks + jendela riwayat + pertanyaan baru
+    messages = conversation.build_messages(context, user_question)
 
-    **Ringkasan Data (KPI) dari Wilayah Terfilter:**
-    ```json
-    {summary_json}
-    ```
-
-    **Tugas Anda:**
-    Berdasarkan **HANYA PADA DATA RINGKASAN DI ATAS**, jawab pertanyaan dari atasan Anda.
-    Jawaban harus singkat, padat, berbasis data, dan langsung ke intinya. Gunakan format Markdown untuk poin-poin jika perlu.
-
-    **Pertanyaan Atasan:** "{user_question}"
-    """
-
-    # 3. Panggil API OpenAI
-    try:
-        with st.spinner("AI sedang menganalisis data dan menyusun jawaban..."):
-            response = client.chat.completions.create(
-                model="gpt-4.1-nano",  # Menggunakan model yang diminta
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Anda adalah seorang analis data kesehatan masyarakat senior di Jawa Barat.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                timeout=60,
-            )
-            return response.choices[0].message.content
-    except Exception as e:
-        return f"Gagal menghubungi server OpenAI. Mohon coba lagi nanti. Error: {e}"
+    # 3. Panggil API OpenAI dalam mode streaming
+    return llm_client.ChatStream(messages, label="insightnow", timeout=60)
 
 
 # --- RENDER HALAMAN ---
@@ -90,9 +52,17 @@ def render_page():
     )
 
     main_filters = sidebar.render()
+    use_tools = st.toggle(
+        "Mode tool-calling",
+        value=True,
+        help="AI hanya mengambil agregat yang relevan (tren, per kecamatan, top wilayah) sesuai pertanyaan.",
+    )
 
     if "insight_messages" not in st.session_state:
         st.session_state.insight_messages = []
+    if "insight_conversation" not in st.session_state:
+        st.session_state.insight_conversation = insight_engine.InsightConversation()
+    conversation = st.session_state.insight_conversation
 
     for message in st.session_state.insight_messages:
         with st.chat_message(message["role"]):
@@ -106,12 +76,19 @@ def render_page():
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            response = get_ai_insight(main_filters, prompt)
-            st.markdown(response)
+            stream = get_ai_insight(main_filters, prompt, conversation, use_tools)
+            response = st.write_stream(stream)
+            streamed = hasattr(stream, "metrics")
+            if streamed:
+                st.caption(stream.metrics.caption())
 
         st.session_state.insight_messages.append(
             {"role": "assistant", "content": response}
         )
+        del st.session_state.insight_messages[:-MAX_DISPLAYED_MESSAGES]
+        if streamed and not stream.metrics.error:
+            conversation.add("user", prompt)
+            conversation.add("assistant", response)
 
 
 # --- Main Execution ---
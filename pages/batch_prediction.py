@@ -0,0 +1,151 @@
+import streamlit as st
+import pandas as pd
+import time
+from datetime import datetime
+from src import prediction_service, styles, zscore
+
+# Kolom opsional antropometri anak: bila ada, z-score TB/U & BB/U WHO ikut dihitung
+ANTHRO_COLUMNS = {
+    "age": "usia_anak_bulan",
+    "sex": "jenis_kelamin",
+    "height": "tinggi_badan_anak_cm",
+    "weight": "berat_badan_anak_kg",
+}
+
+
+def _with_child_zscores(raw_df: pd.DataFrame, valid_df: pd.DataFrame) -> pd.DataFrame:
+    """Menggabungkan kolom antropometri + z-score WHO ke baris valid (jika tersedia)."""
+    if not {ANTHRO_COLUMNS["age"], ANTHRO_COLUMNS["sex"]}.issubset(raw_df.columns):
+        return valid_df
+    cols = [c for c in ANTHRO_COLUMNS.values() if c in raw_df.columns]
+    anthro = zscore.add_zscores(
+        raw_df.loc[valid_df.index, cols],
+        ANTHRO_COLUMNS["age"],
+        ANTHRO_COLUMNS["sex"],
+        height_col=ANTHRO_COLUMNS["height"],
+        weight_col=ANTHRO_COLUMNS["weight"],
+    )
+    return valid_df.join(anthro)
+
+
+def _template_csv() -> bytes:
+    """Contoh file input berisi header 18 kolom dan satu baris contoh."""
+    example = {
+        "tinggi_badan_ibu_cm": 155,
+        "lila_saat_hamil_cm": 25.0,
+        "bmi_pra_hamil": 22.0,
+        "hb_g_dl": 11.0,
+        "kenaikan_bb_hamil_kg": 12,
+        "usia_ibu_saat_hamil_tahun": 28,
+        "jarak_kehamilan_sebelumnya_bulan": 24,
+        "kunjungan_anc_x": 4,
+        "jumlah_anak": 1,
+        "kepatuhan_ttd": "Rutin",
+        "pendidikan_ibu": "SMA",
+        "jenis_pekerjaan_orang_tua": "Wiraswasta",
+        "status_pernikahan": "Menikah",
+        "kepesertaan_program_bantuan": "Tidak",
+        "akses_air_bersih": "Ya",
+        "paparan_asap_rokok": "Tidak",
+        "hipertensi_ibu": 0,
+        "diabetes_ibu": 0,
+    }
+    df = pd.DataFrame([example])[prediction_service.INPUT_FIELDS]
+    return df.to_csv(index=False).encode("utf-8")
+
+
+# --- RENDER HALAMAN ---
+def render_page():
+    pipeline = prediction_service.load_pipeline()
+
+    st.subheader("Prediksi Risiko Stunting – Mode Batch")
+    st.caption(
+        "Unggah register ibu hamil (CSV/Parquet) dengan 18 kolom yang sama seperti form prediksi individual. "
+        "Kolom opsional `usia_anak_bulan`, `jenis_kelamin`, `tinggi_badan_anak_cm`, `berat_badan_anak_kg` "
+        "menambahkan z-score TB/U & BB/U (standar WHO) ke hasil."
+    )
+
+    if not pipeline:
+        st.error(
+            "Gagal memuat pipeline prediksi. Mohon periksa file 'models/stunting_pipeline.joblib'."
+        )
+        return
+
+    st.download_button(
+        "📄 Unduh Template CSV",
+        _template_csv(),
+        "template_prediksi_batch.csv",
+        "text/csv",
+    )
+
+    uploaded = st.file_uploader("File Register", type=["csv", "parquet"])
+    if uploaded is None:
+        return
+
+    try:
+        with st.spinner("Membaca dan memvalidasi file..."):
+            raw_df = prediction_service.read_batch_file(uploaded)
+            valid_df, errors_df = prediction_service.validate_batch(raw_df)
+            valid_df = _with_child_zscores(raw_df, valid_df)
+    except ImportError:
+        st.error("Membaca Parquet membutuhkan paket `pyarrow`.")
+        return
+    except Exception as e:
+        st.error(f"File tidak dapat diproses: {e}")
+        return
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Total Baris", f"{len(raw_df):,}")
+    c2.metric("Baris Valid", f"{len(valid_df):,}")
+    c3.metric("Baris Tidak Valid", f"{len(raw_df) - len(valid_df):,}")
+
+    if not errors_df.empty:
+        with st.expander("Lihat detail baris tidak valid"):
+            st.dataframe(errors_df.head(1000), use_container_width=True)
+
+    if not valid_df.empty and st.button("🔬 Jalankan Prediksi Batch"):
+        progress = st.progress(0.0, text="Menjalankan prediksi...")
+        parts, done = [], 0
+        started = time.perf_counter()
+        chunks = prediction_service.predict_batch(pipeline, valid_df)
+        try:
+            for part in prediction_service.batch_results_to_csv(chunks):
+                parts.append(part)
+                done = min(len(valid_df), done + prediction_service.BATCH_CHUNK_SIZE)
+                progress.progress(
+                    done / len(valid_df), text=f"{done:,} / {len(valid_df):,} baris"
+                )
+        except Exception as e:
+            st.error(f"Gagal melakukan prediksi: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        progress.empty()
+        # Simpan di session state agar tombol unduh tetap ada setelah rerun
+        st.session_state.batch_result = {
+            "file": uploaded.name,
+            "csv": b"".join(parts),
+            "rows": len(valid_df),
+            "elapsed": elapsed,
+        }
+
+    result = st.session_state.get("batch_result")
+    if result and result["file"] == uploaded.name:
+        st.success(
+            f"{result['rows']:,} baris selesai diprediksi dalam {result['elapsed']:.2f} dtk "
+            f"({result['rows'] / max(result['elapsed'], 1e-9) * 60:,.0f} baris/menit)."
+        )
+        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            "⬇️ Unduh Hasil Prediksi (CSV)",
+            result["csv"],
+            f"stuntlytics_prediksi_batch_{now_str}.csv",
+            "text/csv",
+        )
+
+
+# --- Main Execution ---
+if "page_config_set" not in st.session_state:
+    st.set_page_config(layout="wide")
+    st.session_state.page_config_set = True
+styles.load_css()
+render_page()
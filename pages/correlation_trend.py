@@ -3,8 +3,8 @@ import pandas as pd
 import plotly.express as px
 import os
 import openai
-from src import styles, elastic_client as es
-from src.components import sidebar
+from src import styles, correlation, sampling, elastic_client as es
+from src.components import sampling_controls, sidebar
 
 
 # --- FUNGSI BARU UNTUK INSIGHT AI ---
@@ -119,10 +119,24 @@ def generate_ai_insight(
 def render_page():
     st.subheader("Tren & Korelasi – Analitik Pendukung Kebijakan")
     filters = sidebar.render()
+    plan = sampling_controls.render("corr", kind="correlation")
 
+    sample = None
     try:
         df_trend = es.get_monthly_trend(filters)
-        df_corr_sample = es.get_numeric_sample_for_corr(filters)
+        if plan is None:
+            df_corr = correlation.target_correlations(filters)
+        else:
+            fields = correlation.numeric_fields()
+            sample = sampling.draw(
+                es.build_query(filters)["query"],
+                plan,
+                [correlation.TARGET_FIELD] + fields,
+                stratum_field=filters.get("wilayah_field") or sampling.STRATUM_FIELD,
+            )
+            df_corr = sampling.sample_correlations(
+                sample, correlation.TARGET_FIELD, fields
+            )
     except Exception as e:
         st.error(f"Gagal mengambil data dari Elasticsearch: {e}")
         return
@@ -133,69 +147,77 @@ def render_page():
         if not df_trend.empty:
             # Menggunakan df_trend langsung karena sudah memiliki index yang benar
             st.line_chart(df_trend)
+            if df_trend.attrs.get("approximate"):
+                st.caption("≈ Perkiraan dari sampel acak (mode interaktif).")
         else:
             st.warning("Data tren tidak tersedia untuk filter saat ini.")
 
     with c2:
         st.markdown("**Faktor Paling Berpengaruh (Korelasi thd Z-Score)**")
-        target_col = "ZScore TB/U"
-
-        # Inisialisasi corr_risk untuk memastikan variabel ada
-        corr_risk = pd.Series(dtype=float)
-
-        if (
-            not df_corr_sample.empty
-            and target_col in df_corr_sample.columns
-            and df_corr_sample.shape[1] > 1
-        ):
+        # Mode tepat: seluruh dokumen terfilter (src/correlation.py);
+        # mode sampel: sampel acak + interval kepercayaan (src/sampling.py)
+        corr_risk = df_corr["korelasi"]
+
+        if not corr_risk.empty and sample is not None:
+            top = df_corr.loc[corr_risk.abs().nlargest(6).index].iloc[::-1]
+            top = top.reset_index()
+            fig = px.bar(
+                top,
+                x="korelasi",
+                y="faktor",
+                orientation="h",
+                error_x=top["atas"] - top["korelasi"],
+                error_x_minus=top["korelasi"] - top["bawah"],
+                template="plotly_dark",
+                title="Korelasi terhadap Z-Score TB/U (estimasi sampel)",
+                labels={"korelasi": "Korelasi", "faktor": "Faktor"},
+                range_x=[-1, 1],
+            )
+            fig.update_traces(marker_color="rgba(239, 68, 68, 0.8)")
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(
+                f"Estimasi dari sampel acak {sample.size:,} dari {sample.population:,} dokumen; "
+                f"garis galat = interval kepercayaan {plan.confidence:.0%} (Fisher)."
+            )
+        elif not corr_risk.empty:
             try:
-                corr = df_corr_sample.corr(numeric_only=True)
-                if target_col in corr:
-                    corr_risk = corr[target_col].drop(target_col, errors="ignore")
-                    if not corr_risk.empty:
-                        top_features = corr_risk.abs().nlargest(6)
-                        top_corr_values = corr_risk.loc[top_features.index]
-                        df_radar = pd.DataFrame(
-                            {
-                                "Faktor": top_corr_values.index,
-                                "Korelasi Asli": top_corr_values.values,
-                                "Kekuatan Korelasi": top_corr_values.abs().values,
-                            }
-                        )
-
-                        fig = px.line_polar(
-                            df_radar,
-                            r="Kekuatan Korelasi",
-                            theta="Faktor",
-                            line_close=True,
-                            template="plotly_dark",
-                            title="Kekuatan Pengaruh Faktor terhadap Z-Score TB/U",
-                            range_r=[0, 1],
-                        )
-                        fig.update_traces(
-                            fill="toself",
-                            fillcolor="rgba(239, 68, 68, 0.3)",
-                            line=dict(color="rgba(239, 68, 68, 0.8)"),
-                            hovertemplate="<b>%{theta}</b><br>Kekuatan: %{r:.2f}<br>Korelasi Asli: %{customdata[0]:.2f}<extra></extra>",
-                            customdata=df_radar[["Korelasi Asli"]],
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                        st.caption(
-                            "Menunjukkan **kekuatan** pengaruh. Semakin rendah Z-Score, semakin tinggi risiko stunting."
-                        )
-                    else:
-                        st.warning(
-                            "Tidak ada cukup fitur lain untuk menghitung korelasi."
-                        )
-                else:
-                    st.warning(
-                        f"Kolom target '{target_col}' tidak dapat dihitung korelasinya (kemungkinan nilainya konstan)."
-                    )
+                top_features = corr_risk.abs().nlargest(6)
+                top_corr_values = corr_risk.loc[top_features.index]
+                df_radar = pd.DataFrame(
+                    {
+                        "Faktor": top_corr_values.index,
+                        "Korelasi Asli": top_corr_values.values,
+                        "Kekuatan Korelasi": top_corr_values.abs().values,
+                    }
+                )
+
+                fig = px.line_polar(
+                    df_radar,
+                    r="Kekuatan Korelasi",
+                    theta="Faktor",
+                    line_close=True,
+                    template="plotly_dark",
+                    title="Kekuatan Pengaruh Faktor terhadap Z-Score TB/U",
+                    range_r=[0, 1],
+                )
+                fig.update_traces(
+                    fill="toself",
+                    fillcolor="rgba(239, 68, 68, 0.3)",
+                    line=dict(color="rgba(239, 68, 68, 0.8)"),
+                    hovertemplate="<b>%{theta}</b><br>Kekuatan: %{r:.2f}<br>Korelasi Asli: %{customdata[0]:.2f}<extra></extra>",
+                    customdata=df_radar[["Korelasi Asli"]],
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption(
+                    "Menunjukkan **kekuatan** pengaruh. Semakin rendah Z-Score, semakin tinggi risiko stunting. "
+                    f"Dihitung dari seluruh data terfilter (hingga {int(df_corr['n'].max()):,} pasangan nilai per faktor)."
+                )
             except Exception as e:
                 st.error(f"Gagal menghitung korelasi: {e}")
         else:
             st.warning(
-                "Data tidak cukup untuk menghitung korelasi dengan filter saat ini."
+                f"Korelasi terhadap '{correlation.TARGET_FIELD}' tidak dapat dihitung dengan filter saat ini "
+                "(data kosong atau nilainya konstan)."
             )
 
     # --- BAGIAN BARU: INSIGHT OTOMATIS AI ---
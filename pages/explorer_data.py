@@ -6,9 +6,9 @@ import os
 import openai
 import json
 
-from src import styles
+from src import styles, sampling
 from src import elastic_client as es
-from src.components import sidebar
+from src.components import sampling_controls, sidebar
 
 
 # --- FUNGSI BARU UNTUK INSIGHT AI ---
@@ -22,11 +22,10 @@ def _get_openai_api_key():
         return ""
 
 
-def generate_ai_summary(
-    main_filters: dict, advanced_filters: dict, df: pd.DataFrame
-) -> str:
+def generate_ai_summary(main_filters: dict, advanced_filters: dict, stats: dict) -> str:
     """
-    Menghasilkan ringkasan cerdas dari AI berdasarkan data yang ditampilkan di explorer.
+    Menghasilkan ringkasan cerdas dari AI berdasarkan statistik distribusi
+    seluruh data terfilter (es.get_explorer_distribution).
     """
     api_key = _get_openai_api_key()
     if not api_key:
@@ -37,32 +36,30 @@ def generate_ai_summary(
     except Exception as e:
         return f"Gagal menginisialisasi client OpenAI: {e}"
 
-    # --- Merangkum DataFrame menjadi statistik untuk prompt ---
-    if df.empty:
+    # --- Statistik seluruh data terfilter untuk prompt ---
+    if not stats["total"]:
         return "Tidak ada data untuk dianalisis."
 
     summary = {
-        "Jumlah Data Terfilter": len(df),
-        "Statistik Z-Score": df["Z-Score"].describe().to_dict(),
-        "Distribusi Pendidikan Ibu (%)": (
-            df["Pendidikan Ibu"].value_counts(normalize=True) * 100
-        )
-        .round(2)
-        .to_dict(),
-        "Distribusi ASI Eksklusif (%)": (
-            df["ASI Eksklusif"].value_counts(normalize=True) * 100
-        )
-        .round(2)
-        .to_dict(),
-        "Distribusi Akses Air Bersih (%)": (
-            df["Akses Air Bersih"].value_counts(normalize=True) * 100
-        )
-        .round(2)
-        .to_dict(),
-        "Rata-rata Usia Anak (bulan)": round(df["Usia Anak (bulan)"].mean(), 1),
-        "Rata-rata BMI Pra-Hamil": round(df["BMI Pra-Hamil"].mean(), 2)
-        if "BMI Pra-Hamil" in df.columns
-        else "N/A",
+        "Jumlah Data Terfilter": stats["total"],
+        "Statistik Z-Score": {
+            k: round(v, 3) if isinstance(v, float) else v
+            for k, v in stats["zscore"].items()
+        },
+        **{
+            f"Distribusi {field} (%)": dist
+            for field, dist in stats["distribusi"].items()
+        },
+        "Rata-rata Usia Anak (bulan)": (
+            round(stats["rata_usia_bulan"], 1)
+            if stats["rata_usia_bulan"] is not None
+            else "N/A"
+        ),
+        "Rata-rata BMI Pra-Hamil": (
+            round(stats["rata_bmi_pra_hamil"], 2)
+            if stats["rata_bmi_pra_hamil"] is not None
+            else "N/A"
+        ),
     }
     summary_json = json.dumps(summary, indent=2, ensure_ascii=False)
 
@@ -100,6 +97,43 @@ def generate_ai_summary(
         return f"Gagal menghubungi server OpenAI: {e}"
 
 
+def _render_distribution_header(stats: dict):
+    """Ringkasan seluruh data terfilter di atas tabel."""
+    z = stats["zscore"]
+
+    def fmt(v, pattern):
+        return pattern.format(v) if v is not None else "-"
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Data Terfilter", f"{stats['total']:,}")
+    m2.metric("Rata-rata Z-Score TB/U", fmt(z["mean"], "{:.2f}"))
+    m3.metric("Median Z-Score (Q1–Q3)", fmt(z["50%"], "{:.2f}"))
+    m3.caption(f"{fmt(z['25%'], '{:.2f}')} s.d. {fmt(z['75%'], '{:.2f}')}")
+    m4.metric("Rata-rata Usia Anak", fmt(stats["rata_usia_bulan"], "{:.1f} bln"))
+
+
+def _sample_prevalence_chart(sample: sampling.Sample):
+    """Estimasi prevalensi stunting per kabupaten/kota beserta error bar."""
+    per_stratum = sampling.prevalence_by_stratum(sample)
+    if len(per_stratum) < 2:
+        return None
+    df_plot = (per_stratum[["estimasi", "bawah", "atas"]] * 100).round(2)
+    df_plot = df_plot.sort_values("estimasi").reset_index(names="Wilayah")
+    st.markdown("##### Estimasi Prevalensi Stunting per Kabupaten/Kota")
+    fig = px.bar(
+        df_plot,
+        x="estimasi",
+        y="Wilayah",
+        orientation="h",
+        error_x=df_plot["atas"] - df_plot["estimasi"],
+        error_x_minus=df_plot["estimasi"] - df_plot["bawah"],
+        labels={"estimasi": "Prevalensi (%)"},
+        height=max(320, 24 * len(df_plot)),
+    )
+    fig.update_traces(marker_color="#3b82f6")
+    return fig
+
+
 # --- RENDER HALAMAN ---
 def render_page():
     # --- Sidebar & Filter Utama ---
@@ -130,14 +164,55 @@ def render_page():
         )
 
     advanced_filters = {"pendidikan_ibu": edu, "asi_eksklusif": asi, "akses_air": air}
+    plan = sampling_controls.render(
+        "explorer", kind="proportion", exact_label="1.000 data paling berisiko"
+    )
 
     # --- Pengambilan Data & Tampilan Tabel ---
     try:
-        df_explorer = es.get_explorer_data(main_filters, advanced_filters, size=1000)
-
-        st.caption(
-            "Menampilkan hingga 1.000 data teratas yang paling berisiko. Gunakan fitur ekspor di bawah untuk mengunduh data lebih lengkap."
-        )
+        sample = None
+        # Statistik seluruh data terfilter (header tabel & prompt AI)
+        dist_stats = es.get_explorer_distribution(main_filters, advanced_filters)
+        if plan is None:
+            df_explorer = es.get_explorer_data(
+                main_filters, advanced_filters, size=1000
+            )
+            _render_distribution_header(dist_stats)
+            st.caption(
+                "Statistik di atas dihitung dari seluruh data terfilter. Tabel menampilkan hingga 1.000 data teratas yang paling berisiko. Gunakan fitur ekspor di bawah untuk mengunduh data lebih lengkap."
+            )
+        else:
+            sample = sampling.draw(
+                es.build_explorer_query(main_filters, advanced_filters)["query"],
+                plan,
+                es.EXPLORER_FIELDS,
+                stratum_field=main_filters.get("wilayah_field")
+                or sampling.STRATUM_FIELD,
+            )
+            df_explorer = sample.df.drop(columns=["_strata", "_bobot"]).rename(
+                columns=es.EXPLORER_RENAME
+            )
+            prevalence = sampling.estimate_prevalence(sample)
+            zscore_mean = sampling.estimate_mean(sample, sample.df["ZScore TB/U"])
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Dokumen Terfilter", f"{sample.population:,}")
+            m2.metric(
+                "Estimasi Prevalensi Stunting",
+                f"{prevalence['estimate'] * 100:.1f}%",
+                f"± {prevalence['margin'] * 100:.1f} poin",
+                delta_color="off",
+            )
+            m3.metric(
+                "Estimasi Rata-rata Z-Score TB/U",
+                f"{zscore_mean['estimate']:.2f}",
+                f"± {zscore_mean['margin']:.2f}",
+                delta_color="off",
+            )
+            st.caption(
+                f"Sampel acak {sample.size:,} baris"
+                f"{' berstrata per kabupaten/kota' if plan.stratify else ''}; "
+                f"± = interval kepercayaan {plan.confidence:.0%}."
+            )
         if not df_explorer.empty:
             df_display = df_explorer.copy()
             df_display["id_baris"] = range(len(df_display))
@@ -150,7 +225,9 @@ def render_page():
             # --- Chart Berjenjang ---
             st.markdown("---")
             # (Logika chart berjenjang dari sebelumnya, tidak berubah)
-            if main_filters.get("kecamatan"):
+            if sample is not None:
+                fig = _sample_prevalence_chart(sample)
+            elif main_filters.get("kecamatan"):
                 st.markdown(
                     "##### Top 5 Keluarga Paling Berisiko (Berdasarkan Z-Score)"
                 )
@@ -269,9 +346,9 @@ def render_page():
             # --- BAGIAN BARU: INSIGHT AI ---
             st.markdown("---")
             st.subheader("🤖 Ringkasan Cerdas AI")
-            with st.spinner("AI sedang menganalisis data yang ditampilkan..."):
+            with st.spinner("AI sedang menganalisis data terfilter..."):
                 ai_summary = generate_ai_summary(
-                    main_filters, advanced_filters, df_explorer
+                    main_filters, advanced_filters, dist_stats
                 )
                 st.markdown(ai_summary)
 
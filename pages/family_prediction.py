@@ -1,38 +1,22 @@
 import streamlit as st
 import pandas as pd
-import os
-import openai  # Mengganti requests dengan library resmi OpenAI
-from src import prediction_service, styles, elastic_client as es
+import plotly.express as px
+import time
+from typing import Iterable
+from src import prediction_service, styles, llm_client, elastic_client as es
 
 
 # ==============================================================================
-# LOGIKA UNTUK FITUR REKOMENDASI AI (DI-UPGRADE KE OPENAI)
+# LOGIKA UNTUK FITUR REKOMENDASI AI (STREAMING VIA OPENAI)
 # ==============================================================================
-def _get_openai_api_key():
-    # Mencari OPENAI_API_KEY
-    env_key = os.getenv("OPENAI_API_KEY", "")
-    if env_key:
-        return env_key
-    try:
-        return st.secrets.get("OPENAI_API_KEY", "")
-    except Exception:
-        return ""
-
-
 def generate_recommendation(
     user_data: dict, prediction_proba: float, prediction_result: str
-) -> str:
-    api_key = _get_openai_api_key()
-    if not api_key:
-        return (
+) -> Iterable[str]:
+    if not llm_client.get_api_key():
+        return [
             "**Rekomendasi AI tidak tersedia.**\n\n"
             "API Key untuk OpenAI (`OPENAI_API_KEY`) belum di-set."
-        )
-
-    try:
-        client = openai.OpenAI(api_key=api_key)
-    except Exception as e:
-        return f"Gagal menginisialisasi client OpenAI: {e}"
+        ]
 
     # --- PROMPT ENGINEERING (Tetap Sama) ---
     friendly_names = {
@@ -93,22 +77,122 @@ def generate_recommendation(
     (Berikan 3 poin rekomendasi yang paling penting, praktis, dan dapat segera ditindaklanjuti oleh ibu hamil ini. Gunakan poin bernomor.)
     """
 
-    # --- PEMANGGILAN API BARU (Menggunakan OpenAI) ---
+    # --- PEMANGGILAN API (STREAMING, token tampil bertahap) ---
+    return llm_client.stream_chat(
+        "Anda adalah seorang ahli gizi dan kesehatan anak senior dari dinas kesehatan Indonesia.",
+        prompt,
+        label="rekomendasi",
+        timeout=45,
+    )
+
+
+# ==============================================================================
+# ANALISIS WHAT-IF (SENSITIVITAS FAKTOR YANG BISA DIINTERVENSI)
+# ==============================================================================
+def render_sensitivity_panel(pipeline: object, input_data: dict):
+    started = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-nano",  # Menggunakan model yang diminta
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Anda adalah seorang ahli gizi dan kesehatan anak senior dari dinas kesehatan Indonesia.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            timeout=45,
-        )
-        return response.choices[0].message.content
+        sens = prediction_service.run_sensitivity(pipeline, input_data)
     except Exception as e:
-        return f"Gagal menghubungi server OpenAI. Mohon coba lagi nanti. Error: {e}"
+        st.warning(f"Analisis what-if tidak dapat dijalankan: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    st.subheader("🔍 Analisis What-If")
+    st.caption(
+        f"{len(sens):,} skenario (satu faktor diubah, faktor lain tetap) "
+        f"diskor dalam satu batch, {elapsed_ms:.0f} ms."
+    )
+
+    # Ringkasan: perubahan terbaik & terburuk per faktor (tornado chart)
+    best = sens.loc[sens.groupby("label")["selisih"].idxmin()]
+    worst = sens.loc[sens.groupby("label")["selisih"].idxmax()]
+    summary = pd.concat(
+        [
+            best.assign(arah="Penurunan terbesar"),
+            worst.assign(arah="Kenaikan terbesar"),
+        ]
+    )
+    summary["keterangan"] = summary["nilai"].astype(str)
+    order = best.sort_values("selisih", ascending=False)["label"].tolist()
+
+    tab1, tab2, tab3 = st.tabs(["Ringkasan", "Faktor Numerik", "Faktor Kategorik"])
+    with tab1:
+        fig = px.bar(
+            summary,
+            x="selisih",
+            y="label",
+            color="arah",
+            orientation="h",
+            text="keterangan",
+            barmode="overlay",
+            color_discrete_map={
+                "Penurunan terbesar": "#10b981",
+                "Kenaikan terbesar": "#ef4444",
+            },
+            labels={"selisih": "Perubahan risiko (poin %)", "label": "", "arah": ""},
+            category_orders={"label": order},
+        )
+        fig.update_traces(textposition="outside")
+        st.plotly_chart(fig, use_container_width=True)
+        top = best.sort_values("selisih").iloc[0]
+        if top["selisih"] < -0.5:
+            st.info(
+                f"Perubahan paling berpengaruh: **{top['label']} = {top['nilai']}** "
+                f"menurunkan risiko {abs(top['selisih']):.1f} poin "
+                f"(menjadi {top['probabilitas']:.1f}%)."
+            )
+
+    is_numeric = sens["faktor"].map(
+        lambda f: prediction_service.SENSITIVITY_FACTORS[f] is not None
+    )
+    with tab2:
+        numeric = sens[is_numeric].astype({"nilai": float})
+        fig = px.line(
+            numeric,
+            x="nilai",
+            y="probabilitas",
+            facet_col="label",
+            facet_col_wrap=3,
+            markers=True,
+            labels={"nilai": "", "probabilitas": "Risiko (%)"},
+        )
+        fig.update_xaxes(matches=None, showticklabels=True)
+        fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+        # Tandai nilai input saat ini; baris facet plotly dihitung dari bawah
+        labels = numeric["label"].unique().tolist()
+        n_rows = -(-len(labels) // 3)
+        current = numeric[numeric["saat_ini"]]
+        for i, label in enumerate(labels):
+            point = current[current["label"] == label]
+            if not point.empty:
+                fig.add_scatter(
+                    x=point["nilai"],
+                    y=point["probabilitas"],
+                    mode="markers",
+                    marker={"size": 12, "color": "#ef4444"},
+                    name="Nilai saat ini",
+                    showlegend=i == 0,
+                    row=n_rows - i // 3,
+                    col=i % 3 + 1,
+                )
+        st.plotly_chart(fig, use_container_width=True)
+    with tab3:
+        categorical = sens[~is_numeric].copy()
+        categorical["nilai"] = categorical["nilai"].astype(str) + categorical[
+            "saat_ini"
+        ].map({True: " (saat ini)", False: ""})
+        fig = px.bar(
+            categorical,
+            x="selisih",
+            y="nilai",
+            facet_row="label",
+            orientation="h",
+            labels={"selisih": "Perubahan risiko (poin %)", "nilai": ""},
+        )
+        fig.update_yaxes(matches=None)
+        fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+        st.plotly_chart(fig, use_container_width=True)
 
 
 # --- BAGIAN UTAMA APLIKASI STREAMLIT (TIDAK ADA PERUBAHAN) ---
@@ -252,15 +336,20 @@ def render_page():
                 )
                 st.write(f"Kategori: **{prediction_result['result']}**")
 
+            # Panel what-if diisi sebelum rekomendasi AI di-stream agar tidak menunggu
+            with st.container():
+                render_sensitivity_panel(pipeline, input_data)
+
             with col2:
                 st.subheader("💡 Rekomendasi AI")
-                with st.spinner("AI sedang menganalisis dan membuat rekomendasi..."):
-                    recommendation = generate_recommendation(
-                        input_data,
-                        prediction_result["probability"],
-                        prediction_result["result"],
-                    )
-                    st.markdown(recommendation)
+                stream = generate_recommendation(
+                    input_data,
+                    prediction_result["probability"],
+                    prediction_result["result"],
+                )
+                st.write_stream(stream)
+                if isinstance(stream, llm_client.ChatStream):
+                    st.caption(stream.metrics.caption())
 
 
 # --- Main Execution ---
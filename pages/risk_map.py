@@ -1,196 +1,388 @@
 import streamlit as st
 import pandas as pd
-import json
 import pathlib
 import pydeck as pdk
-import math
+import numpy as np
 
 from src import styles
 from src import elastic_client as es
 from src.components import sidebar
+from src import choropleth, geo_tiles, geometry_simplify, geometry_store, region_codes
+from src import prefetch
+from src.geometry_index import GeometryIndex, view_for_bounds
+from src.geometry_store import GeometryStore
+from src.region_codes import DESA_PROPERTY, KAB_PROPERTY, KEC_PROPERTY
+from src.region_index import RegionIndex
 
 # --- Konfigurasi & Fungsi Helper ---
 GEOJSON_PATH = pathlib.Path(__file__).parents[1] / "geojson" / "jawa-barat.geojson"
+GEOJSON_DESA_PATH = GEOJSON_PATH.with_name("jawa-barat-desa.geojson")
+# Label tingkat wilayah -> (level agregasi ES, GeoJSON)
+MAP_LEVELS = {
+    "Kecamatan": ("kecamatan", GEOJSON_PATH),
+    "Desa/Kelurahan": ("desa", GEOJSON_DESA_PATH),
+}
+MAP_MODES = {"Choropleth wilayah": "choropleth", "Heatmap keluarga": "heatmap"}
 
 
-@st.cache_data(show_spinner="Memuat data GeoJSON...")
-def load_geojson():
-    with open(GEOJSON_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+# cache_resource: satu objek bersama, tidak disalin per rerun. Geostore berisi
+# array ter-mmap (dibangun dari GeoJSON sekali bila belum ada), read-only.
+@st.cache_resource(show_spinner="Memuat geometri peta...")
+def load_geometry_store(path: pathlib.Path) -> GeometryStore:
+    return geometry_store.load_or_build(path)
 
 
-def _normalize_name(v: str) -> str:
-    if not v:
-        return ""
-    s = v.upper().strip()
-    prefixes_to_remove = ["KABUPATEN", "KOTA", "KAB.", "KEC.", "KEC"]
-    for prefix in prefixes_to_remove:
-        if s.startswith(prefix):
-            s = s[len(prefix) :].strip()
-            break
-    return " ".join(s.split())
+@st.cache_resource(show_spinner="Memuat kode wilayah...")
+def _load_region_dictionary(paths) -> region_codes.RegionDictionary:
+    return region_codes.load_or_build(paths)
 
 
-def _prevalence_to_color(prevalence: float):
-    if prevalence is None or pd.isna(prevalence):
-        return [200, 200, 200, 80]
-    score = max(0.0, min(1.0, prevalence / 100.0))
-    if score < 0.5:
-        t = score * 2.0
-        r, g, b = int(t * 255), int(t * 255), int(255 * (1 - t))
-    else:
-        t = (score - 0.5) * 2.0
-        r, g, b = 255, int(255 * (1 - t)), 0
-    return [r, g, b, 180]
+def load_region_dictionary() -> region_codes.RegionDictionary:
+    # Kamus tersimpan + nama semua GeoJSON yang tersedia (kode lama tetap);
+    # dibangun ulang bila GeoJSON baru (mis. desa) ditambahkan
+    paths = (GEOJSON_PATH, GEOJSON_DESA_PATH)
+    return _load_region_dictionary(
+        tuple(p for p in paths if geometry_store.is_available(p))
+    )
 
 
-def _enrich_geojson(geojson: dict, agg_df: pd.DataFrame):
-    if not agg_df.empty:
-        agg_df["kab_key"] = agg_df["kabupaten"].apply(_normalize_name)
-        agg_df["kec_key"] = agg_df["kecamatan"].apply(_normalize_name)
-        lookup = {(r.kab_key, r.kec_key): r for r in agg_df.itertuples()}
-    else:
-        lookup = {}
-
-    for feature in geojson.get("features", []):
-        prop = feature.get("properties", {})
-        kab_key = _normalize_name(prop.get("KABKOT", ""))
-        kec_key = _normalize_name(prop.get("KECAMATAN", ""))
-
-        rec = lookup.get((kab_key, kec_key))
-        if rec and rec.total_anak > 0:
-            prevalence = (rec.jumlah_stunting / rec.total_anak) * 100
-            prop.update(
-                {
-                    "prevalensi_stunting": round(prevalence, 2),
-                    "jumlah_stunting": int(rec.jumlah_stunting),
-                    "total_anak_terdata": int(rec.total_anak),
-                }
-            )
-            prop["fill_color"] = _prevalence_to_color(prevalence)
-        else:
-            prop.update(
-                {
-                    "prevalensi_stunting": "N/A",
-                    "jumlah_stunting": 0,
-                    "total_anak_terdata": 0,
-                }
-            )
-            prop["fill_color"] = _prevalence_to_color(None)
-        feature["properties"] = prop
-    return geojson
-
-
-# --- HELPER BARU UNTUK FOKUS PETA ---
-def filter_geojson_features(geojson, selected_kab, selected_kec):
-    if not selected_kab and not selected_kec:
-        return geojson["features"]
-
-    filtered_features = []
-    norm_kab = _normalize_name(selected_kab[0]) if selected_kab else None
-    norm_kec = _normalize_name(selected_kec[0]) if selected_kec else None
-
-    for feature in geojson["features"]:
-        prop = feature["properties"]
-        kab_key = _normalize_name(prop.get("KABKOT", ""))
-        kec_key = _normalize_name(prop.get("KECAMATAN", ""))
-
-        if norm_kec:  # Filter paling spesifik dulu
-            if kab_key == norm_kab and kec_key == norm_kec:
-                filtered_features.append(feature)
-        elif norm_kab:
-            if kab_key == norm_kab:
-                filtered_features.append(feature)
-    return filtered_features
-
-
-def _walk_coords(coords, lats, lons):
-    if isinstance(coords, (list, tuple)):
-        if len(coords) > 0 and isinstance(coords[0], (int, float)):
-            lon, lat = coords
-            lats.append(lat)
-            lons.append(lon)
-        else:
-            for c in coords:
-                _walk_coords(c, lats, lons)
+@st.cache_resource
+def load_region_index(path: pathlib.Path, level: str) -> RegionIndex:
+    store = load_geometry_store(path)
+    return RegionIndex.from_names(
+        load_region_dictionary(),
+        store.column(KAB_PROPERTY),
+        store.column(KEC_PROPERTY),
+        store.column(DESA_PROPERTY) if level == "desa" else None,
+    )
+
+
+@st.cache_resource
+def load_geometry_index(path: pathlib.Path) -> GeometryIndex:
+    return load_geometry_store(path).geometry_index(load_region_dictionary())
+
+
+def _desa_unavailable_reason():
+    if not geometry_store.is_available(GEOJSON_DESA_PATH):
+        return f"GeoJSON desa ({GEOJSON_DESA_PATH.name}) belum tersedia."
+    if not es.resolve_desa_field():
+        return "Index stunting tidak memiliki field desa/kelurahan."
+    return None
 
 
-def compute_view_state(features):
-    if not features:
-        return pdk.ViewState(latitude=-6.91, longitude=107.61, zoom=7.5, pitch=0)
+def resolve_view(mode_label: str, level_label: str):
+    """
+    (mode, label tingkat wilayah) yang benar-benar ditampilkan, beserta pesan
+    bila pilihan belum tersedia dan peta jatuh ke tampilan lain.
+    """
+    notices = []
+    map_mode = MAP_MODES[mode_label]
+    if map_mode == "heatmap" and not es.resolve_geo_field():
+        notices.append(
+            "Index stunting tidak memiliki field lokasi keluarga (geo_point). "
+            "Peta ditampilkan sebagai choropleth wilayah."
+        )
+        map_mode = "choropleth"
+    if map_mode == "heatmap":
+        # Heatmap tidak bergantung tingkat wilayah; GeoJSON hanya untuk bbox
+        level_label = "Kecamatan"
+    elif MAP_LEVELS[level_label][0] == "desa":
+        reason = _desa_unavailable_reason()
+        if reason:
+            notices.append(f"{reason} Peta ditampilkan per kecamatan.")
+            level_label = "Kecamatan"
+    return map_mode, level_label, notices
+
+
+def prefetch_view(filters: dict) -> list:
+    """
+    Job peta untuk filter kecamatan anak (src/prefetch.py), dipanggil persis
+    seperti render_page pada tampilan yang sedang dipilih.
+    """
+    map_mode, level_label, _ = resolve_view(
+        st.session_state.get("risk_map_mode", next(iter(MAP_MODES))),
+        st.session_state.get("risk_map_level", next(iter(MAP_LEVELS))),
+    )
+    map_level, geojson_path = MAP_LEVELS[level_label]
+    if map_mode == "choropleth":
+        return [prefetch.job(es.get_risk_map_data, filters, level=map_level)]
+    positions = load_region_index(geojson_path, map_level).select(
+        filters["wilayah"], filters["kecamatan"]
+    )
+    box = selection_bounds(
+        load_geometry_index(geojson_path),
+        positions,
+        filters["wilayah"],
+        filters["kecamatan"],
+    )
+    tiles = geo_tiles.covering_tiles(box, view_for_bounds(box)["zoom"])
+    return [prefetch.job(es.get_heatmap_tile, filters, tile) for tile in tiles]
+
+
+def build_display_features(
+    store: GeometryStore,
+    joined: pd.DataFrame,
+    positions,
+    styling: choropleth.Styling,
+    level: str = geometry_store.FULL_LEVEL,
+) -> list:
+    """
+    Fitur GeoJSON untuk posisi terpilih saja, dibangun dari geostore pada
+    `level` resolusi. Properti & warna sudah dihitung per kolom; di sini hanya
+    dirakit menjadi dict.
+    """
+    geometries = store.geometries(positions, level)
+    prevalence = joined["prevalensi_stunting"].to_numpy()[positions]
+    labels = np.round(prevalence, 2).astype(object)
+    labels[np.isnan(prevalence)] = "N/A"
+    columns = zip(
+        positions,
+        geometries,
+        labels.tolist(),
+        joined["jumlah_stunting"].to_numpy()[positions].tolist(),
+        joined["total_anak_terdata"].to_numpy()[positions].tolist(),
+        styling.rgba.tolist(),
+    )
+    features = []
+    for pos, geometry, label, stunting, total, color in columns:
+        props = store.properties(pos)
+        props.update(
+            {
+                "prevalensi_stunting": label,
+                "jumlah_stunting": stunting,
+                "total_anak_terdata": total,
+                "fill_color": color,
+            }
+        )
+        features.append({"type": "Feature", "geometry": geometry, "properties": props})
+    return features
 
-    lats, lons = [], []
-    for f in features:
-        _walk_coords(f["geometry"]["coordinates"], lats, lons)
 
-    if not lats or not lons:
-        return pdk.ViewState(latitude=-6.91, longitude=107.61, zoom=7.5, pitch=0)
+def legend_html(scale: choropleth.ColorScale, styling: choropleth.Styling) -> str:
+    items = choropleth.legend_items(scale, styling)
+    if scale.kind == "continuous":
+        gradient = ", ".join(
+            f"{color} {stop * 100:.0f}%" for stop, (_, color) in zip(scale.stops, items)
+        )
+        names = [label for label, _ in items]
+        names[0], names[-1] = f"{names[0]} (Rendah)", f"{names[-1]} (Tinggi)"
+        labels = "".join(f"<span>{name}</span>" for name in names)
+        body = f"""
+            <div style="width:100%; height:15px; background:linear-gradient(90deg, {gradient}); border:1px solid #FFF;"></div>
+            <div style="display:flex; justify-content:space-between; font-size:12px;">{labels}</div>"""
+    else:
+        body = (
+            '<div style="display:flex; gap:12px; flex-wrap:wrap; font-size:12px;">'
+            + "".join(
+                f'<span><span style="display:inline-block; width:14px; height:14px; background:{color}; border:1px solid #FFF; vertical-align:middle;"></span> {label}</span>'
+                for label, color in items
+            )
+            + "</div>"
+        )
+    return f"""
+        <div style="margin-top: 10px;">
+            <b>Legenda Prevalensi Stunting (%) — {scale.label}</b><br>{body}
+        </div>
+        """
+
 
-    min_lat, max_lat = min(lats), max(lats)
-    min_lon, max_lon = min(lons), max(lons)
-    center_lat = (min_lat + max_lat) / 2
-    center_lon = (min_lon + max_lon) / 2
+def selection_bounds(
+    geometry: GeometryIndex, positions, selected_kab=None, selected_kec=None
+):
+    # Satu kabupaten utuh: bbox gabungan per kode sudah tersedia di sidecar
+    if selected_kab and not selected_kec:
+        code = load_region_dictionary().encode_kabupaten(selected_kab[:1])[0]
+        return geometry.kabupaten_bounds(code)
+    return geometry.bounds(positions)
+
+
+def choropleth_layers(
+    store: GeometryStore,
+    region_index: RegionIndex,
+    agg_df: pd.DataFrame,
+    positions,
+    zoom: float,
+    scale: choropleth.ColorScale,
+    full_detail: bool = False,
+):
+    # Join vektor agregasi ke indeks wilayah, lalu bangun fitur terpilih saja
+    joined = region_index.join(agg_df)
+    # Level geometri sesuai zoom: kasar untuk provinsi, penuh untuk kecamatan
+    level = geometry_simplify.pick_level(store.levels, zoom, full_detail=full_detail)
+    # Warna semua wilayah tampil sekaligus (kelas kuantil/rentang sekuensial
+    # mengikuti wilayah yang tampil)
+    styling = choropleth.colorize(
+        joined["prevalensi_stunting"].to_numpy()[positions], scale
+    )
+    features_to_display = build_display_features(
+        store,
+        joined,
+        positions,
+        styling,
+        level["name"] if level else geometry_store.FULL_LEVEL,
+    )
 
-    lat_span = max(abs(max_lat - min_lat), 1e-5)
-    lon_span = max(abs(max_lon - min_lon), 1e-5)
+    display_geojson = {"type": "FeatureCollection", "features": features_to_display}
+
+    layer = pdk.Layer(
+        "GeoJsonLayer",
+        display_geojson,
+        opacity=0.8,
+        stroked=True,
+        filled=True,
+        # Warna RGBA numerik sudah ada di properti; accessor cukup membacanya
+        get_fill_color="properties.fill_color",
+        get_line_color=[255, 255, 255],
+        line_width_min_pixels=1,
+        pickable=True,
+        auto_highlight=True,
+        # Paksa re-evaluasi bila warna berubah; kunci ringkas agar GeoJSON
+        # tidak ikut terkirim dua kali
+        update_triggers={"get_fill_color": styling.key},
+    )
+    return [layer], styling
+
+
+REGION_TOOLTIP = """
+<div style="background-color: #333; color: white; padding: 10px; border-radius: 5px; border: 1px solid #555;">
+    <h4 style="margin: 0 0 5px 0;">{KABKOT}</h4>
+    <h5 style="margin: 0 0 10px 0;">Kec. {KECAMATAN}</h5>
+    {desa_line}
+    <p style="margin: 0;"><strong>Tingkat Prevalensi:</strong> {prevalensi_stunting}%</p>
+    <p style="margin: 0;"><strong>Kasus Stunting:</strong> {jumlah_stunting}</p>
+    <p style="margin: 0;"><strong>Total Anak Terdata:</strong> {total_anak_terdata}</p>
+</div>
+"""
+
+
+def heatmap_layers(cells: pd.DataFrame, precision: int, scale: choropleth.ColorScale):
+    """
+    Heatmap berbobot jumlah kasus + titik sel (warna = prevalensi sel) untuk
+    tooltip. `cells` sudah teragregasi di ES; jumlahnya dibatasi per tile.
+    """
+    total = cells["total_anak"].to_numpy()
+    stunting = cells["jumlah_stunting"].to_numpy()
+    prevalence = np.where(total > 0, stunting / np.maximum(total, 1) * 100, np.nan)
+    styling = choropleth.colorize(prevalence, scale)
+    data = cells.assign(
+        prevalensi_stunting=np.round(prevalence, 2),
+        fill_color=styling.rgba.tolist(),
+        radius=geo_tiles.cell_size_m(precision, cells["lat"].to_numpy()) / 2,
+    )
+    heat = pdk.Layer(
+        "HeatmapLayer",
+        data[["lon", "lat", "jumlah_stunting"]],
+        get_position=["lon", "lat"],
+        get_weight="jumlah_stunting",
+        aggregation="SUM",
+        radius_pixels=40,
+        opacity=0.7,
+    )
+    dots = pdk.Layer(
+        "ScatterplotLayer",
+        data,
+        get_position=["lon", "lat"],
+        get_radius="radius",
+        get_fill_color="fill_color",
+        opacity=0.35,
+        pickable=True,
+        update_triggers={"get_fill_color": styling.key},
+    )
+    return [heat, dots], styling
 
-    zoom_lon = math.log2(360 / lon_span)
-    zoom_lat = math.log2(180 / lat_span)
-    zoom = min(zoom_lon, zoom_lat) * 0.95  # Sedikit zoom out
 
-    return pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=zoom, pitch=0)
+HEATMAP_TOOLTIP = """
+<div style="background-color: #333; color: white; padding: 10px; border-radius: 5px; border: 1px solid #555;">
+    <p style="margin: 0;"><strong>Tingkat Prevalensi (sel):</strong> {prevalensi_stunting}%</p>
+    <p style="margin: 0;"><strong>Kasus Stunting:</strong> {jumlah_stunting}</p>
+    <p style="margin: 0;"><strong>Total Anak Terdata:</strong> {total_anak}</p>
+</div>
+"""
 
 
 # --- RENDER HALAMAN ---
 def render_page():
     st.subheader("Peta Risiko Stunting Jawa Barat")
-    st.caption(
-        "Peta diwarnai berdasarkan Tingkat Prevalensi Stunting (jumlah kasus / total anak) per kecamatan."
-    )
-
-    main_filters = sidebar.render()
+    main_filters = sidebar.render(prefetch_view=prefetch_view)
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        mode_label = st.radio(
+            "Tampilan", list(MAP_MODES), horizontal=True, key="risk_map_mode"
+        )
+    with c2:
+        level_label = st.radio(
+            "Tingkat wilayah",
+            list(MAP_LEVELS),
+            horizontal=True,
+            key="risk_map_level",
+            disabled=MAP_MODES[mode_label] == "heatmap",
+        )
+    with c3:
+        scale_name = st.selectbox(
+            "Skala warna",
+            list(choropleth.SCALES),
+            index=list(choropleth.SCALES).index(choropleth.DEFAULT_SCALE),
+            format_func=lambda k: choropleth.SCALES[k].label,
+            key="risk_map_scale",
+        )
+    scale = choropleth.SCALES[scale_name]
 
     try:
-        agg_df = es.get_risk_map_data(main_filters)
-        geojson_data = load_geojson()
-        enriched_geojson = _enrich_geojson(geojson_data, agg_df)
+        map_mode, level_label, notices = resolve_view(mode_label, level_label)
+        for notice in notices:
+            st.info(notice)
+        map_level, geojson_path = MAP_LEVELS[level_label]
+        if map_mode == "heatmap":
+            st.caption(
+                "Heatmap kasus stunting keluarga, diagregasi per sel grid di "
+                "Elasticsearch. Titik sel diwarnai prevalensi (jumlah kasus / "
+                "total anak) sel tersebut."
+            )
+        else:
+            st.caption(
+                "Peta diwarnai berdasarkan Tingkat Prevalensi Stunting (jumlah kasus / "
+                f"total anak) per {level_label.lower()}."
+            )
 
-        # Logika BARU: filter fitur dan hitung view state
-        features_to_display = filter_geojson_features(
-            enriched_geojson, main_filters["wilayah"], main_filters["kecamatan"]
+        store = load_geometry_store(geojson_path)
+        region_index = load_region_index(geojson_path, map_level)
+        positions = region_index.select(
+            main_filters["wilayah"], main_filters["kecamatan"]
         )
-        view_state = compute_view_state(features_to_display)
-
-        display_geojson = {"type": "FeatureCollection", "features": features_to_display}
-
-        # ---- Perubahan: gunakan JS accessor untuk mengambil fill_color dari properties ----
-        layer = pdk.Layer(
-            "GeoJsonLayer",
-            display_geojson,
-            opacity=0.8,
-            stroked=True,
-            filled=True,
-            get_fill_color="[properties.fill_color[0]*1, properties.fill_color[1]*1, properties.fill_color[2]*1, properties.fill_color[3]*1]",
-            get_line_color=[255, 255, 255],
-            line_width_min_pixels=1,
-            pickable=True,
-            auto_highlight=True,
-            # Paksa re-evaluasi bila source data berubah
-            update_triggers={"get_fill_color": display_geojson},
+        box = selection_bounds(
+            load_geometry_index(geojson_path),
+            positions,
+            main_filters["wilayah"],
+            main_filters["kecamatan"],
         )
+        view_state = pdk.ViewState(**view_for_bounds(box), pitch=0)
 
-        tooltip_html = """
-        <div style="background-color: #333; color: white; padding: 10px; border-radius: 5px; border: 1px solid #555;">
-            <h4 style="margin: 0 0 5px 0;">{KABKOT}</h4>
-            <h5 style="margin: 0 0 10px 0;">Kec. {KECAMATAN}</h5>
-            <p style="margin: 0;"><strong>Tingkat Prevalensi:</strong> {prevalensi_stunting}%</p>
-            <p style="margin: 0;"><strong>Kasus Stunting:</strong> {jumlah_stunting}</p>
-            <p style="margin: 0;"><strong>Total Anak Terdata:</strong> {total_anak_terdata}</p>
-        </div>
-        """
+        if map_mode == "heatmap":
+            # Hanya sel teragregasi yang dikirim ke browser (<= batas per tile)
+            cells, precision = es.get_heatmap_cells(main_filters, view_state.zoom, box)
+            layers, styling = heatmap_layers(cells, precision, scale)
+            tooltip_html = HEATMAP_TOOLTIP
+        else:
+            layers, styling = choropleth_layers(
+                store,
+                region_index,
+                es.get_risk_map_data(main_filters, level=map_level),
+                positions,
+                view_state.zoom,
+                scale,
+                full_detail=bool(main_filters["kecamatan"]),
+            )
+            tooltip_html = REGION_TOOLTIP.replace(
+                "{desa_line}",
+                (
+                    '<h5 style="margin: 0 0 10px 0;">Desa {%s}</h5>' % DESA_PROPERTY
+                    if map_level == "desa"
+                    else ""
+                ),
+            )
 
         r = pdk.Deck(
-            layers=[layer],
+            layers=layers,
             initial_view_state=view_state,
             map_style="mapbox://styles/mapbox/dark-v9",
             tooltip={"html": tooltip_html},
@@ -198,22 +390,7 @@ def render_page():
 
         st.pydeck_chart(r, use_container_width=True)
 
-        st.markdown(
-            """
-        <div style="margin-top: 10px;">
-            <b>Legenda Prevalensi Stunting (%)</b><br>
-            <div style="display:flex; align-items:center;">
-                <div style="width:100%; height:15px; background:linear-gradient(90deg, #00F 0%, #FF0 50%, #F00 100%); border:1px solid #FFF;"></div>
-            </div>
-            <div style="display:flex; justify-content:space-between; font-size:12px;">
-                <span>0% (Rendah)</span>
-                <span>50%</span>
-                <span>100% (Tinggi)</span>
-            </div>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        st.markdown(legend_html(scale, styling), unsafe_allow_html=True)
 
     except Exception as e:
         st.error(f"Gagal membuat peta risiko: {e}")
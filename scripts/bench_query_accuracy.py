@@ -0,0 +1,154 @@
+# StuntLytics/scripts/bench_query_accuracy.py
+# Benchmark latensi mode query "interactive" vs "exact" (src/elastic_client.py)
+# pada index sintetis besar ber-seed, plus selisih angka KPI antar mode.
+#
+# Pemakaian:
+#   python scripts/bench_query_accuracy.py --index stunting-bench --seed-docs 5000000
+#   python scripts/bench_query_accuracy.py --index stunting-bench --repeat 10
+# Index diisi sekali (dilewati bila jumlah dokumennya sudah cukup).
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import elastic_client as es  # noqa: E402
+from src.query_cache import SHARED_CACHE  # noqa: E402
+
+MAPPING = {
+    "Tanggal": {"type": "date"},
+    "nama_kabupaten_kota": {"type": "keyword"},
+    "Kecamatan": {"type": "keyword"},
+    "Status Stunting (Biner)": {"type": "keyword"},
+    "Status Imunisasi Anak": {"type": "keyword"},
+    "Akses Air Bersih": {"type": "keyword"},
+    "Z-Score TB/U": {"type": "float"},
+    "ZScore TB/U": {"type": "float"},
+}
+KABUPATEN = [f"KAB {i:02d}" for i in range(27)]
+
+
+def _doc_count(index: str) -> int:
+    r = requests.get(f"{es.ES_URL}/{index}/_count", timeout=30)
+    return r.json().get("count", 0) if r.ok else 0
+
+
+def seed_index(index: str, n_docs: int, batch: int = 10_000) -> None:
+    requests.put(
+        f"{es.ES_URL}/{index}",
+        json={
+            "settings": {"number_of_shards": 3, "number_of_replicas": 0},
+            "mappings": {"properties": MAPPING},
+        },
+        timeout=30,
+    )
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for offset in range(0, n_docs, batch):
+        m = min(batch, n_docs - offset)
+        kab = rng.integers(0, len(KABUPATEN), m)
+        z = rng.normal(-1.0 - kab / 40, 1.0, m)
+        days = rng.integers(0, 3 * 365, m)
+        imun = rng.choice(["Lengkap", "Tidak Lengkap"], m, p=[0.65, 0.35])
+        air = rng.choice(["Layak", "Tidak Layak", "Tidak Ada"], m, p=[0.7, 0.2, 0.1])
+        lines = []
+        for i in range(m):
+            lines.append('{"index":{}}')
+            lines.append(
+                json.dumps(
+                    {
+                        "Tanggal": str(np.datetime64("2022-01-01") + int(days[i])),
+                        "nama_kabupaten_kota": KABUPATEN[kab[i]],
+                        "Kecamatan": f"KEC {kab[i]:02d}-{rng.integers(0, 40):02d}",
+                        "Status Stunting (Biner)": "Ya" if z[i] <= -2 else "Tidak",
+                        "Status Imunisasi Anak": imun[i],
+                        "Akses Air Bersih": air[i],
+                        "Z-Score TB/U": round(float(z[i]), 2),
+                        "ZScore TB/U": round(float(z[i]), 2),
+                    }
+                )
+            )
+        r = requests.post(
+            f"{es.ES_URL}/{index}/_bulk",
+            data=("\n".join(lines) + "\n").encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=300,
+        )
+        r.raise_for_status()
+        done = offset + m
+        rate = done / (time.perf_counter() - start)
+        print(f"\r  seeding {done:,}/{n_docs:,} ({rate:,.0f} dok/dtk)", end="")
+    print()
+    requests.post(f"{es.ES_URL}/{index}/_refresh", timeout=300)
+
+
+def _clear_request_cache(index: str) -> None:
+    # Tanpa ini hasil agregasi size=0 dilayani dari shard request cache
+    requests.post(f"{es.ES_URL}/{index}/_cache/clear?request=true", timeout=30)
+
+
+def time_mode(index: str, mode: str, repeat: int):
+    timings = []
+    summary = None
+    with es.accuracy(mode):
+        for i in range(repeat + 1):
+            _clear_request_cache(index)
+            started = time.perf_counter()
+            summary = es.get_main_page_summary({})
+            es.get_monthly_trend({})
+            if i:  # putaran pertama = pemanasan
+                timings.append(time.perf_counter() - started)
+    return timings, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mode akurasi query ES")
+    parser.add_argument("--index", default="stunting-bench")
+    parser.add_argument("--seed-docs", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.seed_docs and _doc_count(args.index) < args.seed_docs:
+        print(f"Mengisi index {args.index} dengan {args.seed_docs:,} dokumen...")
+        seed_index(args.index, args.seed_docs)
+    n_docs = _doc_count(args.index)
+    if not n_docs:
+        sys.exit(f"Index {args.index} kosong; jalankan dengan --seed-docs")
+
+    # Arahkan fungsi halaman ke index benchmark
+    es.STUNTING_INDEX = es.NUTRITION_INDEX = args.index
+    SHARED_CACHE.clear()
+    print(f"Index {args.index}: {n_docs:,} dokumen, {args.repeat} putaran per mode")
+
+    results = {}
+    for mode in (es.ACCURACY_EXACT, es.ACCURACY_INTERACTIVE):
+        timings, summary = time_mode(args.index, mode, args.repeat)
+        results[mode] = summary
+        meta = summary["meta"]
+        print(
+            f"{mode:<12} median {statistics.median(timings) * 1000:7.0f} ms"
+            f"  maks {max(timings) * 1000:7.0f} ms"
+            f"  (p sampler = {meta['sampling_probability']})"
+        )
+
+    exact = results[es.ACCURACY_EXACT]["kpi"]
+    approx = results[es.ACCURACY_INTERACTIVE]["kpi"]
+    print("Selisih KPI (interactive vs exact):")
+    for key in (
+        "total_bayi_lahir",
+        "total_bayi_stunting",
+        "cakupan_imunisasi_pct",
+        "akses_air_layak_pct",
+    ):
+        ref = exact[key]
+        rel = abs(approx[key] - ref) / ref * 100 if ref else 0.0
+        print(f"  {key:<24} {ref:>14,.2f} vs {approx[key]:>14,.2f}  ({rel:.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
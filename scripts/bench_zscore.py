@@ -0,0 +1,82 @@
+# StuntLytics/scripts/bench_zscore.py
+# Benchmark engine z-score WHO (src/zscore.py): throughput versi vektor vs loop
+# per baris, plus cek bahwa keduanya memberi hasil yang sama.
+#
+# Pemakaian:
+#   python scripts/bench_zscore.py --rows 5000000
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import zscore  # noqa: E402
+
+
+def _scalar_hfa(height, age, sex, table):
+    """Implementasi per baris (acuan) untuk TB/U."""
+    if not (0 <= age <= zscore.MAX_AGE_MONTHS) or sex not in (1, 2) or not height > 0:
+        return math.nan
+    lower = min(int(age), zscore.MAX_AGE_MONTHS - 1)
+    frac = age - lower
+    L, M, S = (
+        table[c][sex - 1][lower]
+        + (table[c][sex - 1][lower + 1] - table[c][sex - 1][lower]) * frac
+        for c in ("L", "M", "S")
+    )
+    if L == 0:
+        return math.log(height / M) / S
+    return ((height / M) ** L - 1) / (L * S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark z-score WHO LMS")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.rows
+    age = rng.uniform(0, 60, n)
+    sex = rng.integers(1, 3, n).astype(np.int8)
+    height = 50 + age * 1.0 + rng.normal(0, 4, n)
+    weight = 3.3 + age * 0.22 + rng.normal(0, 1.2, n)
+    zscore.load_table("lhfa"), zscore.load_table("wfa")  # baca CSV di luar pengukuran
+
+    for name, fn, x in [
+        ("TB/U (lhfa)", zscore.height_for_age, height),
+        ("BB/U (wfa) ", zscore.weight_for_age, weight),
+    ]:
+        best = min(_timed(lambda: fn(x, age, sex)) for _ in range(args.repeat))
+        print(
+            f"{name}: {n:,} baris dalam {best * 1000:.0f} ms -> {n / best / 1e6:,.1f} juta baris/dtk"
+        )
+
+    m = min(args.scalar_rows, n)
+    table = {k: v.tolist() for k, v in zscore.load_table("lhfa").items()}
+    started = time.perf_counter()
+    scalar = [
+        _scalar_hfa(h, a, int(s), table)
+        for h, a, s in zip(height[:m], age[:m], sex[:m])
+    ]
+    scalar_s = time.perf_counter() - started
+    vector = zscore.height_for_age(height[:m], age[:m], sex[:m])
+    max_diff = np.nanmax(np.abs(np.asarray(scalar) - vector))
+    print(
+        f"Loop per baris: {m / scalar_s / 1e6:,.2f} juta baris/dtk "
+        f"(selisih maks vs vektor {max_diff:.1e})"
+    )
+
+
+def _timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    main()
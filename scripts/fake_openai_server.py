@@ -0,0 +1,227 @@
+# StuntLytics/scripts/fake_openai_server.py
+# Server palsu kompatibel OpenAI Chat Completions untuk menguji streaming secara lokal.
+#
+# Pemakaian:
+#   python scripts/fake_openai_server.py --port 8808 --ttft-ms 300 --token-ms 20
+#   OPENAI_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=fake streamlit run app.py
+#
+# Model ber-skrip (mode tool-calling InsightNow), `--script skrip.json`:
+#   [{"tool_calls": [{"name": "get_monthly_trend", "arguments": {"last_n_months": 6}}]},
+#    {"content": "Tren 6 bulan terakhir: {last_tool_result}"}]
+# Langkah ke-n dipilih dari jumlah putaran tool call sejak pesan user terakhir,
+# sehingga server tetap stateless. `{last_tool_result}` diganti hasil tool terakhir.
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "### Ringkasan Analisis\n"
+    "Ini adalah jawaban uji dari server palsu. Setiap kata dikirim sebagai satu "
+    "potongan token agar tampilan streaming dapat diperiksa.\n\n"
+    "- Poin pertama\n- Poin kedua\n- Poin ketiga\n"
+)
+
+
+def _tokenize(text: str):
+    # Pecah per kata dengan mempertahankan spasi, meniru potongan token model
+    parts, buf = [], ""
+    for ch in text:
+        buf += ch
+        if ch in " \n":
+            parts.append(buf)
+            buf = ""
+    if buf:
+        parts.append(buf)
+    return parts
+
+
+def _prompt_tokens(messages) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4
+
+
+def _script_step(messages):
+    """Indeks langkah skrip = jumlah putaran tool call setelah pesan user terakhir."""
+    step = 0
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            break
+        if m.get("role") == "assistant" and m.get("tool_calls"):
+            step += 1
+    return step
+
+
+def _last_tool_result(messages) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "tool":
+            return str(m.get("content") or "")
+    return ""
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    reply = DEFAULT_REPLY
+    script = None
+    ttft_s = 0.3
+    token_s = 0.02
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        reply, tool_calls = self._next_turn(body)
+        if body.get("stream"):
+            self._stream(body, reply, tool_calls)
+        else:
+            self._complete(body, reply, tool_calls)
+
+    def _next_turn(self, body):
+        """Kembalikan (teks jawaban, daftar tool call) untuk permintaan ini."""
+        if not self.script:
+            return self.reply, []
+        messages = body.get("messages", [])
+        step = self.script[min(_script_step(messages), len(self.script) - 1)]
+        if step.get("tool_calls") and body.get("tool_choice") != "none":
+            calls = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:8]}",
+                    "type": "function",
+                    "function": {
+                        "name": c["name"],
+                        "arguments": json.dumps(c.get("arguments", {})),
+                    },
+                }
+                for c in step["tool_calls"]
+            ]
+            return "", calls
+        content = step.get("content", self.reply)
+        return content.replace("{last_tool_result}", _last_tool_result(messages)), []
+
+    def _base(self, body):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+        }
+
+    def _usage(self, body, tokens):
+        prompt = _prompt_tokens(body.get("messages", []))
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": tokens,
+            "total_tokens": prompt + tokens,
+        }
+
+    def _complete(self, body, reply, tool_calls):
+        tokens = _tokenize(reply)
+        time.sleep(self.ttft_s + self.token_s * len(tokens))
+        message = {"role": "assistant", "content": reply or None}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        payload = {
+            **self._base(body),
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": self._usage(body, len(tokens)),
+        }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, body, reply, tool_calls):
+        base = {**self._base(body), "object": "chat.completion.chunk"}
+        tokens = _tokenize(reply)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        time.sleep(self.ttft_s)
+        self._send_event(
+            {**base, "choices": [{"index": 0, "delta": {"role": "assistant"}}]}
+        )
+        for tok in tokens:
+            self._send_event(
+                {**base, "choices": [{"index": 0, "delta": {"content": tok}}]}
+            )
+            time.sleep(self.token_s)
+        for i, call in enumerate(tool_calls):
+            # Nama dan argumen dikirim terpisah, seperti delta tool call asli
+            head = {
+                "index": i,
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": call["function"]["name"], "arguments": ""},
+            }
+            tail = {
+                "index": i,
+                "function": {"arguments": call["function"]["arguments"]},
+            }
+            for delta in (head, tail):
+                self._send_event(
+                    {
+                        **base,
+                        "choices": [{"index": 0, "delta": {"tool_calls": [delta]}}],
+                    }
+                )
+        finish = "tool_calls" if tool_calls else "stop"
+        self._send_event(
+            {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]}
+        )
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_event(
+                {**base, "choices": [], "usage": self._usage(body, len(tokens))}
+            )
+        self._send_event("[DONE]")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Server palsu OpenAI untuk uji streaming"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--reply-file", help="File teks berisi jawaban yang di-stream")
+    parser.add_argument("--script", help="File JSON berisi langkah model ber-skrip")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.ttft_s = args.ttft_ms / 1000
+    FakeOpenAIHandler.token_s = args.token_ms / 1000
+    if args.reply_file:
+        with open(args.reply_file, "r", encoding="utf-8") as f:
+            FakeOpenAIHandler.reply = f.read()
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            FakeOpenAIHandler.script = json.load(f)
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI server di http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# StuntLytics/scripts/load_test_predict.py
+# Uji beban server prediksi (src/prediction_server.py): banyak klien paralel
+# mengirim request satu baris (seperti form), lalu melaporkan latensi & throughput.
+#
+# Pemakaian:
+#   python -m src.prediction_server --port 8765 &
+#   python scripts/load_test_predict.py --url http://127.0.0.1:8765 \
+#       --concurrency 32 --duration 10
+import argparse
+import random
+import statistics
+import threading
+import time
+
+import requests
+
+BASE_RECORD = {
+    "tinggi_badan_ibu_cm": 155,
+    "lila_saat_hamil_cm": 25.0,
+    "bmi_pra_hamil": 22.0,
+    "hb_g_dl": 11.0,
+    "kenaikan_bb_hamil_kg": 12,
+    "usia_ibu_saat_hamil_tahun": 28,
+    "jarak_kehamilan_sebelumnya_bulan": 24,
+    "kunjungan_anc_x": 4,
+    "jumlah_anak": 1,
+    "kepatuhan_ttd": "Rutin",
+    "pendidikan_ibu": "SMA",
+    "jenis_pekerjaan_orang_tua": "Wiraswasta",
+    "status_pernikahan": "Menikah",
+    "kepesertaan_program_bantuan": "Tidak",
+    "akses_air_bersih": "Ya",
+    "paparan_asap_rokok": "Tidak",
+    "hipertensi_ibu": 0,
+    "diabetes_ibu": 0,
+}
+
+
+def _record(rng: random.Random) -> dict:
+    # Variasikan field numerik agar tiap request berbeda
+    rec = dict(BASE_RECORD)
+    rec["tinggi_badan_ibu_cm"] = rng.randint(140, 175)
+    rec["hb_g_dl"] = round(rng.uniform(8.0, 14.0), 1)
+    rec["bmi_pra_hamil"] = round(rng.uniform(16.0, 30.0), 1)
+    rec["kunjungan_anc_x"] = rng.randint(0, 8)
+    return rec
+
+
+def _client(url, rows, deadline, seed, latencies, failures, lock):
+    rng = random.Random(seed)
+    session = requests.Session()
+    local, failed = [], 0
+    while time.perf_counter() < deadline:
+        payload = {"records": [_record(rng) for _ in range(rows)]}
+        started = time.perf_counter()
+        try:
+            r = session.post(url, json=payload, timeout=30)
+            r.raise_for_status()
+            local.append(time.perf_counter() - started)
+        except requests.RequestException:
+            failed += 1
+    with lock:
+        latencies.extend(local)
+        failures.append(failed)
+
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban server prediksi")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=1, help="baris per request")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    latencies, failures, lock = [], [], threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(
+                f"{base}/predict",
+                args.rows,
+                deadline,
+                i,
+                latencies,
+                failures,
+                lock,
+            ),
+        )
+        for i in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ms = [x * 1000 for x in latencies]
+    print(f"Klien paralel : {args.concurrency} ({args.rows} baris/request)")
+    print(f"Request sukses: {len(ms):,}  gagal: {sum(failures):,}")
+    print(
+        f"Throughput    : {len(ms) / elapsed:,.0f} req/dtk, "
+        f"{len(ms) * args.rows / elapsed:,.0f} baris/dtk"
+    )
+    if ms:
+        print(
+            f"Latensi (ms)  : p50 {_percentile(ms, 50):.2f}  p90 {_percentile(ms, 90):.2f}  "
+            f"p99 {_percentile(ms, 99):.2f}  maks {max(ms):.2f}  "
+            f"rata-rata {statistics.fmean(ms):.2f}"
+        )
+    try:
+        health = requests.get(f"{base}/health", timeout=5).json()
+        print(
+            f"Server        : model {health.get('model_version')}, "
+            f"{health.get('batches', 0):,} batch, rata-rata {health.get('avg_batch_rows')} baris/batch"
+        )
+    except requests.RequestException:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# StuntLytics/src/choropleth.py
+# Tahap styling peta risiko yang tervektorisasi: nilai (prevalensi) semua
+# wilayah -> kelas/posisi skala -> warna RGBA (uint8) dalam satu operasi NumPy,
+# sehingga biaya styling dapat diabaikan bahkan di level desa.
+#
+# Skala:
+# - "diverging"  : kontinu biru-kuning-merah 0-50-100% (skema lama)
+# - "sequential" : kontinu YlOrRd, rentang mengikuti data
+# - "quantile"   : k kelas dengan jumlah wilayah seimbang
+# - "threshold"  : kelas ambang kesehatan masyarakat WHO untuk prevalensi
+#                  stunting (<2,5 / 10 / 20 / 30 / >=30 %)
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+RGB = Tuple[int, int, int]
+
+NO_DATA_COLOR = (200, 200, 200, 80)
+YL_OR_RD: Tuple[RGB, ...] = (
+    (255, 255, 178),
+    (254, 204, 92),
+    (253, 141, 60),
+    (240, 59, 32),
+    (189, 0, 38),
+)
+
+
+@dataclass(frozen=True)
+class ColorScale:
+    """
+    Skala kontinu: `colors` pada posisi `stops` (0..1) dalam `domain`
+    (None = min..maks data). Skala berkelas: satu warna per kelas; `breaks`
+    tetap (threshold) atau dihitung dari kuantil data (quantile).
+    """
+
+    label: str
+    kind: str  # "continuous" | "quantile" | "threshold"
+    colors: Tuple[RGB, ...]
+    stops: Tuple[float, ...] = ()
+    domain: Optional[Tuple[float, float]] = None
+    breaks: Tuple[float, ...] = ()
+    alpha: int = 180
+
+
+SCALES: Dict[str, ColorScale] = {
+    "diverging": ColorScale(
+        "Divergen (0-50-100%)",
+        "continuous",
+        ((0, 0, 255), (255, 255, 0), (255, 0, 0)),
+        stops=(0.0, 0.5, 1.0),
+        domain=(0.0, 100.0),
+    ),
+    "sequential": ColorScale(
+        "Sekuensial (rentang data)",
+        "continuous",
+        YL_OR_RD,
+        stops=(0.0, 0.25, 0.5, 0.75, 1.0),
+    ),
+    "quantile": ColorScale("Kuantil (5 kelas)", "quantile", YL_OR_RD),
+    "threshold": ColorScale(
+        "Ambang WHO", "threshold", YL_OR_RD, breaks=(2.5, 10.0, 20.0, 30.0)
+    ),
+}
+DEFAULT_SCALE = "diverging"
+
+
+@dataclass
+class Styling:
+    rgba: np.ndarray  # (n, 4) uint8
+    breaks: np.ndarray  # batas kelas (skala berkelas); kosong untuk kontinu
+    domain: Tuple[float, float]  # rentang nilai yang dipetakan
+
+    @property
+    def key(self) -> str:
+        """Hash pendek warna (untuk update_triggers deck.gl)."""
+        return hashlib.sha1(self.rgba.tobytes()).hexdigest()[:16]
+
+
+def _domain(values: np.ndarray, scale: ColorScale) -> Tuple[float, float]:
+    if scale.domain is not None:
+        return scale.domain
+    finite = values[np.isfinite(values)]
+    if not finite.size:
+        return (0.0, 100.0)
+    return (float(finite.min()), float(finite.max()))
+
+
+def class_breaks(values: np.ndarray, scale: ColorScale) -> np.ndarray:
+    if scale.kind == "threshold":
+        return np.asarray(scale.breaks, dtype=np.float64)
+    if scale.kind == "quantile":
+        finite = values[np.isfinite(values)]
+        if not finite.size:
+            return np.empty(0)
+        q = np.linspace(0, 1, len(scale.colors) + 1)[1:-1]
+        return np.quantile(finite, q)
+    return np.empty(0)
+
+
+def _interpolate(score: np.ndarray, scale: ColorScale) -> np.ndarray:
+    """score (0..1) -> RGB float, linear per segmen antar stop."""
+    stops = np.asarray(scale.stops, dtype=np.float64)
+    colors = np.asarray(scale.colors, dtype=np.float64)
+    seg = np.clip(np.searchsorted(stops, score, side="right") - 1, 0, len(stops) - 2)
+    t = ((score - stops[seg]) / (stops[seg + 1] - stops[seg]))[:, None]
+    a, b = colors[seg], colors[seg + 1]
+    # a == b: pakai a persis (hindari 254 akibat pembulatan a*(1-t) + b*t)
+    return np.where(a == b, a, a * (1 - t) + b * t)
+
+
+def colorize(values, scale: ColorScale) -> Styling:
+    """Nilai per wilayah (NaN = tanpa data) -> warna RGBA untuk semua wilayah."""
+    values = np.asarray(values, dtype=np.float64)
+    rgba = np.empty((len(values), 4), dtype=np.uint8)
+    rgba[:] = NO_DATA_COLOR
+    has = np.isfinite(values)
+    lo, hi = _domain(values, scale)
+    breaks = class_breaks(values, scale)
+    if scale.kind == "continuous":
+        span = hi - lo if hi > lo else 1.0
+        score = np.clip((values[has] - lo) / span, 0.0, 1.0)
+        rgb = np.floor(_interpolate(score, scale))
+    else:
+        classes = np.searchsorted(breaks, values[has], side="right")
+        rgb = np.asarray(scale.colors, dtype=np.float64)[classes]
+    rgba[has, :3] = rgb.astype(np.uint8)
+    rgba[has, 3] = scale.alpha
+    return Styling(rgba=rgba, breaks=breaks, domain=(lo, hi))
+
+
+def _hex(rgb) -> str:
+    return "#{:02X}{:02X}{:02X}".format(*(int(c) for c in rgb[:3]))
+
+
+def legend_items(scale: ColorScale, styling: Styling) -> List[Tuple[str, str]]:
+    """
+    (label, warna hex). Skala kontinu: warna pada tiap stop (untuk gradien);
+    skala berkelas: satu entri per kelas beserta rentangnya.
+    """
+    if scale.kind == "continuous":
+        lo, hi = styling.domain
+        return [
+            (f"{lo + s * (hi - lo):.0f}%", _hex(c))
+            for s, c in zip(scale.stops, scale.colors)
+        ]
+    edges = [f"{b:.1f}".rstrip("0").rstrip(".") for b in styling.breaks]
+    items = []
+    for i, color in enumerate(scale.colors):
+        if i == 0:
+            label = f"< {edges[0]}%" if edges else "Semua"
+        elif i == len(edges):
+            label = f"≥ {edges[-1]}%"
+        elif i < len(edges):
+            label = f"{edges[i - 1]}–{edges[i]}%"
+        else:
+            continue
+        items.append((label, _hex(color)))
+    return items
@@ -0,0 +1,471 @@
+# StuntLytics/src/compiled_scorer.py
+# Scorer ringan tanpa scikit-learn: pipeline yang sudah di-fit (imputer, scaler,
+# one-hot encoder, estimator) dikompilasi menjadi array NumPy yang bisa di-mmap.
+#
+# Ekspor (sekali, butuh scikit-learn):
+#   python -m src.compiled_scorer --pipeline models/stunting_pipeline.joblib \
+#       --out models/stunting_scorer
+# Runtime (hanya NumPy):
+#   scorer = compiled_scorer.load("models/stunting_scorer")
+#   scorer.predict_proba(df)          # sama seperti pipeline.predict_proba
+import json
+import numbers
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+PARITY_TOLERANCE = 1e-9
+
+# Baris per blok saat menelusuri pohon, menjaga matriks node (baris x pohon) tetap kecil
+_TREE_BLOCK_ROWS = 20_000
+
+
+def _is_missing(values: np.ndarray) -> np.ndarray:
+    """None/NaN per elemen (kolom object maupun float)."""
+    return np.array(
+        [v is None or (isinstance(v, float) and v != v) for v in values], dtype=bool
+    )
+
+
+def _is_number(value: Any) -> bool:
+    """Angka non-NaN (termasuk bool/np.bool_); teks bukan angka."""
+    return isinstance(value, (numbers.Number, np.bool_)) and value == value
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    """Kolom -> float64; elemen bukan angka (mis. teks) -> NaN, tidak di-parse."""
+    if values.dtype.kind in "iufb":
+        return values.astype(np.float64)
+    return np.array(
+        [float(v) if _is_number(v) else np.nan for v in values], dtype=np.float64
+    )
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class CompiledScorer:
+    """
+    Pengganti `pipeline.predict_proba` berbasis NumPy murni. Input berupa
+    DataFrame, mapping nama kolom -> array, atau list dict (record form).
+    """
+
+    def __init__(self, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.manifest = manifest
+        self.arrays = arrays
+        self.numeric: List[str] = manifest["numeric"]
+        self.categorical: List[Dict[str, Any]] = manifest["categorical"]
+        self.estimator: str = manifest["estimator"]
+        self.input_fields = self.numeric + [c["name"] for c in self.categorical]
+
+    # --- Transformasi fitur ---
+    def _column(self, X: Any, name: str) -> np.ndarray:
+        if isinstance(X, list):
+            return np.array([row.get(name) for row in X], dtype=object)
+        col = X[name]
+        return col.to_numpy() if hasattr(col, "to_numpy") else np.asarray(col)
+
+    def transform(self, X: Any) -> np.ndarray:
+        """Input mentah -> matriks fitur dengan urutan kolom sama seperti pipeline."""
+        blocks = []
+        if self.numeric:
+            num = np.column_stack(
+                [self._column(X, c).astype(np.float64) for c in self.numeric]
+            )
+            fill = self.arrays["num_fill"]
+            num = np.where(np.isnan(num), fill, num)
+            blocks.append((num - self.arrays["num_mean"]) / self.arrays["num_scale"])
+        for spec in self.categorical:
+            raw = self._column(X, spec["name"])
+            if spec["numeric"]:
+                # Seperti sklearn: 1 == 1.0 cocok, teks "1" tidak
+                values = _as_float(raw)
+                cats = np.asarray(spec["categories"], dtype=np.float64)
+            else:
+                values = raw.astype(str)
+                cats = np.asarray(spec["categories"], dtype=str)
+            if spec.get("fill") is not None:
+                # SimpleImputer sebelum OneHotEncoder: nilai kosong -> nilai isian
+                values = np.where(_is_missing(raw), spec["fill"], values)
+            onehot = values[:, None] == cats[None, :]
+            if spec.get("handle_unknown", "ignore") == "error":
+                unknown = ~onehot.any(axis=1)
+                if unknown.any():
+                    raise ValueError(
+                        f"Kategori tidak dikenal di kolom {spec['name']}: "
+                        f"{sorted(set(map(str, raw[unknown])))}"
+                    )
+            # handle_unknown="ignore": nilai yang tidak dikenal -> semua nol
+            blocks.append(onehot.astype(np.float64))
+        return np.hstack(blocks) if len(blocks) > 1 else blocks[0]
+
+    # --- Estimator ---
+    def _tree_values(self, X: np.ndarray) -> np.ndarray:
+        """Nilai daun tiap pohon, shape (n_baris, n_pohon)."""
+        a = self.arrays
+        # scikit-learn membandingkan fitur dalam float32
+        X32 = X.astype(np.float32).astype(np.float64)
+        roots = a["tree_roots"]
+        out = np.empty((len(X32), len(roots)), dtype=np.float64)
+        for start in range(0, len(X32), _TREE_BLOCK_ROWS):
+            block = X32[start : start + _TREE_BLOCK_ROWS]
+            rows = np.arange(len(block))[:, None]
+            nodes = np.broadcast_to(roots, (len(block), len(roots))).copy()
+            for _ in range(int(self.manifest["max_depth"])):
+                left = a["tree_left"][nodes]
+                is_leaf = left < 0
+                if is_leaf.all():
+                    break
+                feat = a["tree_feature"][nodes]
+                go_left = block[rows, np.maximum(feat, 0)] <= a["tree_threshold"][nodes]
+                nodes = np.where(
+                    is_leaf, nodes, np.where(go_left, left, a["tree_right"][nodes])
+                )
+            out[start : start + len(block)] = a["tree_value"][nodes]
+        return out
+
+    def decision(self, X: np.ndarray) -> np.ndarray:
+        """Probabilitas kelas positif dari matriks fitur."""
+        if self.estimator == "linear":
+            return _sigmoid(X @ self.arrays["coef"] + self.manifest["intercept"])
+        values = self._tree_values(X)
+        if self.estimator == "forest":
+            return values.mean(axis=1)
+        if self.estimator == "gbdt":
+            raw = self.manifest["init_raw"] + self.manifest[
+                "learning_rate"
+            ] * values.sum(axis=1)
+            return _sigmoid(raw)
+        raise ValueError(f"Estimator tidak dikenal: {self.estimator}")
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        p1 = self.decision(self.transform(X))
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict_one(self, record: Mapping[str, Any]) -> float:
+        """Jalur cepat form: satu record dict -> probabilitas kelas positif."""
+        return float(self.decision(self.transform([dict(record)]))[0])
+
+
+def load(directory: str, mmap: bool = True) -> CompiledScorer:
+    """Memuat scorer; array dibuka sebagai memory-map sehingga dibagi antar proses."""
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Format scorer tidak didukung: {manifest.get('format')}")
+    arrays = {
+        name: np.load(
+            os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None
+        )
+        for name in manifest["arrays"]
+    }
+    return CompiledScorer(manifest, arrays)
+
+
+def save(
+    directory: str, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]
+) -> None:
+    """Menulis array (.npy) lalu manifest terakhir, agar direktori parsial tidak terbaca."""
+    os.makedirs(directory, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(arr))
+    manifest = {**manifest, "format": FORMAT_VERSION, "arrays": sorted(arrays)}
+    tmp = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST_FILE))
+
+
+# ==============================================================================
+# EKSPOR DARI PIPELINE SCIKIT-LEARN (impor sklearn hanya di sini)
+# ==============================================================================
+def _unwrap_steps(transformer: Any) -> List[Any]:
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(transformer, Pipeline):
+        return [
+            step for _, step in transformer.steps if step not in (None, "passthrough")
+        ]
+    return [transformer]
+
+
+def _imputer_fill(imputer: Any) -> np.ndarray:
+    """statistics_ SimpleImputer; hanya missing_values=NaN tanpa indikator."""
+    missing = imputer.missing_values
+    if not (isinstance(missing, float) and missing != missing) or imputer.add_indicator:
+        raise NotImplementedError(f"SimpleImputer tidak didukung: {imputer!r}")
+    return imputer.statistics_
+
+
+def _compile_numeric(steps: List[Any], n: int) -> Dict[str, np.ndarray]:
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    fill = np.full(n, np.nan)
+    mean, scale = np.zeros(n), np.ones(n)
+    for step in steps:
+        if isinstance(step, SimpleImputer):
+            fill = _imputer_fill(step).astype(np.float64)
+        elif isinstance(step, StandardScaler):
+            mean = step.mean_ if step.with_mean else np.zeros(n)
+            scale = step.scale_ if step.with_std else np.ones(n)
+        else:
+            raise NotImplementedError(f"Transformer numerik tidak didukung: {step!r}")
+    return {"num_fill": fill, "num_mean": mean, "num_scale": scale}
+
+
+def _compile_categorical(steps: List[Any], columns: List[str]) -> List[Dict[str, Any]]:
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+
+    encoder = steps[-1]
+    if (
+        not isinstance(encoder, OneHotEncoder)
+        or getattr(encoder, "drop_idx_", None) is not None
+    ):
+        raise NotImplementedError(f"Encoder kategorik tidak didukung: {encoder!r}")
+    if getattr(encoder, "_infrequent_enabled", False):
+        raise NotImplementedError(
+            "OneHotEncoder dengan kategori infrequent tidak didukung"
+        )
+    if any(not isinstance(s, SimpleImputer) for s in steps[:-1]):
+        raise NotImplementedError(
+            "Hanya SimpleImputer yang didukung sebelum OneHotEncoder"
+        )
+    # Imputer pertama mengisi semua NaN; imputer berikutnya tidak berefek
+    imputers = steps[:-1]
+    fills = _imputer_fill(imputers[0]) if imputers else [None] * len(columns)
+    specs = []
+    handle_unknown = "error" if encoder.handle_unknown == "error" else "ignore"
+    for col, cats, fill in zip(columns, encoder.categories_, fills):
+        # Blok campuran (teks + biner 0/1) membuat kategori ber-dtype object;
+        # kategori yang semuanya angka tetap dicocokkan sebagai angka
+        numeric = cats.dtype.kind in "iufb" or (
+            len(cats) > 0 and all(_is_number(c) for c in cats)
+        )
+        if fill is not None:
+            fill = float(fill) if numeric else str(fill)
+        specs.append(
+            {
+                "name": col,
+                "numeric": bool(numeric),
+                "categories": [float(c) if numeric else str(c) for c in cats],
+                "fill": fill,
+                "handle_unknown": handle_unknown,
+            }
+        )
+    return specs
+
+
+def _compile_trees(trees: List[Any], leaf_value) -> Dict[str, np.ndarray]:
+    """Gabungkan banyak pohon menjadi array datar dengan indeks node absolut."""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        is_leaf = t.children_left < 0
+        roots.append(offset)
+        feature.append(np.where(is_leaf, -1, t.feature))
+        threshold.append(t.threshold)
+        left.append(np.where(is_leaf, -1, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        value.append(leaf_value(t.value))
+        offset += t.node_count
+    return {
+        "tree_feature": np.concatenate(feature).astype(np.int32),
+        "tree_threshold": np.concatenate(threshold).astype(np.float64),
+        "tree_left": np.concatenate(left).astype(np.int64),
+        "tree_right": np.concatenate(right).astype(np.int64),
+        "tree_value": np.concatenate(value).astype(np.float64),
+        "tree_roots": np.asarray(roots, dtype=np.int64),
+    }
+
+
+def _class_one_fraction(value: np.ndarray) -> np.ndarray:
+    counts = value[:, 0, :]
+    return counts[:, 1] / counts.sum(axis=1)
+
+
+def _compile_estimator(est: Any, n_features: int):
+    from sklearn.ensemble import (
+        ExtraTreesClassifier,
+        GradientBoostingClassifier,
+        RandomForestClassifier,
+    )
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if len(getattr(est, "classes_", [])) != 2:
+        raise NotImplementedError("Hanya klasifikasi biner yang didukung")
+    if isinstance(est, (LogisticRegression, SGDClassifier)):
+        return (
+            {"estimator": "linear", "intercept": float(est.intercept_[0])},
+            {"coef": est.coef_[0].astype(np.float64)},
+        )
+    if isinstance(
+        est, (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier)
+    ):
+        trees = [est] if isinstance(est, DecisionTreeClassifier) else est.estimators_
+        arrays = _compile_trees(trees, _class_one_fraction)
+        depth = max(t.tree_.max_depth for t in trees)
+        return {"estimator": "forest", "max_depth": depth}, arrays
+    if isinstance(est, GradientBoostingClassifier):
+        trees = [stage[0] for stage in est.estimators_]
+        arrays = _compile_trees(trees, lambda v: v[:, 0, 0])
+        init_raw = float(est._raw_predict_init(np.zeros((1, n_features)))[0, 0])
+        depth = max(t.tree_.max_depth for t in trees)
+        return (
+            {
+                "estimator": "gbdt",
+                "max_depth": depth,
+                "learning_rate": float(est.learning_rate),
+                "init_raw": init_raw,
+            },
+            arrays,
+        )
+    raise NotImplementedError(f"Estimator tidak didukung: {type(est).__name__}")
+
+
+def compile_pipeline(pipeline: Any) -> CompiledScorer:
+    """Pipeline(ColumnTransformer, estimator) -> CompiledScorer (in-memory)."""
+    from sklearn.compose import ColumnTransformer
+
+    pre, est = pipeline.steps[0][1], pipeline.steps[-1][1]
+    if len(pipeline.steps) != 2 or not isinstance(pre, ColumnTransformer):
+        raise NotImplementedError("Diharapkan Pipeline([ColumnTransformer, estimator])")
+    if pre.remainder != "drop" and pre._remainder[2]:
+        raise NotImplementedError(
+            "ColumnTransformer remainder selain 'drop' tidak didukung"
+        )
+
+    numeric, categorical, arrays = [], [], {}
+    seen_categorical = False
+    for name, transformer, columns in pre.transformers_:
+        if transformer == "drop" or name == "remainder":
+            continue
+        steps = _unwrap_steps(transformer)
+        if type(steps[-1]).__name__ == "OneHotEncoder":
+            categorical.extend(_compile_categorical(steps, list(columns)))
+            seen_categorical = True
+        else:
+            if seen_categorical:
+                raise NotImplementedError(
+                    "Blok numerik harus mendahului blok kategorik"
+                )
+            numeric_arrays = _compile_numeric(steps, len(columns))
+            for key, arr in numeric_arrays.items():
+                arrays[key] = np.concatenate([arrays.get(key, np.empty(0)), arr])
+            numeric.extend(columns)
+    if not numeric:
+        arrays.update({k: np.empty(0) for k in ("num_fill", "num_mean", "num_scale")})
+
+    n_features = len(numeric) + sum(len(c["categories"]) for c in categorical)
+    est_manifest, est_arrays = _compile_estimator(est, n_features)
+    manifest = {
+        "numeric": list(numeric),
+        "categorical": categorical,
+        "n_features": n_features,
+        "source": type(est).__name__,
+        **est_manifest,
+    }
+    arrays.update(est_arrays)
+    return CompiledScorer(manifest, arrays)
+
+
+def check_parity(pipeline: Any, scorer: CompiledScorer, sample: Any) -> float:
+    """Selisih absolut maksimum probabilitas scorer vs pipeline asli pada `sample`."""
+    expected = pipeline.predict_proba(sample)[:, 1]
+    actual = scorer.predict_proba(sample)[:, 1]
+    return float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+
+
+def export(
+    pipeline: Any, directory: str, sample: Any, tolerance: float = PARITY_TOLERANCE
+) -> Dict[str, Any]:
+    """
+    Kompilasi pipeline, verifikasi paritas pada `sample`, lalu simpan ke `directory`.
+    Artefak tidak ditulis bila selisih probabilitas melebihi `tolerance`.
+    """
+    scorer = compile_pipeline(pipeline)
+    max_diff = check_parity(pipeline, scorer, sample)
+    if max_diff > tolerance:
+        raise ValueError(
+            f"Paritas gagal: selisih probabilitas maksimum {max_diff:.3e} > {tolerance:.0e}"
+        )
+    manifest = {
+        **scorer.manifest,
+        "parity_max_abs_diff": max_diff,
+        "parity_rows": len(sample),
+    }
+    save(directory, manifest, scorer.arrays)
+    return manifest
+
+
+def imputed_fields(scorer: CompiledScorer) -> List[str]:
+    """Kolom input yang nilai kosongnya diisi imputer pipeline."""
+    fill = scorer.arrays["num_fill"]
+    return [c for c, f in zip(scorer.numeric, fill) if not np.isnan(f)] + [
+        c["name"] for c in scorer.categorical if c.get("fill") is not None
+    ]
+
+
+def synthetic_sample(
+    n: int, seed: int = 0, missing: Sequence[str] = (), missing_rate: float = 0.05
+):
+    """
+    Sampel acak dari skema input form untuk uji paritas. Kolom `missing` diberi
+    nilai kosong (NaN/None) agar jalur imputer ikut diuji.
+    """
+    import pandas as pd
+
+    from src import prediction_service
+
+    rng = np.random.default_rng(seed)
+    data = {
+        col: rng.uniform(lo, hi, n).round(1)
+        for col, (lo, hi) in prediction_service.NUMERIC_FIELDS.items()
+    }
+    for col, values in prediction_service.CATEGORICAL_FIELDS.items():
+        data[col] = rng.choice(values, n)
+    for col in prediction_service.BINARY_FIELDS:
+        data[col] = rng.integers(0, 2, n)
+    df = pd.DataFrame(data)[prediction_service.INPUT_FIELDS]
+    for col in missing:
+        mask = rng.random(n) < missing_rate
+        if df[col].dtype.kind in "iub":
+            df[col] = df[col].astype(np.float64)
+        df.loc[mask, col] = np.nan if df[col].dtype.kind == "f" else None
+    return df
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    import joblib
+
+    parser = argparse.ArgumentParser(
+        description="Kompilasi pipeline .joblib ke scorer NumPy"
+    )
+    parser.add_argument("--pipeline", default="models/stunting_pipeline.joblib")
+    parser.add_argument("--out", default="models/stunting_scorer")
+    parser.add_argument("--parity-rows", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    pipeline = joblib.load(args.pipeline)
+    sample = synthetic_sample(
+        args.parity_rows, missing=imputed_fields(compile_pipeline(pipeline))
+    )
+    manifest = export(pipeline, args.out, sample)
+    print(
+        f"Scorer {manifest['source']} ({manifest['n_features']} fitur) ditulis ke {args.out}; "
+        f"selisih paritas maks {manifest['parity_max_abs_diff']:.2e} "
+        f"pada {manifest['parity_rows']:,} baris."
+    )
+
+
+if __name__ == "__main__":
+    main()
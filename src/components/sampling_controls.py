@@ -0,0 +1,60 @@
+# StuntLytics/src/components/sampling_controls.py
+# Kontrol bersama "seluruh data vs sampel acak": pengguna memilih sendiri
+# kompromi antara presisi (margin galat) dan kecepatan.
+from typing import Optional
+
+import streamlit as st
+
+from src import sampling
+
+MARGINS = {
+    "proportion": [0.01, 0.02, 0.03, 0.05],
+    "correlation": [0.03, 0.05, 0.08, 0.10],
+}
+
+
+def _fmt_margin(kind: str, value: float) -> str:
+    return f"±{value * 100:.0f} poin %" if kind == "proportion" else f"±{value:.2f}"
+
+
+def render(
+    key: str, kind: str = "proportion", exact_label: str = "Seluruh data (tepat)"
+) -> Optional[sampling.SamplingPlan]:
+    """
+    Mengembalikan `SamplingPlan` bila mode sampel dipilih, atau None untuk
+    perhitungan atas seluruh data.
+    """
+    mode = st.radio(
+        "Mode perhitungan",
+        [exact_label, "Sampel acak (lebih cepat)"],
+        horizontal=True,
+        key=f"{key}_mode",
+    )
+    if mode == exact_label:
+        return None
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        margin = st.select_slider(
+            "Target margin galat",
+            options=MARGINS[kind],
+            value=MARGINS[kind][1],
+            format_func=lambda v: _fmt_margin(kind, v),
+            key=f"{key}_margin",
+            help="Margin lebih kecil = sampel lebih besar = lebih lambat.",
+        )
+    with c2:
+        confidence = st.selectbox(
+            "Tingkat kepercayaan",
+            [0.90, 0.95, 0.99],
+            index=1,
+            format_func=lambda v: f"{v:.0%}",
+            key=f"{key}_conf",
+        )
+    with c3:
+        stratify = st.checkbox(
+            "Berstrata per kabupaten/kota", value=True, key=f"{key}_strata"
+        )
+    return sampling.SamplingPlan(
+        margin=margin, confidence=confidence, stratify=stratify, kind=kind
+    )
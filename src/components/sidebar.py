@@ -1,22 +1,53 @@
 # StuntLytics/src/components/sidebar.py
 # VERSI FINAL - dengan nama fungsi render() yang standar dan filter risk level
 import streamlit as st
-from typing import Dict, Any, List
-from src import elastic_client as es
+from typing import Dict, Any, List, Optional
+from src import config, elastic_client as es, prefetch
+from src.region_hierarchy import RegionHierarchy
 
-# BARU: Menambahkan kembali definisi RISK_LEVELS
-RISK_LEVELS: List[str] = [
-    "Zona 3 (>=0.70)",
-    "Zona 2 (0.40-<0.70)",
-    "Zona 1 (0.10-<0.40)",
-    "Zona 0 (<0.10)",
-]
+# Label zona risiko; rentang risk_score-nya didefinisikan di config.RISK_ZONES
+RISK_LEVELS: List[str] = list(config.RISK_ZONES)
 
 
-def render() -> Dict[str, Any]:
+def _region_code_filter(wilayah: List[str], kecamatan: List[str]) -> Dict[str, Any]:
+    # Kode wilayah (bila index sudah di-ingest): filter ES memakai field integer
+    try:
+        return es.region_code_filter(wilayah, kecamatan)
+    except ConnectionError:
+        return {}
+
+
+def _prefetch_drilldown(
+    filters: Dict[str, Any],
+    kecamatan_counts: Dict[str, int],
+    view: Optional[prefetch.View],
+) -> None:
+    """Catat pilihan kecamatan; setelah kabupaten dipilih, prefetch anaknya."""
+    choice = (tuple(filters["wilayah"]), tuple(filters["kecamatan"]))
+    if filters["kecamatan"] and st.session_state.get("_prefetch_choice") != choice:
+        prefetch.PREFETCHER.record_choice(filters["wilayah"], filters["kecamatan"])
+    st.session_state["_prefetch_choice"] = choice
+    if view is None or not filters["wilayah"] or filters["kecamatan"]:
+        return
+    ranked = prefetch.PREFETCHER.rank_children(filters["wilayah"], kecamatan_counts)
+    # Filter anak = dict yang akan dikembalikan render() saat kecamatan dipilih
+    children = [
+        {
+            **filters,
+            "kecamatan": [kec],
+            "region_codes": _region_code_filter(filters["wilayah"], [kec]),
+        }
+        for kec in ranked[: config.PREFETCH_MAX_CHILDREN]
+    ]
+    prefetch.drilldown(children, view)
+
+
+def render(prefetch_view: Optional[prefetch.View] = None) -> Dict[str, Any]:
     """
     Merender sidebar filter dinamis yang mengambil opsi dari Elasticsearch
-    dan mengembalikan dictionary berisi pilihan filter.
+    dan mengembalikan dictionary berisi pilihan filter. `prefetch_view`
+    (src/prefetch.py): job halaman untuk satu filter, di-prefetch untuk
+    kecamatan anak yang paling mungkin dibuka berikutnya.
     """
     st.sidebar.header("Filter Data")
 
@@ -24,36 +55,60 @@ def render() -> Dict[str, Any]:
     date_from = st.sidebar.date_input("Tanggal dari", value=None)
     date_to = st.sidebar.date_input("Tanggal sampai", value=None)
 
-    base_filters = {"date_from": date_from, "date_to": date_to}
+    # Opsi wilayah bertingkat dihitung lokal dari pohon wilayah ter-cache
+    # (satu agregasi composite, dimuat ulang hanya bila isi index berubah)
+    try:
+        hierarchy = es.get_region_hierarchy()
+    except ConnectionError:
+        hierarchy = RegionHierarchy.empty()
 
     # Filter Wilayah (Kabupaten/Kota)
-    wilayah_field, wilayah_opts = es.get_filter_options(
-        base_filters, es.CANDIDATES_WILAYAH
+    wilayah_field = hierarchy.wilayah_field
+    wilayah_counts = hierarchy.kabupaten_counts(date_from, date_to)
+    selected_wilayah = st.sidebar.multiselect(
+        "Kabupaten/Kota",
+        options=list(wilayah_counts),
+        format_func=lambda k: f"{k} ({wilayah_counts.get(k, 0):,})",
     )
-    selected_wilayah = st.sidebar.multiselect("Kabupaten/Kota", options=wilayah_opts)
 
     # Filter Kecamatan (berdasarkan pilihan wilayah)
-    kecamatan_field, kecamatan_opts = None, []
+    kecamatan_field, kecamatan_counts = None, {}
     if selected_wilayah:
-        # Buat filter sementara untuk mengambil opsi kecamatan yang relevan
-        tmp_filters_for_kec = dict(base_filters)
-        tmp_filters_for_kec.update(
-            {"wilayah_field": wilayah_field, "wilayah": selected_wilayah}
-        )
-        kecamatan_field, kecamatan_opts = es.get_filter_options(
-            tmp_filters_for_kec, es.CANDIDATES_KECAMATAN, size=3000
+        kecamatan_field = hierarchy.kecamatan_field
+        kecamatan_counts = hierarchy.kecamatan_counts(
+            selected_wilayah, date_from, date_to
         )
 
-    selected_kecamatan = st.sidebar.multiselect("Kecamatan", options=kecamatan_opts)
+    selected_kecamatan = st.sidebar.multiselect(
+        "Kecamatan",
+        options=list(kecamatan_counts),
+        format_func=lambda k: f"{k} ({kecamatan_counts.get(k, 0):,})",
+    )
+    region_codes = _region_code_filter(selected_wilayah, selected_kecamatan)
 
     # BARU: Menambahkan kembali filter Level Risiko
     selected_risk_level = st.sidebar.multiselect("Level Risiko", options=RISK_LEVELS)
 
+    # Mode akurasi query: interaktif (perkiraan, cepat) atau hitungan pasti
+    exact = st.sidebar.toggle(
+        "Hitung tepat (lebih lambat)",
+        value=es.get_accuracy() == es.ACCURACY_EXACT,
+        help="Mati: angka dihitung dari sampel acak dan ditandai ≈ perkiraan.",
+        key="es_exact_mode",
+    )
+    es.set_accuracy(es.ACCURACY_EXACT if exact else es.ACCURACY_INTERACTIVE)
+
     # Tampilkan field yang terdeteksi untuk debug (opsional)
     st.sidebar.caption(f"Field Wilayah: {wilayah_field or 'Tidak terdeteksi'}")
     st.sidebar.caption(f"Field Kecamatan: {kecamatan_field or 'Tidak terdeteksi'}")
+    pf = prefetch.PREFETCHER.stats()
+    if pf["completed"]:
+        st.sidebar.caption(
+            f"Prefetch: {pf['used']}/{pf['completed']} terpakai "
+            f"({pf['hit_rate']:.0%}), {pf['backoffs']}× mundur"
+        )
 
-    return {
+    filters = {
         "date_from": date_from,
         "date_to": date_to,
         "wilayah": selected_wilayah,
@@ -61,4 +116,7 @@ def render() -> Dict[str, Any]:
         "risk_level": selected_risk_level,  # BARU: Mengembalikan pilihan risk_level
         "wilayah_field": wilayah_field,
         "kecamatan_field": kecamatan_field,
+        "region_codes": region_codes,
     }
+    _prefetch_drilldown(filters, kecamatan_counts, prefetch_view)
+    return filters
@@ -12,7 +12,27 @@ NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
 
 # --- Konfigurasi API Lain ---
 DEFAULT_INSIGHT_API = os.getenv("OPENAI_API_KEY")
-DEFAULT_PREDICT_API = None
+# URL endpoint server prediksi (python -m src.prediction_server), mis.
+# http://127.0.0.1:8765/predict. Kosong = prediksi di dalam proses Streamlit.
+DEFAULT_PREDICT_API = os.getenv("PREDICT_API_URL") or None
+
+# --- Mode Akurasi Query Elasticsearch ---
+# "interactive": total hits dibatasi + agregasi di atas random_sampler (angka
+# perkiraan, cepat); "exact": hitungan pasti (laporan & ekspor).
+QUERY_ACCURACY = os.getenv("QUERY_ACCURACY", "interactive")
+INTERACTIVE_TOTAL_HITS = 10_000
+# Target jumlah dokumen yang diagregasi random_sampler per query interaktif
+SAMPLER_TARGET_DOCS = int(os.getenv("SAMPLER_TARGET_DOCS", "200000"))
+SAMPLER_SEED = 42
+
+# --- Prefetch Drill-down (src/prefetch.py) ---
+# Setelah kabupaten dipilih, tampilan kecamatan anak yang paling mungkin dibuka
+# berikutnya dihitung di latar belakang ke cache bersama.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") not in ("0", "false", "False")
+PREFETCH_MAX_CHILDREN = int(os.getenv("PREFETCH_MAX_CHILDREN", "3"))
+PREFETCH_IDLE_S = 1.0  # jeda sejak query pengguna terakhir sebelum prefetch jalan
+PREFETCH_SLOW_S = 2.0  # latensi rata-rata ES di atas ini = ES sibuk, mundur
+PREFETCH_MAX_BACKOFF_S = 60.0
 # --- Konfigurasi Aplikasi Utama ---
 APP_TITLE = "StuntLytics - Dashboard Pemerintah"
 APP_DESCRIPTION = "Dashboard e-Government untuk prediksi risiko stunting, monitoring, dan rekomendasi intervensi berbasis AI."
@@ -22,9 +42,18 @@ APP_DESCRIPTION = "Dashboard e-Government untuk prediksi risiko stunting, monito
 APP_TITLE = "StuntLytics Jawa Barat"
 APP_DESCRIPTION = "Dashboard Analitik & Prediksi Stunting Berbasis Data Terintegrasi"
 
+# --- Zona Risiko Model (label sidebar -> rentang risk_score [gte, lt)) ---
+# Dipakai sidebar (filter), elastic_client (range filter) dan job skoring (risk_zone).
+RISK_ZONES = {
+    "Zona 3 (>=0.70)": (0.70, None),
+    "Zona 2 (0.40-<0.70)": (0.40, 0.70),
+    "Zona 1 (0.10-<0.40)": (0.10, 0.40),
+    "Zona 0 (<0.10)": (None, 0.10),
+}
+
 # --- Aturan untuk Insight Otomatis ---
 # Aturan ini dijalankan pada sampel data yang diambil untuk analisis korelasi.
-# Nama kolom harus sesuai dengan yang didefinisikan di elastic_client.get_numeric_sample_for_corr
+# Nama kolom harus sesuai dengan field `_source` sampel (lihat src/sampling.py)
 # (cth: 'risk_score', 'bmi_pra_hamil', 'berat_lahir_gr', dll.)
 
 INSIGHT_RULES = {
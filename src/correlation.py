@@ -0,0 +1,160 @@
+# StuntLytics/src/correlation.py
+# Korelasi Pearson faktor vs Z-Score atas SELURUH populasi terfilter (bukan
+# sampel 5.000 dokumen pertama).
+#
+# Jalur utama: agregasi `matrix_stats` di ES (hanya angka ringkasan yang
+# ditransfer). Field yang tidak didukung `matrix_stats` (mis. angka yang disimpan
+# sebagai keyword) atau ES yang menolak agregasi tersebut dihitung dengan satu
+# lintasan scroll + akumulasi co-moment (Welford/Chan) per halaman.
+# Hasil di-cache per fingerprint filter (src/query_cache.py).
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src import elastic_client as es
+from src.query_cache import cached
+
+TARGET_FIELD = "ZScore TB/U"
+MIN_PAIRS = 3  # di bawah ini korelasi dianggap tidak terdefinisi
+CACHE_TTL_S = 900.0
+
+
+class PairwiseCoMoments:
+    """
+    Akumulator satu lintasan untuk korelasi target vs k field. Tiap pasangan
+    hanya memakai baris yang kedua nilainya ada (pairwise-complete, sama seperti
+    `DataFrame.corr`). Per chunk dihitung momen lokal lalu digabung dengan
+    rumus Chan et al. sehingga stabil secara numerik.
+    """
+
+    def __init__(self, k: int):
+        self.n = np.zeros(k)
+        self.mean_x = np.zeros(k)
+        self.mean_y = np.zeros(k)
+        self.m2_x = np.zeros(k)
+        self.m2_y = np.zeros(k)
+        self.c_xy = np.zeros(k)
+
+    def update(self, X: np.ndarray, y: np.ndarray) -> None:
+        """X: (n, k) nilai field, y: (n,) target; NaN = kosong."""
+        mask = ~np.isnan(X) & ~np.isnan(y)[:, None]
+        nb = mask.sum(axis=0).astype(np.float64)
+        if not nb.any():
+            return
+        Y = np.broadcast_to(y[:, None], X.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_xb = np.where(mask, X, 0.0).sum(axis=0) / nb
+            mean_yb = np.where(mask, Y, 0.0).sum(axis=0) / nb
+            dx = np.where(mask, X - mean_xb, 0.0)
+            dy = np.where(mask, Y - mean_yb, 0.0)
+            m2_xb = (dx * dx).sum(axis=0)
+            m2_yb = (dy * dy).sum(axis=0)
+            c_xyb = (dx * dy).sum(axis=0)
+
+            na = self.n
+            n = na + nb
+            has = nb > 0
+            w = np.where(has, na * nb / np.where(n > 0, n, 1.0), 0.0)
+            delta_x = np.where(has, mean_xb - self.mean_x, 0.0)
+            delta_y = np.where(has, mean_yb - self.mean_y, 0.0)
+            ratio = np.where(has, nb / np.where(n > 0, n, 1.0), 0.0)
+            self.mean_x = self.mean_x + delta_x * ratio
+            self.mean_y = self.mean_y + delta_y * ratio
+            self.m2_x = self.m2_x + np.where(has, m2_xb, 0.0) + delta_x**2 * w
+            self.m2_y = self.m2_y + np.where(has, m2_yb, 0.0) + delta_y**2 * w
+            self.c_xy = self.c_xy + np.where(has, c_xyb, 0.0) + delta_x * delta_y * w
+        self.n = n
+
+    def correlation(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = self.c_xy / np.sqrt(self.m2_x * self.m2_y)
+        r = np.where(self.n >= MIN_PAIRS, r, np.nan)
+        return np.clip(r, -1.0, 1.0)
+
+
+@cached("corr.numeric_fields", ttl_s=3600.0)
+def numeric_fields(target: str = TARGET_FIELD) -> List[str]:
+    """Field bertipe numerik di mapping, selain target (di-cache; jangan dimutasi)."""
+    return [
+        f
+        for f, t in es.get_field_types().items()
+        if t in es.NUMERIC_ES_TYPES and f != target
+    ]
+
+
+def _split_fields(target: str, fields: Optional[List[str]]) -> Dict[str, List[str]]:
+    """Kelompokkan field: numerik di mapping -> matrix_stats, sisanya -> scroll."""
+    types = es.get_field_types()
+    if fields is None:
+        fields = numeric_fields(target)
+    target_numeric = types.get(target) in es.NUMERIC_ES_TYPES
+    native = [
+        f
+        for f in fields
+        if f != target and target_numeric and types.get(f) in es.NUMERIC_ES_TYPES
+    ]
+    streamed = [f for f in fields if f != target and f not in native]
+    return {"matrix_stats": native, "scroll": streamed}
+
+
+def _scroll_correlations(
+    filters: Dict[str, Any], target: str, fields: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Satu lintasan scroll; hanya field yang diminta yang ikut ditransfer."""
+    acc = PairwiseCoMoments(len(fields))
+    query = es.build_query(filters)["query"]
+    for hits in es.scan_documents(
+        es.STUNTING_INDEX, query=query, source=[target] + fields
+    ):
+        df = pd.DataFrame([h.get("_source", {}) for h in hits])
+        df = df.reindex(columns=[target] + fields)
+        values = df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        acc.update(values[:, 1:], values[:, 0])
+    corr = acc.correlation()
+    return {
+        f: {"count": int(acc.n[i]), "correlation": corr[i]}
+        for i, f in enumerate(fields)
+    }
+
+
+@cached("corr.target", ttl_s=CACHE_TTL_S)
+def target_correlations(
+    filters: Dict[str, Any],
+    target: str = TARGET_FIELD,
+    fields: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Korelasi `target` vs setiap field numerik atas seluruh dokumen terfilter.
+    Kolom: korelasi, n (jumlah pasangan), metode ("matrix_stats"/"scroll").
+    Hasil di-cache bersama; jangan dimutasi.
+    """
+    groups = _split_fields(target, fields)
+    results: Dict[str, Dict[str, Any]] = {}
+    methods: Dict[str, str] = {}
+    if groups["matrix_stats"]:
+        try:
+            results.update(
+                es.get_pairwise_matrix_stats(filters, target, groups["matrix_stats"])
+            )
+            methods.update(dict.fromkeys(groups["matrix_stats"], "matrix_stats"))
+        except ConnectionError:
+            # Mis. modul aggs-matrix-stats tidak tersedia: hitung lewat scroll
+            groups["scroll"] = groups["matrix_stats"] + groups["scroll"]
+    if groups["scroll"]:
+        results.update(_scroll_correlations(filters, target, groups["scroll"]))
+        methods.update(dict.fromkeys(groups["scroll"], "scroll"))
+
+    rows = [
+        {
+            "faktor": f,
+            "korelasi": res["correlation"],
+            "n": res["count"],
+            "metode": methods[f],
+        }
+        for f, res in results.items()
+    ]
+    df = pd.DataFrame(rows, columns=["faktor", "korelasi", "n", "metode"])
+    df["korelasi"] = pd.to_numeric(df["korelasi"], errors="coerce")
+    df.loc[df["n"] < MIN_PAIRS, "korelasi"] = np.nan
+    return df.dropna(subset=["korelasi"]).set_index("faktor")
@@ -1,6 +1,6 @@
 import pandas as pd
 import streamlit as st
-from . import elastic_client, config
+from . import elastic_client, config, region_codes, zscore
 import numpy as np
 
 
@@ -88,9 +88,33 @@ def create_dummy_data() -> pd.DataFrame:
     return df
 
 
-def _normalize_location(series: pd.Series) -> pd.Series:
-    """Mengubah kolom lokasi menjadi format standar (UPPERCASE, STRIPPED)."""
-    return series.astype(str).str.upper().str.strip()
+def _region_dictionary(df, df_balita) -> region_codes.RegionDictionary:
+    """
+    Kamus tersimpan (bila ada), dilengkapi nama data utama & nama BPS. Yang
+    dilengkapi salinan: instance load_default() di-cache dan dipakai bersama.
+    """
+    shared = region_codes.load_default()
+    dictionary = (
+        region_codes.RegionDictionary.from_dict(shared.to_dict())
+        if shared is not None
+        else region_codes.RegionDictionary()
+    )
+    if {"kabupaten", "kecamatan"}.issubset(df.columns):
+        dictionary.extend(df["kabupaten"], df["kecamatan"])
+    if not df_balita.empty:
+        region_codes.extend_from_bps(dictionary, df_balita)
+    return dictionary
+
+
+def _add_region_codes(df, dictionary, kab_col, kec_col=None) -> pd.DataFrame:
+    """Kolom kode_kab/kode_kec (join & group-by) + nama kanonik untuk tampilan."""
+    codes = dictionary.encode(df[kab_col], df[kec_col] if kec_col else None)
+    df["kode_kab"] = codes["kabupaten"]
+    df[kab_col] = dictionary.names("kabupaten", codes["kabupaten"])
+    if kec_col:
+        df["kode_kec"] = codes["kecamatan"]
+        df[kec_col] = dictionary.names("kecamatan", codes["kecamatan"])
+    return df
 
 
 # --- (Logika pemrosesan dan merge data sekarang lebih robust) ---
@@ -122,6 +146,9 @@ def process_and_merge_data(df_stunting, df_balita, df_nakes):
         "Jumlah Anak": "tanggungan",
         "Pendidikan Ibu": "pendidikan_ibu",
         "Berat Lahir (gram)": "berat_lahir_gram",
+        "Jenis Kelamin Anak": "jenis_kelamin",
+        "Tinggi Badan Anak (cm)": "tinggi_badan_anak_cm",
+        "Berat Badan Anak (kg)": "berat_badan_anak_kg",
         # !! INI DIA BIANG KEROKNYA: Kolom 'Status Stunting (Biner)' tidak ada, kita hapus dari mapping !!
         # 'Status Stunting (Biner)': 'is_stunting'
     }
@@ -135,10 +162,33 @@ def process_and_merge_data(df_stunting, df_balita, df_nakes):
             == "Stunting"
         ).astype(int)
 
-    if "kabupaten" in df.columns:
-        df["kabupaten"] = _normalize_location(df["kabupaten"])
-    if "kecamatan" in df.columns:
-        df["kecamatan"] = _normalize_location(df["kecamatan"])
+    # Z-score TB/U & BB/U dihitung dari antropometri mentah (WHO LMS, src/zscore.py)
+    # sehingga record tanpa status stunting tetap bisa diklasifikasikan
+    if {"usia_anak_bulan", "jenis_kelamin"}.issubset(df.columns):
+        df = zscore.add_zscores(
+            df,
+            "usia_anak_bulan",
+            "jenis_kelamin",
+            height_col="tinggi_badan_anak_cm",
+            weight_col="berat_badan_anak_kg",
+        )
+        if "zscore_tb_u" in df.columns:
+            by_zscore = df["zscore_tb_u"] < zscore.STUNTING_CUTOFF
+            status_col = "Status Stunting (Stunting / Berisiko / Normal)"
+            no_status = (
+                df[status_col].isna()
+                if status_col in df.columns
+                else pd.Series(True, index=df.index)
+            )
+            fill = no_status & df["zscore_tb_u"].notna()
+            if "is_stunting" not in df.columns:
+                df["is_stunting"] = 0
+            df.loc[fill, "is_stunting"] = by_zscore[fill].astype(int)
+
+    # Semua join & group-by wilayah di bawah memakai kode integer
+    dictionary = _region_dictionary(df, df_balita)
+    if {"kabupaten", "kecamatan"}.issubset(df.columns):
+        df = _add_region_codes(df, dictionary, "kabupaten", "kecamatan")
 
     binary_cols = {
         "asi_eksklusif": "Ya",
@@ -155,21 +205,12 @@ def process_and_merge_data(df_stunting, df_balita, df_nakes):
 
     # --- TAHAP 2: Proses dan Agregasi Data Pendukung ---
     if not df_balita.empty:
-        df_balita = df_balita.rename(
-            columns={
-                "bps_nama_kabupaten_kota": "kabupaten",
-                "bps_nama_kecamatan": "kecamatan",
-            }
-        )
-        df_balita["kabupaten"] = _normalize_location(df_balita["kabupaten"])
-        df_balita["kecamatan"] = _normalize_location(df_balita["kecamatan"])
-        balita_agg = (
-            df_balita.groupby(["kabupaten", "kecamatan"])["jumlah_balita"]
-            .sum()
-            .reset_index()
+        df_balita = _add_region_codes(
+            df_balita, dictionary, "bps_nama_kabupaten_kota", "bps_nama_kecamatan"
         )
+        balita_agg = df_balita.groupby("kode_kec")["jumlah_balita"].sum().reset_index()
         balita_agg = balita_agg.rename(columns={"jumlah_balita": "total_bayi_lahir"})
-        df = pd.merge(df, balita_agg, on=["kabupaten", "kecamatan"], how="left")
+        df = pd.merge(df, balita_agg, on="kode_kec", how="left")
 
     if not df_nakes.empty:
         df_nakes = df_nakes.rename(
@@ -178,19 +219,18 @@ def process_and_merge_data(df_stunting, df_balita, df_nakes):
                 "jumlah_nakes_gizi": "jumlah_nakes",
             }
         )
-        df_nakes["kabupaten"] = _normalize_location(df_nakes["kabupaten"])
-        nakes_agg = df_nakes.groupby("kabupaten")["jumlah_nakes"].sum().reset_index()
-        df = pd.merge(df, nakes_agg, on="kabupaten", how="left")
+        dictionary.extend(df_nakes["kabupaten"])
+        df_nakes = _add_region_codes(df_nakes, dictionary, "kabupaten")
+        nakes_agg = df_nakes.groupby("kode_kab")["jumlah_nakes"].sum().reset_index()
+        df = pd.merge(df, nakes_agg, on="kode_kab", how="left")
 
     # --- TAHAP 3: Finalisasi & Pembersihan ---
     if "is_stunting" in df.columns:
-        stunting_count = (
-            df.groupby(["kabupaten", "kecamatan"])["is_stunting"].sum().reset_index()
-        )
+        stunting_count = df.groupby("kode_kec")["is_stunting"].sum().reset_index()
         stunting_count = stunting_count.rename(
             columns={"is_stunting": "total_bayi_stunting"}
         )
-        df = pd.merge(df, stunting_count, on=["kabupaten", "kecamatan"], how="left")
+        df = pd.merge(df, stunting_count, on="kode_kec", how="left")
 
     required_cols = [
         "bblr",
@@ -1,9 +1,20 @@
 # StuntLytics/src/elastic_client.py
 # VERSI FINAL (dengan perbaikan bug .keyword) - Mesin utama untuk mengambil data dari Elasticsearch
 import os
+import json
+import functools
+import threading
+import time
 import requests
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src import config, geo_tiles, region_codes
+from src.query_cache import SHARED_CACHE, QueryCache, cached, fingerprint
+from src.region_hierarchy import MISSING_DAY, RegionHierarchy
 
 try:
     from pathlib import Path
@@ -20,6 +31,13 @@ NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
 
 CANDIDATES_WILAYAH = ["nama_kabupaten_kota", "Wilayah"]
 CANDIDATES_KECAMATAN = ["Kecamatan"]
+CANDIDATES_DESA = ["Desa", "Desa/Kelurahan", "Kelurahan", "desa"]
+CANDIDATES_LOKASI = ["Lokasi", "lokasi", "location", "Koordinat"]  # geo_point
+DATE_FIELD = "Tanggal"
+
+# Field hasil job skoring (src/scoring_job.py)
+RISK_SCORE_FIELD = "risk_score"
+RISK_ZONE_FIELD = "risk_zone"
 
 
 # --- Helper Functions (ping, _es_post, build_query) ---
@@ -27,11 +45,68 @@ def _es_post(
     index: str, path: str, body: Dict[str, Any], timeout: int = 60
 ) -> Dict[str, Any]:
     try:
-        r = requests.post(f"{ES_URL}/{index}{path}", json=body, timeout=timeout)
-        r.raise_for_status()
+        with _tracked():
+            r = requests.post(f"{ES_URL}/{index}{path}", json=body, timeout=timeout)
+            r.raise_for_status()
         return r.json()
     except requests.exceptions.RequestException as e:
-        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+        raise ConnectionError(
+            f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}"
+        ) from e
+
+
+# --- Beban ES (dibaca src/prefetch.py untuk mundur saat ES sibuk) ---
+_load_lock = threading.Lock()
+_load = {
+    "inflight": 0,  # query pengguna yang sedang berjalan
+    "last_foreground_s": float("-inf"),  # time.monotonic() query pengguna terakhir
+    "last_error_s": float("-inf"),  # 429/5xx/timeout terakhir
+}
+_background: ContextVar[bool] = ContextVar("es_background", default=False)
+
+
+@contextmanager
+def background():
+    """Query di dalam blok dihitung sebagai kerja latar (prefetch), bukan pengguna."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def _is_overload(exc: requests.exceptions.RequestException) -> bool:
+    response = getattr(exc, "response", None)
+    return (
+        response is None or response.status_code == 429 or response.status_code >= 500
+    )
+
+
+@contextmanager
+def _tracked():
+    foreground = not _background.get()
+    if foreground:
+        with _load_lock:
+            _load["inflight"] += 1
+    overloaded = False
+    try:
+        yield
+    except requests.exceptions.RequestException as e:
+        overloaded = _is_overload(e)
+        raise
+    finally:
+        end = time.monotonic()
+        with _load_lock:
+            if foreground:
+                _load["inflight"] -= 1
+                _load["last_foreground_s"] = end
+            if overloaded:
+                _load["last_error_s"] = end
+
+
+def load_snapshot() -> Dict[str, float]:
+    with _load_lock:
+        return dict(_load)
 
 
 def ping() -> Tuple[bool, str]:
@@ -50,34 +125,400 @@ def build_query(filters: Dict[str, Any]) -> Dict[str, Any]:
             rng["gte"] = filters["date_from"].isoformat()
         if filters.get("date_to"):
             rng["lte"] = filters["date_to"].isoformat()
-        must.append({"range": {"Tanggal": rng}})
+        must.append({"range": {DATE_FIELD: rng}})
+    codes = filters.get("region_codes") or {}
     if filters.get("wilayah_field") and filters.get("wilayah"):
-        must.append({"terms": {filters["wilayah_field"]: filters["wilayah"]}})
+        must.append(
+            _region_clause(
+                filters["wilayah_field"], filters["wilayah"], "kode_kab", codes
+            )
+        )
     if filters.get("kecamatan_field") and filters.get("kecamatan"):
-        must.append({"terms": {filters["kecamatan_field"]: filters["kecamatan"]}})
+        must.append(
+            _region_clause(
+                filters["kecamatan_field"], filters["kecamatan"], "kode_kec", codes
+            )
+        )
+    if filters.get("risk_level"):
+        must.append(_risk_level_clause(filters["risk_level"]))
     return {"query": {"bool": {"must": must}}} if must else {"query": {"match_all": {}}}
 
 
-# --- Fungsi untuk Sidebar ---
-def get_filter_options(
-    base_filters: Dict[str, Any], field_candidates: List[str], size: int = 500
-) -> Tuple[Optional[str], List[str]]:
-    for field in field_candidates:
+def _region_clause(
+    field: str, names: List[str], code_field: str, codes: Dict[str, List[int]]
+) -> Dict[str, Any]:
+    """
+    Filter wilayah per nama, atau per kode integer (src/region_codes.py) bila
+    sidebar menyertakan kodenya. Dokumen yang belum di-ingest (tanpa field kode)
+    tetap difilter per nama.
+    """
+    by_name = {"terms": {field: names}}
+    if not codes.get(code_field):
+        return by_name
+    uncoded = {
+        "bool": {"must_not": [{"exists": {"field": code_field}}], "filter": [by_name]}
+    }
+    return {
+        "bool": {
+            "should": [{"terms": {code_field: codes[code_field]}}, uncoded],
+            "minimum_should_match": 1,
+        }
+    }
+
+
+def _risk_level_clause(levels: List[str]) -> Dict[str, Any]:
+    """Zona risiko -> range filter pada risk_score yang ditulis job skoring."""
+    should = []
+    for label in levels:
+        lo, hi = config.RISK_ZONES.get(label, (None, None))
+        rng = {}
+        if lo is not None:
+            rng["gte"] = lo
+        if hi is not None:
+            rng["lt"] = hi
+        if rng:
+            should.append({"range": {RISK_SCORE_FIELD: rng}})
+    return {"bool": {"should": should, "minimum_should_match": 1}}
+
+
+# --- Mode akurasi (interactive vs exact) ---
+ACCURACY_INTERACTIVE = "interactive"
+ACCURACY_EXACT = "exact"
+ACCURACY_MODES = (ACCURACY_INTERACTIVE, ACCURACY_EXACT)
+
+# Per konteks (thread skrip Streamlit / task), bukan global proses, agar pilihan
+# satu sesi tidak bocor ke sesi lain
+_accuracy: ContextVar[str] = ContextVar(
+    "es_accuracy",
+    default=(
+        config.QUERY_ACCURACY
+        if config.QUERY_ACCURACY in ACCURACY_MODES
+        else ACCURACY_INTERACTIVE
+    ),
+)
+_sampler_supported = True  # False setelah ES menolak random_sampler (ES < 8.2)
+
+
+def get_accuracy() -> str:
+    return _accuracy.get()
+
+
+def set_accuracy(mode: str) -> None:
+    if mode not in ACCURACY_MODES:
+        raise ValueError(f"Mode akurasi tidak dikenal: {mode}")
+    _accuracy.set(mode)
+
+
+@contextmanager
+def accuracy(mode: str):
+    """Menjalankan blok dengan mode akurasi tertentu, mis. exact untuk ekspor."""
+    if mode not in ACCURACY_MODES:
+        raise ValueError(f"Mode akurasi tidak dikenal: {mode}")
+    token = _accuracy.set(mode)
+    try:
+        yield
+    finally:
+        _accuracy.reset(token)
+
+
+def with_accuracy(mode: str):
+    """Dekorator versi `accuracy()`."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with accuracy(mode):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _is_exact() -> bool:
+    return _accuracy.get() == ACCURACY_EXACT
+
+
+def _track_total_hits() -> Any:
+    return True if _is_exact() else config.INTERACTIVE_TOTAL_HITS
+
+
+def _terms(field: str, size: int) -> Dict[str, Any]:
+    """Agregasi terms; mode interaktif tidak meminta kandidat ekstra per shard."""
+    terms: Dict[str, Any] = {"field": field, "size": size}
+    if not _is_exact():
+        terms["shard_size"] = size
+    return {"terms": terms}
+
+
+def _index_doc_count(index: str) -> int:
+    def count() -> int:
+        try:
+            r = requests.get(f"{ES_URL}/{index}/_count", timeout=10)
+            r.raise_for_status()
+            return int(r.json().get("count", 0))
+        except requests.exceptions.RequestException:
+            return 0
+
+    return SHARED_CACHE.get_or_compute(f"es.doc_count:{index}", count, ttl_s=600)
+
+
+def _filter_doc_count(index: str, query: Dict[str, Any]) -> int:
+    """Jumlah dokumen yang cocok dengan `query` (satu `_count`, di-cache)."""
+
+    def count() -> int:
+        return int(_es_post(index, "/_count", {"query": query}).get("count", 0))
+
+    key = f"es.filter_count:{index}:{fingerprint(query)}"
+    return SHARED_CACHE.get_or_compute(key, count, ttl_s=600)
+
+
+def _rejects_sampler(exc: BaseException) -> bool:
+    """400 dari ES yang menyebut random_sampler (agregasi tidak dikenal, ES < 8.2)."""
+    response = getattr(exc, "response", None)
+    return (
+        response is not None
+        and response.status_code == 400
+        and "random_sampler" in response.text
+    )
+
+
+def _probability_for(docs: int) -> float:
+    """ES hanya menerima p <= 0,5 atau tepat 1."""
+    p = config.SAMPLER_TARGET_DOCS / docs if docs > 0 else 1.0
+    return 1.0 if p > 0.5 else float(f"{p:.2g}")
+
+
+def _sampling_probability(index: str, query: Dict[str, Any]) -> float:
+    """
+    Probabilitas random_sampler agar ~SAMPLER_TARGET_DOCS dokumen *terfilter*
+    diagregasi; mode exact selalu 1. Jumlah dokumen index (ter-cache) menyaring
+    index kecil tanpa request; selebihnya satu `_count` filter (ter-cache).
+    """
+    if _is_exact() or not _sampler_supported:
+        return 1.0
+    if _probability_for(_index_doc_count(index)) >= 1.0:
+        return 1.0
+    return _probability_for(_filter_doc_count(index, query))
+
+
+def _search_sampled(
+    index: str, body: Dict[str, Any], aggs: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any], float]:
+    """
+    Menjalankan `body` dengan `aggs` dibungkus random_sampler (bila mode
+    interaktif & hasil filter cukup besar). Hasil: (response, aggregations, p).
+    Hitungan dokumen di dalam agregasi perlu dibagi p.
+    """
+    global _sampler_supported
+    p = _sampling_probability(index, body.get("query", {"match_all": {}}))
+    if p < 1.0:
+        sampled = {
+            **body,
+            "aggs": {
+                "sampled": {
+                    "random_sampler": {
+                        "probability": p,
+                        "seed": config.SAMPLER_SEED,
+                    },
+                    "aggs": aggs,
+                }
+            },
+        }
         try:
-            body = build_query(base_filters)
-            # FIX: Gunakan nama field langsung dari candidates, tanpa menambahkan .keyword
-            body.update(
-                {"size": 0, "aggs": {"opts": {"terms": {"field": field, "size": size}}}}
+            data = _es_post(index, "/_search", sampled)
+            return data, data.get("aggregations", {}).get("sampled", {}), p
+        except ConnectionError as e:
+            # Hanya penolakan random_sampler (ES < 8.2) yang mematikan sampler;
+            # timeout/429/5xx diteruskan apa adanya
+            if not _rejects_sampler(e.__cause__):
+                raise
+            _sampler_supported = False
+    data = _es_post(index, "/_search", {**body, "aggs": aggs})
+    return data, data.get("aggregations", {}), 1.0
+
+
+# --- Helper untuk job offline (scan seluruh index & bulk update) ---
+def scan_documents(
+    index: str,
+    query: Optional[Dict[str, Any]] = None,
+    source: Optional[List[str]] = None,
+    batch_size: int = 5000,
+    scroll: str = "5m",
+) -> Iterator[List[Dict[str, Any]]]:
+    """Mengalirkan seluruh dokumen yang cocok per halaman menggunakan scroll API."""
+    body: Dict[str, Any] = {
+        "size": batch_size,
+        "sort": ["_doc"],
+        "query": query or {"match_all": {}},
+    }
+    if source is not None:
+        body["_source"] = source
+    data = _es_post(index, f"/_search?scroll={scroll}", body)
+    scroll_id = data.get("_scroll_id")
+    try:
+        while True:
+            hits = data.get("hits", {}).get("hits", [])
+            if not hits:
+                break
+            yield hits
+            r = requests.post(
+                f"{ES_URL}/_search/scroll",
+                json={"scroll": scroll, "scroll_id": scroll_id},
+                timeout=120,
+            )
+            r.raise_for_status()
+            data = r.json()
+            scroll_id = data.get("_scroll_id", scroll_id)
+    finally:
+        if scroll_id:
+            try:
+                requests.delete(
+                    f"{ES_URL}/_search/scroll",
+                    json={"scroll_id": scroll_id},
+                    timeout=10,
+                )
+            except requests.exceptions.RequestException:
+                pass
+
+
+def put_mapping(index: str, properties: Dict[str, Any]) -> None:
+    """Menambahkan field baru ke mapping index (idempoten untuk tipe yang sama)."""
+    try:
+        r = requests.put(
+            f"{ES_URL}/{index}/_mapping", json={"properties": properties}, timeout=30
+        )
+        r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+
+
+def bulk_update(
+    index: str, updates: Iterable[Tuple[str, Dict[str, Any]]], timeout: int = 120
+) -> Dict[str, int]:
+    """Partial update (`doc`) banyak dokumen sekaligus lewat `_bulk`."""
+    lines = []
+    for doc_id, doc in updates:
+        lines.append(json.dumps({"update": {"_id": doc_id}}))
+        lines.append(json.dumps({"doc": doc}, ensure_ascii=False))
+    if not lines:
+        return {"updated": 0, "errors": 0}
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    try:
+        r = requests.post(
+            f"{ES_URL}/{index}/_bulk",
+            data=payload,
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=timeout,
+        )
+        r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+    items = r.json().get("items", [])
+    errors = sum(1 for it in items if it.get("update", {}).get("error"))
+    return {"updated": len(items) - errors, "errors": errors}
+
+
+def search(body: Dict[str, Any], index: str = STUNTING_INDEX) -> Dict[str, Any]:
+    return _es_post(index, "/_search", body)
+
+
+def msearch(
+    bodies: List[Dict[str, Any]], index: str = STUNTING_INDEX, timeout: int = 60
+) -> List[Dict[str, Any]]:
+    """Banyak pencarian dalam satu round-trip (`_msearch`); urutan hasil = urutan body."""
+    if not bodies:
+        return []
+    lines = []
+    for body in bodies:
+        lines.append("{}")
+        lines.append(json.dumps(body, ensure_ascii=False))
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    try:
+        with _tracked():
+            r = requests.post(
+                f"{ES_URL}/{index}/_msearch",
+                data=payload,
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=timeout,
             )
-            data = _es_post(STUNTING_INDEX, "/_search", body)
-            buckets = data.get("aggregations", {}).get("opts", {}).get("buckets", [])
-            if buckets:
-                options = [b["key"] for b in buckets]
-                # FIX: Kembalikan nama field yang berhasil, bukan field + .keyword
-                return field, sorted(options)
-        except Exception:
-            continue
-    return None, []
+            r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+    responses = r.json().get("responses", [])
+    for res in responses:
+        if "error" in res:
+            raise ConnectionError(f"Query _msearch gagal: {res['error']}")
+    return responses
+
+
+# --- Fungsi untuk Sidebar ---
+INDEX_FINGERPRINT_TTL_S = 30.0  # jeda cek perubahan index (_stats)
+HIERARCHY_PAGE_SIZE = 10_000
+_MS_PER_DAY = 86_400_000
+# Cache terpisah: pohon wilayah tidak tergusur LRU hasil query lain
+_HIERARCHY_CACHE = QueryCache(max_entries=4, ttl_s=24 * 3600.0)
+
+
+@cached("es.index_fingerprint", ttl_s=INDEX_FINGERPRINT_TTL_S)
+def index_fingerprint(index: str = STUNTING_INDEX) -> str:
+    """Berubah setiap kali dokumen index ditambah/diubah/dihapus (atau index dibuat ulang)."""
+    try:
+        r = requests.get(f"{ES_URL}/{index}/_stats/docs,indexing", timeout=10)
+        r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+    stats = r.json()
+    primaries = stats.get("_all", {}).get("primaries", {})
+    docs, indexing = primaries.get("docs", {}), primaries.get("indexing", {})
+    return fingerprint(
+        sorted(v.get("uuid", k) for k, v in stats.get("indices", {}).items()),
+        docs.get("count"),
+        docs.get("deleted"),
+        indexing.get("index_total"),
+        indexing.get("delete_total"),
+    )
+
+
+@cached("es.region_hierarchy", cache=_HIERARCHY_CACHE)
+def _load_region_hierarchy(index_fp: str) -> RegionHierarchy:
+    """
+    Pohon kabupaten -> kecamatan -> hari dalam satu agregasi composite
+    (berhalaman) atas seluruh index. `index_fp` hanya kunci cache.
+    """
+    types = get_field_types()
+    kab_field = next((f for f in CANDIDATES_WILAYAH if types.get(f) == "keyword"), None)
+    kec_field = next(
+        (f for f in CANDIDATES_KECAMATAN if types.get(f) == "keyword"), None
+    )
+    if kab_field is None:
+        return RegionHierarchy.empty()
+    sources: List[Tuple[str, Any]] = [
+        ("kab", {"terms": {"field": kab_field, "missing_bucket": True}})
+    ]
+    if kec_field:
+        sources.append(("kec", {"terms": {"field": kec_field, "missing_bucket": True}}))
+    if types.get(DATE_FIELD) == "date":
+        day = {"field": DATE_FIELD, "calendar_interval": "day", "missing_bucket": True}
+        sources.append(("day", {"date_histogram": day}))
+
+    kab, kec, days, counts = [], [], [], []
+    for page in iter_composite(
+        STUNTING_INDEX, {"query": {"match_all": {}}}, sources, None, HIERARCHY_PAGE_SIZE
+    ):
+        for b in page:
+            key = b["key"]
+            kab.append(key["kab"])
+            kec.append(key.get("kec"))
+            ms = key.get("day")
+            days.append(MISSING_DAY if ms is None else ms // _MS_PER_DAY)
+            counts.append(b["doc_count"])
+    return RegionHierarchy.from_rows(kab_field, kec_field, kab, kec, days, counts)
+
+
+def get_region_hierarchy() -> RegionHierarchy:
+    """Pohon wilayah ter-cache; dimuat ulang hanya bila fingerprint index berubah."""
+    return _load_region_hierarchy(index_fingerprint())
 
 
 # --- Fungsi Utama untuk app.py ---
@@ -87,54 +528,44 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
 
     # 1. Query Utama untuk Index Stunting
     stunting_body = build_query(filters)
-    stunting_body.update(
-        {
-            "size": 0,
-            "track_total_hits": True,
+    stunting_body.update({"size": 0, "track_total_hits": _track_total_hits()})
+    stunting_aggs = {
+        "n_docs": {"filter": {"match_all": {}}},
+        "stunting_count": {
+            "filter": {
+                "bool": {
+                    "should": [
+                        # FIX: Menghapus .keyword
+                        {"terms": {"Status Stunting (Biner)": stunting_labels}},
+                        {"range": {"Z-Score TB/U": {"lte": -2.0}}},
+                    ],
+                    "minimum_should_match": 1,
+                }
+            }
+        },
+        # FIX: Menghapus .keyword
+        "imunisasi_lengkap": {
+            "filter": {"terms": {"Status Imunisasi Anak": ["lengkap", "Lengkap"]}}
+        },
+        # FIX: Menghapus .keyword
+        "total_imunisasi_field": {"value_count": {"field": "Status Imunisasi Anak"}},
+        # FIX: Menghapus .keyword
+        "air_bersih_dist": _terms("Akses Air Bersih", 5),
+        "imunisasi_trend": {
+            "date_histogram": {
+                "field": "Tanggal",
+                "calendar_interval": "month",
+                "format": "yyyy-MM",
+            },
             "aggs": {
-                "stunting_count": {
-                    "filter": {
-                        "bool": {
-                            "should": [
-                                # FIX: Menghapus .keyword
-                                {"terms": {"Status Stunting (Biner)": stunting_labels}},
-                                {"range": {"Z-Score TB/U": {"lte": -2.0}}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    }
-                },
-                # FIX: Menghapus .keyword
-                "imunisasi_lengkap": {
+                "imunisasi_lengkap_in_bucket": {
                     "filter": {
                         "terms": {"Status Imunisasi Anak": ["lengkap", "Lengkap"]}
                     }
-                },
-                # FIX: Menghapus .keyword
-                "total_imunisasi_field": {
-                    "value_count": {"field": "Status Imunisasi Anak"}
-                },
-                # FIX: Menghapus .keyword
-                "air_bersih_dist": {"terms": {"field": "Akses Air Bersih", "size": 5}},
-                "imunisasi_trend": {
-                    "date_histogram": {
-                        "field": "Tanggal",
-                        "calendar_interval": "month",
-                        "format": "yyyy-MM",
-                    },
-                    "aggs": {
-                        "imunisasi_lengkap_in_bucket": {
-                            "filter": {
-                                "terms": {
-                                    "Status Imunisasi Anak": ["lengkap", "Lengkap"]
-                                }
-                            }
-                        }
-                    },
-                },
+                }
             },
-        }
-    )
+        },
+    }
 
     # 2. Query untuk Index Nakes
     nakes_must_clause = []
@@ -152,33 +583,46 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
         "total_nakes": {"sum": {"field": "jumlah_nakes_gizi"}},
         "nakes_by_region": {
             # FIX: Menghapus .keyword
-            "terms": {"field": "nama_kabupaten_kota", "size": 100},
+            **_terms("nama_kabupaten_kota", 100),
             "aggs": {"sum_nakes_in_bucket": {"sum": {"field": "jumlah_nakes_gizi"}}},
         },
     }
 
     # Eksekusi Query
-    stunting_data = _es_post(STUNTING_INDEX, "/_search", stunting_body)
+    stunting_data, s_agg, probability = _search_sampled(
+        STUNTING_INDEX, stunting_body, stunting_aggs
+    )
     nakes_data = _es_post(NUTRITION_INDEX, "/_search", nakes_body)
 
     # Proses Hasil
-    s_agg = stunting_data.get("aggregations", {})
     n_agg = nakes_data.get("aggregations", {})
 
-    total_lahir = stunting_data.get("hits", {}).get("total", {}).get("value", 0)
-    total_stunting = s_agg.get("stunting_count", {}).get("doc_count", 0)
+    # Hitungan dari sampel diskalakan dengan estimator rasio: total x (k / n)
+    total_hits = stunting_data.get("hits", {}).get("total", {})
+    n_docs = s_agg.get("n_docs", {}).get("doc_count", 0)
+    if probability < 1.0:
+        total_lahir = round(n_docs / probability)
+    elif total_hits.get("relation", "eq") == "eq":
+        total_lahir = total_hits.get("value", 0)
+    else:
+        total_lahir = n_docs
+    scale = (total_lahir / n_docs) if n_docs else 0.0
+    total_stunting = round(s_agg.get("stunting_count", {}).get("doc_count", 0) * scale)
 
     imun_lengkap = s_agg.get("imunisasi_lengkap", {}).get("doc_count", 0)
     imun_total = s_agg.get("total_imunisasi_field", {}).get("value", 0)
     imun_cov_pct = (imun_lengkap / imun_total * 100) if imun_total > 0 else 0
 
     air_buckets = s_agg.get("air_bersih_dist", {}).get("buckets", [])
-    air_layak_count = sum(
-        b["doc_count"]
-        for b in air_buckets
-        if b["key"] in ["Layak", "Ya", "Bersih", "Aman"]
+    air_layak_count = round(
+        sum(
+            b["doc_count"]
+            for b in air_buckets
+            if b["key"] in ["Layak", "Ya", "Bersih", "Aman"]
+        )
+        * scale
     )
-    air_total = sum(b["doc_count"] for b in air_buckets)
+    air_total = round(sum(b["doc_count"] for b in air_buckets) * scale)
     air_cov_pct = (air_layak_count / air_total * 100) if air_total > 0 else 0
 
     nakes_buckets = n_agg.get("nakes_by_region", {}).get("buckets", [])
@@ -230,9 +674,27 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
             "imunisasi_trend": imunisasi_per_bulan,
             "air_distribusi": air_layak_data,
         },
+        # approximate=True: angka dari random_sampler (mode interaktif)
+        "meta": {
+            "accuracy": get_accuracy(),
+            "approximate": probability < 1.0,
+            "sampling_probability": probability,
+        },
     }
 
 
+SUMMARY_CACHE_TTL_S = 300.0
+
+
+@cached("es.page_summary", ttl_s=SUMMARY_CACHE_TTL_S)
+def get_cached_main_page_summary(
+    filters: Dict[str, Any], mode: str = ACCURACY_INTERACTIVE
+) -> Dict[str, Any]:
+    """`get_main_page_summary` ter-cache per (filter, mode akurasi)."""
+    with accuracy(mode):
+        return get_main_page_summary(filters)
+
+
 # --- Fungsi BARU untuk correlation_trend.py (Meniru Referensi ES) ---
 
 
@@ -242,82 +704,125 @@ def get_monthly_trend(filters: Dict[str, Any]) -> pd.DataFrame:
     Menghitung persentase stunting (bukan risiko tinggi).
     """
     body = build_query(filters)
-    body.update(
-        {
-            "size": 0,
+    body.update({"size": 0, "track_total_hits": _track_total_hits()})
+    aggs = {
+        "per_month": {
+            "date_histogram": {
+                "field": "Tanggal",
+                "calendar_interval": "month",
+            },
             "aggs": {
-                "per_month": {
-                    "date_histogram": {
-                        "field": "Tanggal",
-                        "calendar_interval": "month",
-                    },
-                    "aggs": {
-                        "stunting_any": {
-                            "filter": {
-                                "bool": {
-                                    "should": [
-                                        {
-                                            "terms": {
-                                                "Status Stunting (Biner)": [
-                                                    "Stunting",
-                                                    "Ya",
-                                                    "YA",
-                                                    "ya",
-                                                    "1",
-                                                    "true",
-                                                    "TRUE",
-                                                    "True",
-                                                ]
-                                            }
-                                        },
-                                        {
-                                            "terms": {
-                                                "Status Stunting (Stunting / Berisiko / Normal)": [
-                                                    "Stunting",
-                                                    "stunting",
-                                                ]
-                                            }
-                                        },
-                                        {"range": {"Z-Score TB/U": {"lte": -2.0}}},
-                                    ],
-                                    "minimum_should_match": 1,
-                                }
-                            }
-                        },
-                        "total_in_month": {"filter": {"match_all": {}}},
-                    },
-                }
+                "stunting_any": {
+                    "filter": {
+                        "bool": {
+                            "should": [
+                                {
+                                    "terms": {
+                                        "Status Stunting (Biner)": [
+                                            "Stunting",
+                                            "Ya",
+                                            "YA",
+                                            "ya",
+                                            "1",
+                                            "true",
+                                            "TRUE",
+                                            "True",
+                                        ]
+                                    }
+                                },
+                                {
+                                    "terms": {
+                                        "Status Stunting (Stunting / Berisiko / Normal)": [
+                                            "Stunting",
+                                            "stunting",
+                                        ]
+                                    }
+                                },
+                                {"range": {"Z-Score TB/U": {"lte": -2.0}}},
+                            ],
+                            "minimum_should_match": 1,
+                        }
+                    }
+                },
+                "total_in_month": {"filter": {"match_all": {}}},
             },
         }
-    )
-    res = _es_post(STUNTING_INDEX, "/_search", body)
+    }
+    _, res_aggs, probability = _search_sampled(STUNTING_INDEX, body, aggs)
     rows = []
-    for b in res["aggregations"]["per_month"]["buckets"]:
+    for b in res_aggs["per_month"]["buckets"]:
         total = b["total_in_month"]["doc_count"]
         stunting = b["stunting_any"]["doc_count"]
         percent = (stunting / total * 100) if total > 0 else 0
         rows.append({"Bulan": b["key_as_string"][:7], "Stunting %": round(percent, 2)})
-    return pd.DataFrame(rows).set_index("Bulan")
+    df = pd.DataFrame(rows, columns=["Bulan", "Stunting %"]).set_index("Bulan")
+    df.attrs["approximate"] = probability < 1.0
+    return df
 
 
-def get_numeric_sample_for_corr(
-    filters: Dict[str, Any], size: int = 5000
-) -> pd.DataFrame:
+NUMERIC_ES_TYPES = {
+    "long",
+    "integer",
+    "short",
+    "byte",
+    "double",
+    "float",
+    "half_float",
+    "scaled_float",
+    "unsigned_long",
+}
+
+
+def get_field_types(index: str = STUNTING_INDEX) -> Dict[str, str]:
+    """Nama field (path bertitik untuk object) -> tipe mapping ES."""
+    try:
+        r = requests.get(f"{ES_URL}/{index}/_mapping", timeout=30)
+        r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}: {e}")
+
+    types: Dict[str, str] = {}
+
+    def walk(properties: Dict[str, Any], prefix: str = "") -> None:
+        for name, spec in properties.items():
+            if "properties" in spec:
+                walk(spec["properties"], f"{prefix}{name}.")
+            elif "type" in spec:
+                types.setdefault(f"{prefix}{name}", spec["type"])
+
+    # Alias bisa menunjuk beberapa index; field pertama yang ditemukan dipakai
+    for idx in r.json().values():
+        walk(idx.get("mappings", {}).get("properties", {}))
+    return types
+
+
+def get_pairwise_matrix_stats(
+    filters: Dict[str, Any], target: str, fields: List[str]
+) -> Dict[str, Dict[str, Any]]:
     """
-    VERSI BARU: Meniru 100% logika `numeric_sample_for_corr` dari referensi es.py.
+    Korelasi Pearson `target` vs tiap field atas SELURUH dokumen terfilter, dalam
+    satu request: satu agregasi `matrix_stats` per pasangan, sehingga dokumen yang
+    kosong di satu field tidak ikut membuang pasangan lain (pairwise-complete).
+    Hasil: field -> {"count", "correlation"}.
     """
-    # 1. Tarik sampel mentah, apa adanya.
     body = build_query(filters)
-    body.update({"size": size})
-    data = _es_post(STUNTING_INDEX, "/_search", body)
-    hits = data.get("hits", {}).get("hits", [])
-    df_sample = pd.DataFrame([h.get("_source", {}) for h in hits])
-
-    if df_sample.empty:
-        return pd.DataFrame()
-
-    # 2. Biarkan Pandas memilih kolom numerik. Ini cara paling tangguh.
-    return df_sample.select_dtypes(include=["number"]).copy()
+    body.update(
+        {
+            "size": 0,
+            "aggs": {
+                f"f{i}": {"matrix_stats": {"fields": [target, field]}}
+                for i, field in enumerate(fields)
+            },
+        }
+    )
+    aggs = _es_post(STUNTING_INDEX, "/_search", body).get("aggregations", {})
+    out = {}
+    for i, field in enumerate(fields):
+        agg = aggs.get(f"f{i}", {})
+        stats = {f["name"]: f for f in agg.get("fields", [])}
+        corr = stats.get(target, {}).get("correlation", {}).get(field)
+        out[field] = {"count": agg.get("doc_count", 0), "correlation": corr}
+    return out
 
 
 # --- Fungsi untuk Halaman Explorer Data ---
@@ -385,27 +890,41 @@ def _apply_advanced_filters_to_query(body: dict, advanced_filters: dict) -> dict
     return body
 
 
+EXPLORER_FIELDS = [
+    "Tanggal",
+    "nama_kabupaten_kota",
+    "Kecamatan",
+    "Status Stunting (Biner)",
+    "ZScore TB/U",
+    "Usia Anak (bulan)",
+    "Berat Lahir (gram)",
+    "ASI Eksklusif",
+    "Status Imunisasi Anak",
+    "Pendidikan Ibu",
+    "Akses Air Bersih",
+]
+
+EXPLORER_RENAME = {
+    "nama_kabupaten_kota": "Kabupaten/Kota",
+    "Status Stunting (Biner)": "Status Stunting",
+    "ZScore TB/U": "Z-Score",
+    "Usia Anak (bulan)": "Usia Anak (bulan)",
+    "Berat Lahir (gram)": "Berat Lahir (gram)",
+    "Status Imunisasi Anak": "Imunisasi",
+    "Akses Air Bersih": "Akses Air Bersih",
+}
+
+
+def build_explorer_query(filters: dict, advanced_filters: dict) -> dict:
+    """Query filter sidebar + filter lanjutan halaman explorer."""
+    return _apply_advanced_filters_to_query(build_query(filters), advanced_filters)
+
+
 def get_explorer_data(
     filters: dict, advanced_filters: dict, size: int = 1000
 ) -> pd.DataFrame:
-    body = build_query(filters)
-    body = _apply_advanced_filters_to_query(body, advanced_filters)
-
-    source_fields = [
-        "Tanggal",
-        "nama_kabupaten_kota",
-        "Kecamatan",
-        "Status Stunting (Biner)",
-        "ZScore TB/U",
-        "Usia Anak (bulan)",
-        "Berat Lahir (gram)",
-        "ASI Eksklusif",
-        "Status Imunisasi Anak",
-        "Pendidikan Ibu",
-        "Akses Air Bersih",
-    ]
-
-    body["_source"] = source_fields
+    body = build_explorer_query(filters, advanced_filters)
+    body["_source"] = EXPLORER_FIELDS
     body["size"] = size
     body["sort"] = [{"ZScore TB/U": "asc"}]
 
@@ -415,20 +934,65 @@ def get_explorer_data(
     df = pd.DataFrame([h.get("_source", {}) for h in hits])
 
     if not df.empty:
-        df = df.rename(
-            columns={
-                "nama_kabupaten_kota": "Kabupaten/Kota",
-                "Status Stunting (Biner)": "Status Stunting",
-                "ZScore TB/U": "Z-Score",
-                "Usia Anak (bulan)": "Usia Anak (bulan)",
-                "Berat Lahir (gram)": "Berat Lahir (gram)",
-                "Status Imunisasi Anak": "Imunisasi",
-                "Akses Air Bersih": "Akses Air Bersih",
-            }
-        )
+        df = df.rename(columns=EXPLORER_RENAME)
     return df
 
 
+EXPLORER_DIST_FIELDS = ["Pendidikan Ibu", "ASI Eksklusif", "Akses Air Bersih"]
+
+
+@cached("es.explorer_distribution")
+def get_explorer_distribution(filters: dict, advanced_filters: dict) -> dict:
+    """
+    Statistik distribusi SELURUH data terfilter dalam satu request agregasi:
+    ringkasan Z-Score (ala `describe()`), persentase kategori, dan rata-rata
+    usia anak & BMI ibu pra-hamil. Hasil di-cache per filter; jangan dimutasi.
+    """
+    body = build_explorer_query(filters, advanced_filters)
+    body.update({"size": 0, "track_total_hits": True})
+    body["aggs"] = {
+        "z_stats": {"extended_stats": {"field": "ZScore TB/U"}},
+        "z_pct": {"percentiles": {"field": "ZScore TB/U", "percents": [25, 50, 75]}},
+        "usia": {"avg": {"field": "Usia Anak (bulan)"}},
+        "bmi": {"avg": {"field": "BMI Pra-Hamil"}},
+        **{f"dist_{i}": _terms(f, 20) for i, f in enumerate(EXPLORER_DIST_FIELDS)},
+    }
+    data = _es_post(STUNTING_INDEX, "/_search", body)
+    aggs = data.get("aggregations", {})
+
+    z = aggs.get("z_stats", {})
+    pct = aggs.get("z_pct", {}).get("values", {})
+    zscore = {
+        "count": z.get("count", 0),
+        "mean": z.get("avg"),
+        # std sampel (ddof=1) seperti pandas describe()
+        "std": z.get("std_deviation_sampling", z.get("std_deviation")),
+        "min": z.get("min"),
+        "25%": pct.get("25.0"),
+        "50%": pct.get("50.0"),
+        "75%": pct.get("75.0"),
+        "max": z.get("max"),
+    }
+
+    distribusi = {}
+    for i, field in enumerate(EXPLORER_DIST_FIELDS):
+        agg = aggs.get(f"dist_{i}", {})
+        buckets = agg.get("buckets", [])
+        # Pembagi = dokumen yang punya nilai (sama dengan value_counts(normalize))
+        total = sum(b["doc_count"] for b in buckets) + agg.get("sum_other_doc_count", 0)
+        distribusi[field] = {
+            b["key"]: round(b["doc_count"] / total * 100, 2) for b in buckets if total
+        }
+
+    return {
+        "total": data.get("hits", {}).get("total", {}).get("value", 0),
+        "zscore": zscore,
+        "distribusi": distribusi,
+        "rata_usia_bulan": aggs.get("usia", {}).get("value"),
+        "rata_bmi_pra_hamil": aggs.get("bmi", {}).get("value"),
+    }
+
+
 def get_top_counts_for_explorer_chart(
     filters: dict, advanced_filters: dict
 ) -> pd.DataFrame:
@@ -444,7 +1008,7 @@ def get_top_counts_for_explorer_chart(
     body = _apply_advanced_filters_to_query(body, advanced_filters)
 
     body["size"] = 0
-    body["aggs"] = {"counts_by_region": {"terms": {"field": agg_field, "size": 5}}}
+    body["aggs"] = {"counts_by_region": _terms(agg_field, 5)}
 
     data = _es_post(STUNTING_INDEX, "/_search", body)
     buckets = (
@@ -460,6 +1024,7 @@ def get_top_counts_for_explorer_chart(
     return df
 
 # Letakkan ini di bagian paling akhir file src/elastic_client.py
+@with_accuracy(ACCURACY_EXACT)
 def get_explorer_data_for_export(
     filters: dict, advanced_filters: dict, size: int = 5000
 ) -> pd.DataFrame:
@@ -512,74 +1077,275 @@ def get_explorer_data_for_export(
 # Letakkan ini di bagian paling akhir file src/elastic_client.py
 
 
-def get_risk_map_data(filters: dict) -> pd.DataFrame:
-    """
-    Mengambil data agregat per wilayah (kabupaten & kecamatan) untuk keperluan Risk Map.
-    Menghitung total anak dan jumlah anak stunting di tiap wilayah.
-    """
-    body = build_query(filters)
+RISK_MAP_PAGE_SIZE = 1000  # bucket per halaman composite
+RISK_MAP_CACHE_TTL_S = 300.0
+RISK_MAP_LEVELS = ("kecamatan", "desa")
 
-    body["size"] = 0
-    body["aggs"] = {
-        "by_kab": {
-            "terms": {"field": "nama_kabupaten_kota", "size": 100},
-            "aggs": {
-                "by_kec": {
-                    "terms": {"field": "Kecamatan", "size": 5000},
-                    "aggs": {
-                        "stunting_count": {
-                            "filter": {
-                                "bool": {
-                                    "should": [
-                                        {
-                                            "terms": {
-                                                "Status Stunting (Biner)": [
-                                                    "Stunting",
-                                                    "Ya",
-                                                    "YA",
-                                                    "ya",
-                                                    "1",
-                                                    "true",
-                                                    "TRUE",
-                                                    "True",
-                                                ]
-                                            }
-                                        },
-                                        {
-                                            "terms": {
-                                                "Status Stunting (Stunting / Berisiko / Normal)": [
-                                                    "Stunting",
-                                                    "stunting",
-                                                ]
-                                            }
-                                        },
-                                        {"range": {"ZScore TB/U": {"lte": -2.0}}},
-                                    ],
-                                    "minimum_should_match": 1,
-                                }
-                            }
+
+# Anak terhitung stunting: label biner, label 3 kelas, atau ZScore TB/U <= -2
+_STUNTING_COUNT_AGG = {
+    "stunting_count": {
+        "filter": {
+            "bool": {
+                "should": [
+                    {
+                        "terms": {
+                            "Status Stunting (Biner)": [
+                                "Stunting",
+                                "Ya",
+                                "YA",
+                                "ya",
+                                "1",
+                                "true",
+                                "TRUE",
+                                "True",
+                            ]
                         }
                     },
-                }
-            },
+                    {
+                        "terms": {
+                            "Status Stunting (Stunting / Berisiko / Normal)": [
+                                "Stunting",
+                                "stunting",
+                            ]
+                        }
+                    },
+                    {"range": {"ZScore TB/U": {"lte": -2.0}}},
+                ],
+                "minimum_should_match": 1,
+            }
         }
     }
+}
+
+
+@cached("es.desa_field", ttl_s=3600.0)
+def resolve_desa_field() -> Optional[str]:
+    """Field desa/kelurahan (keyword) pertama di mapping index stunting, atau None."""
+    types = get_field_types()
+    return next((f for f in CANDIDATES_DESA if types.get(f) == "keyword"), None)
+
+
+def iter_composite(
+    index: str,
+    body: Dict[str, Any],
+    sources: List[Tuple[str, Any]],
+    aggs: Optional[Dict[str, Any]] = None,
+    page_size: int = RISK_MAP_PAGE_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Halaman bucket agregasi `composite` atas `sources` [(nama, field), ...],
+    dilanjutkan dengan `after_key` hingga habis. Memori ES & aplikasi per
+    request dibatasi `page_size`, berapa pun jumlah kombinasi wilayahnya.
+    Selain nama field (sumber terms), sumber boleh berupa spesifikasi lengkap,
+    mis. {"date_histogram": {...}}.
+    """
+    composite: Dict[str, Any] = {
+        "size": page_size,
+        "sources": [
+            {name: spec if isinstance(spec, dict) else {"terms": {"field": spec}}}
+            for name, spec in sources
+        ],
+    }
+    agg: Dict[str, Any] = {"composite": composite}
+    if aggs:
+        agg["aggs"] = aggs
+    page_body = {**body, "size": 0, "track_total_hits": False, "aggs": {"pages": agg}}
+    while True:
+        data = _es_post(index, "/_search", page_body)
+        result = data.get("aggregations", {}).get("pages", {})
+        buckets = result.get("buckets", [])
+        if buckets:
+            yield buckets
+        after = result.get("after_key")
+        if not after or len(buckets) < page_size:
+            return
+        composite["after"] = after
+
+
+@cached("es.region_codes", ttl_s=3600.0)
+def has_region_codes() -> bool:
+    """Index stunting sudah berisi kode wilayah (`python -m src.region_codes ingest`)."""
+    types = get_field_types()
+    return all(
+        types.get(region_codes.CODE_FIELDS[lv]) in ("integer", "long")
+        for lv in ("kabupaten", "kecamatan")
+    )
 
+
+def region_code_filter(
+    wilayah: List[str], kecamatan: Optional[List[str]] = None
+) -> Dict[str, List[int]]:
+    """Kode untuk pilihan sidebar; kosong bila kamus/field kode belum tersedia."""
+    dictionary = region_codes.load_default()
+    if dictionary is None or not wilayah or not has_region_codes():
+        return {}
+    return region_codes.filter_codes(dictionary, wilayah, kecamatan)
+
+
+def _composite_counts(body: Dict[str, Any], sources: List[Tuple[str, str]]):
+    """Total anak & jumlah stunting per kombinasi `sources` (composite berhalaman)."""
+    frames = []
+    for buckets in iter_composite(STUNTING_INDEX, body, sources, _STUNTING_COUNT_AGG):
+        page = {name: [b["key"][name] for b in buckets] for name, _ in sources}
+        page["total_anak"] = [b["doc_count"] for b in buckets]
+        page["jumlah_stunting"] = [b["stunting_count"]["doc_count"] for b in buckets]
+        frames.append(pd.DataFrame(page))
+    columns = [name for name, _ in sources] + ["total_anak", "jumlah_stunting"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def _counts_by_code(
+    query: Dict[str, Any],
+    sources: List[Tuple[str, str]],
+    dictionary: region_codes.RegionDictionary,
+) -> pd.DataFrame:
+    """
+    Group-by per kode wilayah terhalus (satu source integer; kode induk dihitung
+    dari kode berjenjang). Dokumen yang belum di-ingest dihitung per nama lalu
+    dikodekan lokal; nama yang tidak dikenal kamus tetap sebagai baris bernama.
+    """
+    levels = [name for name, _ in sources]
+    fields = [region_codes.CODE_FIELDS[lv] for lv in levels]
+    finest = fields[-1]
+    exists = {"exists": {"field": finest}}
+    coded = _composite_counts(
+        {"query": {"bool": {"must": [query], "filter": [exists]}}}, [(finest, finest)]
+    )
+    legacy = _composite_counts(
+        {"query": {"bool": {"must": [query], "must_not": [exists]}}}, sources
+    )
+    legacy[finest] = dictionary.encode(*(legacy[lv] for lv in levels))[levels[-1]]
+    known = legacy[finest] >= 0
+    counts = ["total_anak", "jumlah_stunting"]
+    df = (
+        pd.concat([coded[[finest] + counts], legacy.loc[known, [finest] + counts]])
+        .astype({finest: np.int64})
+        .groupby(finest, as_index=False, sort=True)
+        .sum()
+    )
+    codes = df[finest].to_numpy()
+    for level, field in zip(levels[::-1], fields[::-1]):
+        df[field] = codes
+        df[level] = dictionary.names(level, codes)
+        codes = region_codes.parent_codes(codes)
+    unknown = legacy.loc[~known].assign(**{f: region_codes.UNKNOWN for f in fields})
+    return pd.concat([df, unknown], ignore_index=True)[levels + fields + counts]
+
+
+@cached("es.risk_map", ttl_s=RISK_MAP_CACHE_TTL_S)
+def get_risk_map_data(filters: dict, level: str = "kecamatan") -> pd.DataFrame:
+    """
+    Agregat per wilayah untuk Risk Map: total anak dan jumlah anak stunting per
+    (kabupaten, kecamatan), atau per (kabupaten, kecamatan, desa) bila
+    `level="desa"`. Dibaca lewat agregasi composite berhalaman (tanpa batas
+    jumlah wilayah); kolom nama bertipe category. Bila index sudah berisi kode
+    wilayah, pengelompokan memakai kode dan hasil menyertakan kolom kode_*.
+    Hasil di-cache; jangan dimutasi.
+    """
+    if level not in RISK_MAP_LEVELS:
+        raise ValueError(f"Level peta tidak dikenal: {level}")
+    sources = [("kabupaten", "nama_kabupaten_kota"), ("kecamatan", "Kecamatan")]
+    if level == "desa":
+        desa_field = resolve_desa_field()
+        if not desa_field:
+            raise ValueError("Index stunting tidak memiliki field desa/kelurahan.")
+        sources.append(("desa", desa_field))
+
+    dictionary = region_codes.load_default()
+    if dictionary is not None and has_region_codes():
+        df = _counts_by_code(build_query(filters)["query"], sources, dictionary)
+    else:
+        df = _composite_counts(build_query(filters), sources)
+    # Nama wilayah berulang: category menyimpan tiap nama sekali
+    for name, _ in sources:
+        df[name] = df[name].astype("category")
+    return df
+
+
+# --- Heatmap sel grid (geotile_grid) ---
+HEATMAP_COLUMNS = ["lon", "lat", "total_anak", "jumlah_stunting"]
+
+
+@cached("es.geo_field", ttl_s=3600.0)
+def resolve_geo_field() -> Optional[str]:
+    """Field lokasi keluarga (geo_point) pertama di mapping index stunting, atau None."""
+    types = get_field_types()
+    return next((f for f in CANDIDATES_LOKASI if types.get(f) == "geo_point"), None)
+
+
+@cached("es.heatmap_tile", ttl_s=RISK_MAP_CACHE_TTL_S)
+def get_heatmap_tile(filters: dict, tile: Tuple[int, int, int]) -> pd.DataFrame:
+    """
+    Sel grid satu tile (z, x, y): titik tengah sel, total anak, dan jumlah
+    stunting per sel `geotile_grid` presisi z + HEATMAP_CELL_DEPTH. Hanya
+    dokumen di dalam tile yang diagregasi; jumlah sel <= 4**HEATMAP_CELL_DEPTH.
+    """
+    geo_field = resolve_geo_field()
+    if not geo_field:
+        raise ValueError("Index stunting tidak memiliki field lokasi (geo_point).")
+    z, x, y = tile
+    precision = z + geo_tiles.HEATMAP_CELL_DEPTH
+    min_lon, min_lat, max_lon, max_lat = geo_tiles.tile_bounds(z, x, y)
+    bounds = {
+        "top_left": {"lat": max_lat, "lon": min_lon},
+        "bottom_right": {"lat": min_lat, "lon": max_lon},
+    }
+    body = {
+        "query": {
+            "bool": {
+                "must": [build_query(filters)["query"]],
+                "filter": [{"geo_bounding_box": {geo_field: bounds}}],
+            }
+        },
+        "size": 0,
+        "track_total_hits": False,
+        "aggs": {
+            "cells": {
+                "geotile_grid": {
+                    "field": geo_field,
+                    "precision": precision,
+                    "size": 4**geo_tiles.HEATMAP_CELL_DEPTH,
+                    "bounds": bounds,
+                },
+                "aggs": _STUNTING_COUNT_AGG,
+            }
+        },
+    }
     data = _es_post(STUNTING_INDEX, "/_search", body)
+    buckets = data.get("aggregations", {}).get("cells", {}).get("buckets", [])
+    zxy = geo_tiles.parse_keys([b["key"] for b in buckets])
+    # Titik tepat di garis batas ikut tile tetangga: buang sel milik tile lain
+    shift = geo_tiles.HEATMAP_CELL_DEPTH
+    own = ((zxy[:, 1] >> shift) == x) & ((zxy[:, 2] >> shift) == y)
+    total = np.asarray([b["doc_count"] for b in buckets], dtype=np.int64)
+    stunting = np.asarray(
+        [b["stunting_count"]["doc_count"] for b in buckets], dtype=np.int64
+    )
+    centers = geo_tiles.cell_centers(zxy[own])
+    return pd.DataFrame(
+        {
+            "lon": centers[:, 0],
+            "lat": centers[:, 1],
+            "total_anak": total[own],
+            "jumlah_stunting": stunting[own],
+        },
+        columns=HEATMAP_COLUMNS,
+    )
 
-    rows = []
-    kab_buckets = data.get("aggregations", {}).get("by_kab", {}).get("buckets", [])
-    for kab_b in kab_buckets:
-        kab_name = kab_b["key"]
-        kec_buckets = kab_b.get("by_kec", {}).get("buckets", [])
-        for kec_b in kec_buckets:
-            rows.append(
-                {
-                    "kabupaten": kab_name,
-                    "kecamatan": kec_b["key"],
-                    "total_anak": kec_b["doc_count"],
-                    "jumlah_stunting": kec_b["stunting_count"]["doc_count"],
-                }
-            )
 
-    return pd.DataFrame(rows)
+def get_heatmap_cells(
+    filters: dict, view_zoom: float, box: Optional[Sequence[float]]
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Sel heatmap untuk viewport `box` [min_lon, min_lat, max_lon, max_lat] pada
+    zoom tampilan. Tiap tile di-cache terpisah; hasil: (sel, presisi grid).
+    """
+    tiles = geo_tiles.covering_tiles(box, view_zoom)
+    if not tiles:
+        return pd.DataFrame(columns=HEATMAP_COLUMNS), 0
+    frames = [get_heatmap_tile(filters, tile) for tile in tiles]
+    cells = pd.concat(frames, ignore_index=True)
+    return cells, tiles[0][0] + geo_tiles.HEATMAP_CELL_DEPTH
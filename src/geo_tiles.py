@@ -0,0 +1,91 @@
+# StuntLytics/src/geo_tiles.py
+# Matematika tile web-mercator (skema z/x/y, sama dengan kunci agregasi
+# `geotile_grid` ES) untuk heatmap peta risiko. Viewport dipecah menjadi tile
+# "ambil" pada zoom tampilan; tiap tile diagregasi ES menjadi sel grid
+# 4**HEATMAP_CELL_DEPTH sel dan di-cache per (filter, tile), sehingga geser/zoom
+# ke area yang sama tidak mengulang query dan browser hanya menerima paling
+# banyak MAX_FETCH_TILES * 4**HEATMAP_CELL_DEPTH sel.
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEATMAP_CELL_DEPTH = 5  # 32 x 32 sel per tile (~16-32 px di layar)
+MAX_FETCH_TILES = 16
+MAX_PRECISION = 29  # batas presisi geotile_grid ES
+MERCATOR_MAX_LAT = 85.05112878
+
+Tile = Tuple[int, int, int]  # (z, x, y)
+
+
+def tile_zoom_for_view(view_zoom: float) -> int:
+    """
+    Zoom deck.gl memakai tile 512 px, setara zoom tile standar (256 px) + 1.
+    Tile ambil diambil satu tingkat lebih kasar (zoom standar = floor(view))
+    agar viewport cukup ditutup beberapa tile.
+    """
+    return int(min(max(math.floor(view_zoom), 0), MAX_PRECISION - HEATMAP_CELL_DEPTH))
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2**z
+    lat = min(max(lat, -MERCATOR_MAX_LAT), MERCATOR_MAX_LAT)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return (min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1))
+
+
+def _tile_lat(y, n):
+    return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y) / n))))
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) tile."""
+    n = 2**z
+    return (
+        x / n * 360.0 - 180.0,
+        float(_tile_lat(y + 1, n)),
+        (x + 1) / n * 360.0 - 180.0,
+        float(_tile_lat(y, n)),
+    )
+
+
+def covering_tiles(
+    box: Optional[Sequence[float]],
+    view_zoom: float,
+    max_tiles: int = MAX_FETCH_TILES,
+) -> List[Tile]:
+    """
+    Tile yang menutup bbox [min_lon, min_lat, max_lon, max_lat] pada zoom
+    tampilan; zoom diturunkan hingga jumlah tile <= `max_tiles`.
+    """
+    if box is None:
+        return []
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in box)
+    z = tile_zoom_for_view(view_zoom)
+    while True:
+        x0, y0 = lonlat_to_tile(min_lon, max_lat, z)  # pojok kiri atas
+        x1, y1 = lonlat_to_tile(max_lon, min_lat, z)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_tiles or z == 0:
+            break
+        z -= 1
+    return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def parse_keys(keys: Sequence[str]) -> np.ndarray:
+    """Kunci 'z/x/y' -> array (n, 3) int64."""
+    if not len(keys):
+        return np.empty((0, 3), dtype=np.int64)
+    return np.array([k.split("/") for k in keys], dtype=np.int64)
+
+
+def cell_centers(zxy: np.ndarray) -> np.ndarray:
+    """Titik tengah sel (n, 2) [lon, lat] untuk array (n, 3) z/x/y."""
+    n = 2.0 ** zxy[:, 0]
+    lon = (zxy[:, 1] + 0.5) / n * 360.0 - 180.0
+    return np.column_stack([lon, _tile_lat(zxy[:, 2] + 0.5, n)])
+
+
+def cell_size_m(precision: int, lat):
+    """Lebar sel (meter) pada lintang `lat` (skalar atau array)."""
+    return 40_075_016.686 * np.cos(np.radians(lat)) / 2**precision
@@ -0,0 +1,138 @@
+# StuntLytics/src/geometry_index.py
+# Sidecar geometri GeoJSON peta risiko: bbox, centroid, dan jumlah verteks per
+# fitur sebagai array NumPy, plus bbox gabungan per kode kabupaten. Dibangun sekali
+# (disimpan di geostore, src/geometry_store.py) sehingga view state untuk
+# pilihan apa pun cukup min/max atas bbox fitur, tanpa menelusuri koordinat.
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.region_codes import KAB_PROPERTY, RegionDictionary
+
+DEFAULT_CENTER = (-6.91, 107.61)  # (lat, lon) Jawa Barat
+DEFAULT_ZOOM = 7.5
+
+
+def _polygons(geometry: Optional[Dict[str, Any]]) -> List[List[np.ndarray]]:
+    """Geometry -> daftar poligon, tiap poligon daftar ring (array (m, 2))."""
+    if not geometry:
+        return []
+    coords = geometry.get("coordinates") or []
+    if geometry.get("type") == "Polygon":
+        coords = [coords]
+    elif geometry.get("type") != "MultiPolygon":
+        return []
+    return [
+        [np.asarray(ring, dtype=np.float64)[:, :2] for ring in poly if len(ring)]
+        for poly in coords
+    ]
+
+
+def _ring_moments(ring: np.ndarray):
+    """Luas (absolut) dan centroid ring dengan rumus shoelace."""
+    x, y = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = cross.sum() / 2
+    if area == 0:
+        return 0.0, ring.mean(axis=0)
+    cx = ((x + x1) * cross).sum() / (6 * area)
+    cy = ((y + y1) * cross).sum() / (6 * area)
+    return abs(area), np.array([cx, cy])
+
+
+def feature_geometry(geometry: Optional[Dict[str, Any]]):
+    """(bbox [min_lon, min_lat, max_lon, max_lat], centroid [lon, lat], n verteks)."""
+    rings = [r for poly in _polygons(geometry) for r in poly]
+    if not rings:
+        return np.full(4, np.nan), np.full(2, np.nan), 0
+    points = np.concatenate(rings)
+    bbox = np.concatenate([points.min(axis=0), points.max(axis=0)])
+
+    # Centroid berbobot luas: ring luar menambah, lubang mengurangi
+    weight, moment = 0.0, np.zeros(2)
+    for poly in _polygons(geometry):
+        for i, ring in enumerate(poly):
+            area, c = _ring_moments(ring)
+            sign = 1.0 if i == 0 else -1.0
+            weight += sign * area
+            moment += sign * area * c
+    centroid = moment / weight if weight > 0 else points.mean(axis=0)
+    return bbox, centroid, len(points)
+
+
+def feature_arrays(features: List[Dict[str, Any]]):
+    """(bbox (n, 4), centroid (n, 2), jumlah verteks (n,)) untuk semua fitur."""
+    parts = [feature_geometry(f.get("geometry")) for f in features]
+    if not parts:
+        return np.empty((0, 4)), np.empty((0, 2)), np.empty(0, dtype=np.int64)
+    bbox, centroid, count = zip(*parts)
+    return np.stack(bbox), np.stack(centroid), np.asarray(count, dtype=np.int64)
+
+
+class GeometryIndex:
+    """Array per fitur (urutan fitur GeoJSON) + bbox gabungan per kode kabupaten."""
+
+    def __init__(
+        self,
+        bbox: np.ndarray,
+        centroid: np.ndarray,
+        vertex_count: np.ndarray,
+        kab_codes: Sequence[int],
+    ):
+        self.bbox = np.asarray(bbox, dtype=np.float64).reshape(-1, 4)
+        self.centroid = np.asarray(centroid, dtype=np.float64).reshape(-1, 2)
+        self.vertex_count = np.asarray(vertex_count, dtype=np.int64)
+        self.kab_codes = np.asarray(kab_codes, dtype=np.int64)
+        frame = pd.DataFrame(self.bbox, columns=["x0", "y0", "x1", "y1"])
+        self.kab_bbox = frame.groupby(self.kab_codes).agg(
+            {"x0": "min", "y0": "min", "x1": "max", "y1": "max"}
+        )
+        self._kab_lookup = dict(zip(self.kab_bbox.index, self.kab_bbox.to_numpy()))
+
+    @classmethod
+    def from_features(
+        cls,
+        features: List[Dict[str, Any]],
+        dictionary: RegionDictionary,
+        kab_property: str = KAB_PROPERTY,
+    ) -> "GeometryIndex":
+        kab_codes = dictionary.encode_kabupaten(
+            [(f.get("properties") or {}).get(kab_property) for f in features]
+        )
+        return cls(*feature_arrays(features), kab_codes)
+
+    def __len__(self) -> int:
+        return len(self.vertex_count)
+
+    def bounds(self, positions) -> Optional[np.ndarray]:
+        """Bbox gabungan fitur pada `positions`; None bila kosong."""
+        boxes = self.bbox[np.asarray(positions, dtype=np.int64)]
+        boxes = boxes[~np.isnan(boxes).any(axis=1)]
+        if not len(boxes):
+            return None
+        return np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+
+    def kabupaten_bounds(self, kab_code: int) -> Optional[np.ndarray]:
+        if kab_code < 0:
+            return None
+        return self._kab_lookup.get(int(kab_code))
+
+
+def view_for_bounds(box: Optional[np.ndarray]) -> Dict[str, float]:
+    """Pusat & zoom yang memuat bbox; None -> tampilan bawaan Jawa Barat."""
+    if box is None:
+        lat, lon = DEFAULT_CENTER
+        return {"latitude": lat, "longitude": lon, "zoom": DEFAULT_ZOOM}
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in box)
+    lat_span = max(abs(max_lat - min_lat), 1e-5)
+    lon_span = max(abs(max_lon - min_lon), 1e-5)
+    # Sedikit zoom out (x0.95) agar tepi wilayah tidak terpotong
+    zoom = min(math.log2(360 / lon_span), math.log2(180 / lat_span)) * 0.95
+    return {
+        "latitude": (min_lat + max_lat) / 2,
+        "longitude": (min_lon + max_lon) / 2,
+        "zoom": zoom,
+    }
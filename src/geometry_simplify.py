@@ -0,0 +1,257 @@
+# StuntLytics/src/geometry_simplify.py
+# Pipeline offline geometri peta risiko multi-resolusi. Batas antar kecamatan
+# dipecah menjadi "arc" bersama (seperti TopoJSON): tiap arc disederhanakan
+# SEKALI dengan Douglas-Peucker lalu dipakai kedua poligon yang berbatasan,
+# sehingga tidak muncul celah/tumpang tindih antar wilayah. Ring yang runtuh
+# (< 3 titik / luas 0) dilindungi: arc-nya dipakai utuh.
+#
+# Level disusun per zoom maksimum: toleransi = setengah piksel pada zoom
+# tersebut. Level disimpan di geostore (src/geometry_store.py).
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOD_ZOOMS = (8, 10, 12)  # level penuh dipakai di atas zoom terbesar
+TILE_SIZE_PX = 512  # lebar dunia (px) pada zoom 0 di deck.gl/MapLibre
+TOLERANCE_PX = 0.5
+ZOOM_HEADROOM = 1.0  # ruang zoom-in interaktif setelah tampilan awal
+
+Point = Tuple[float, float]
+
+
+def tolerance_for_zoom(zoom: float) -> float:
+    """Toleransi (derajat) = TOLERANCE_PX piksel pada `zoom`."""
+    return 360.0 / (TILE_SIZE_PX * 2**zoom) * TOLERANCE_PX
+
+
+def _precision_for(tolerance: float) -> int:
+    # Pembulatan koordinat ~1/10 toleransi: memangkas ukuran JSON
+    return max(0, math.ceil(-math.log10(tolerance / 10)))
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Mask titik yang dipertahankan (ujung selalu dipertahankan)."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        a, b = points[i], points[j]
+        seg = points[i + 1 : j]
+        ab = b - a
+        denom = float(ab @ ab)
+        if denom == 0:
+            d2 = ((seg - a) ** 2).sum(axis=1)
+        else:
+            t = np.clip((seg - a) @ ab / denom, 0.0, 1.0)
+            d2 = ((seg - (a + t[:, None] * ab)) ** 2).sum(axis=1)
+        k = int(np.argmax(d2))
+        if d2[k] > tol2:
+            keep[i + 1 + k] = True
+            stack.append((i, i + 1 + k))
+            stack.append((i + 1 + k, j))
+    return keep
+
+
+def _open_ring(ring: Sequence[Sequence[float]]) -> List[Point]:
+    """Ring tertutup -> titik unik berurutan (tanpa titik penutup & duplikat)."""
+    pts: List[Point] = []
+    for c in ring:
+        p = (float(c[0]), float(c[1]))
+        if not pts or pts[-1] != p:
+            pts.append(p)
+    if len(pts) > 1 and pts[0] == pts[-1]:
+        pts.pop()
+    return pts
+
+
+def _polygons(geometry: Optional[Dict[str, Any]]) -> List[List[List[Point]]]:
+    if not geometry:
+        return []
+    coords = geometry.get("coordinates") or []
+    if geometry.get("type") == "Polygon":
+        coords = [coords]
+    elif geometry.get("type") != "MultiPolygon":
+        return []
+    return [[_open_ring(r) for r in poly] for poly in coords]
+
+
+class Topology:
+    """Ring semua fitur, dipecah di titik simpul menjadi arc bersama."""
+
+    def __init__(self, features: List[Dict[str, Any]]):
+        self.geometry_types = []
+        self.polygons = []  # per fitur: poligon -> ring -> list titik
+        for f in features:
+            geom = f.get("geometry") or {}
+            self.geometry_types.append(geom.get("type"))
+            self.polygons.append(_polygons(geom))
+        rings = [r for polys in self.polygons for poly in polys for r in poly]
+        junctions = self._junctions(rings)
+
+        self.arcs: List[Tuple[Point, ...]] = []  # orientasi kanonik
+        arc_ids: Dict[Tuple[Point, ...], int] = {}
+        # per ring: daftar (id arc, terbalik?)
+        self.ring_arcs: List[List[Tuple[int, bool]]] = []
+        for ring in rings:
+            refs = []
+            for arc in self._split(ring, junctions):
+                rev = arc[::-1]
+                key, reversed_ = (arc, False) if arc <= rev else (rev, True)
+                if key not in arc_ids:
+                    arc_ids[key] = len(self.arcs)
+                    self.arcs.append(key)
+                refs.append((arc_ids[key], reversed_))
+            self.ring_arcs.append(refs)
+
+    @staticmethod
+    def _junctions(rings: List[List[Point]]) -> set:
+        """
+        Titik tempat himpunan ring pemilik sisi berubah (awal/akhir batas
+        bersama, pertemuan tiga wilayah). Ditandai per koordinat sehingga
+        semua ring memecah di titik yang sama.
+        """
+        edge_rings: Dict[frozenset, set] = {}
+        for rid, ring in enumerate(rings):
+            m = len(ring)
+            for k in range(m):
+                edge = frozenset((ring[k], ring[(k + 1) % m]))
+                edge_rings.setdefault(edge, set()).add(rid)
+        junctions = set()
+        for ring in rings:
+            m = len(ring)
+            for k in range(m):
+                before = edge_rings[frozenset((ring[k - 1], ring[k]))]
+                after = edge_rings[frozenset((ring[k], ring[(k + 1) % m]))]
+                if before != after:
+                    junctions.add(ring[k])
+        return junctions
+
+    @staticmethod
+    def _split(ring: List[Point], junctions: set) -> List[Tuple[Point, ...]]:
+        if len(ring) < 3:
+            return [tuple(ring + ring[:1])]
+        idx = [k for k, p in enumerate(ring) if p in junctions]
+        if not idx:
+            # Ring tanpa simpul (pulau/enklave): satu arc tertutup, dimulai dari
+            # titik terkecil agar kedua sisi batas memakai awal yang sama
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [tuple(rotated + rotated[:1])]
+        rotated = ring[idx[0] :] + ring[: idx[0]]
+        cuts = [k - idx[0] for k in idx] + [len(ring)]
+        closed = rotated + rotated[:1]
+        return [tuple(closed[a : b + 1]) for a, b in zip(cuts, cuts[1:])]
+
+    def vertex_count(self) -> int:
+        return sum(len(r) for polys in self.polygons for poly in polys for r in poly)
+
+    def simplify(self, tolerance: float, precision: Optional[int] = None) -> List:
+        """Geometry GeoJSON per fitur (urutan fitur) pada `tolerance` derajat."""
+        protected: set = set()
+        while True:
+            arcs = [
+                self._simplify_arc(i, tolerance, precision, i in protected)
+                for i in range(len(self.arcs))
+            ]
+            rings, collapsed = [], set()
+            for refs in self.ring_arcs:
+                ring = self._assemble(arcs, refs)
+                if len(ring) < 4 or _ring_area(ring) == 0:
+                    collapsed.update(i for i, _ in refs)
+                rings.append(ring)
+            if not collapsed - protected:
+                break
+            protected |= collapsed
+        return self._geometries(rings)
+
+    def _simplify_arc(self, i, tolerance, precision, protected) -> np.ndarray:
+        pts = np.asarray(self.arcs[i], dtype=np.float64)
+        if not protected and tolerance > 0 and len(pts) > 2:
+            pts = pts[douglas_peucker(pts, tolerance)]
+        if precision is not None and not protected:
+            pts = np.round(pts, precision)
+        return pts
+
+    @staticmethod
+    def _assemble(arcs: List[np.ndarray], refs: List[Tuple[int, bool]]) -> List:
+        coords: List[List[float]] = []
+        for i, reversed_ in refs:
+            seq = arcs[i][::-1] if reversed_ else arcs[i]
+            for x, y in seq.tolist():
+                if not coords or coords[-1] != [x, y]:
+                    coords.append([x, y])
+        if coords and coords[0] != coords[-1]:
+            coords.append(list(coords[0]))
+        return coords
+
+    def _geometries(self, rings: List[List]) -> List[Optional[Dict[str, Any]]]:
+        it = iter(rings)
+        out = []
+        for gtype, polys in zip(self.geometry_types, self.polygons):
+            coords = [[next(it) for _ in poly] for poly in polys]
+            if gtype == "Polygon":
+                out.append({"type": "Polygon", "coordinates": coords[0]})
+            elif gtype == "MultiPolygon":
+                out.append({"type": "MultiPolygon", "coordinates": coords})
+            else:
+                out.append(None)
+        return out
+
+
+def _ring_area(ring: List[List[float]]) -> float:
+    pts = np.asarray(ring, dtype=np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+    return abs(float((x * np.roll(y, -1) - np.roll(x, -1) * y).sum())) / 2
+
+
+def _geometry_vertices(geometries: List[Optional[Dict[str, Any]]]) -> int:
+    total = 0
+    for g in geometries:
+        if not g:
+            continue
+        polys = [g["coordinates"]] if g["type"] == "Polygon" else g["coordinates"]
+        total += sum(len(r) for poly in polys for r in poly)
+    return total
+
+
+def build_levels(
+    features: List[Dict[str, Any]], zooms: Sequence[int] = LOD_ZOOMS
+) -> Dict[str, Any]:
+    """Semua level sederhana untuk `features` (tanpa level penuh)."""
+    topology = Topology(features)
+    levels = []
+    for zoom in sorted(zooms):
+        tolerance = tolerance_for_zoom(zoom)
+        geometries = topology.simplify(tolerance, _precision_for(tolerance))
+        levels.append(
+            {
+                "max_zoom": zoom,
+                "tolerance": tolerance,
+                "vertices": _geometry_vertices(geometries),
+                "geometries": geometries,
+            }
+        )
+    return {
+        "features": len(features),
+        "vertices": topology.vertex_count(),
+        "arcs": len(topology.arcs),
+        "levels": levels,
+    }
+
+
+def pick_level(
+    levels: List[Dict[str, Any]], zoom: float, full_detail: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Level paling kasar yang masih tajam pada `zoom`; None = resolusi penuh."""
+    if full_detail:
+        return None
+    for level in sorted(levels, key=lambda lv: lv["max_zoom"]):
+        if zoom + ZOOM_HEADROOM <= level["max_zoom"]:
+            return level
+    return None
@@ -0,0 +1,316 @@
+# StuntLytics/src/geometry_store.py
+# Penyimpanan geometri peta risiko dalam format biner terkemas:
+#
+#   geojson/jawa-barat.geostore/
+#   ├── manifest.json          # level resolusi, kolom properti (ditulis terakhir)
+#   ├── geometry_type.npy      # per fitur: 0 kosong, 1 Polygon, 2 MultiPolygon
+#   ├── feature_offsets.npy    # fitur -> rentang poligon
+#   ├── polygon_offsets.npy    # poligon -> rentang ring
+#   ├── coords_<level>.npy     # (V, 2) lon/lat datar, per level resolusi
+#   ├── ring_offsets_<level>.npy
+#   ├── bbox.npy, centroid.npy, vertex_count.npy   # sidecar geometry_index
+#   └── prop_<i>.npy           # kolom properti (teks/angka)
+#
+# Semua array dibuka sebagai memory-map: worker mulai tanpa mem-parse JSON dan
+# berbagi halaman fisik yang sama. Objek Python hanya dibangun untuk fitur
+# yang ditampilkan, pada level resolusi yang dipilih.
+#
+# Build (otomatis saat pertama dimuat bila belum ada/lebih tua dari GeoJSON):
+#   python -m src.geometry_store geojson/jawa-barat.geojson
+import argparse
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src import geometry_simplify
+from src.geometry_index import GeometryIndex, feature_arrays
+from src.region_codes import KAB_PROPERTY, RegionDictionary
+
+STORE_SUFFIX = ".geostore"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+FULL_LEVEL = "full"
+GEOMETRY_TYPES = (None, "Polygon", "MultiPolygon")
+
+
+class GeometryStore:
+    """Akses baca geometri & properti per fitur dari array (ter-mmap)."""
+
+    def __init__(self, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.manifest = manifest
+        self.arrays = arrays
+        self.levels: List[Dict[str, Any]] = manifest["levels"]
+
+    def __len__(self) -> int:
+        return int(self.manifest["features"])
+
+    @property
+    def property_names(self) -> List[str]:
+        return list(self.manifest["properties"])
+
+    def column(self, name: str) -> np.ndarray:
+        return self.arrays[self.manifest["properties"][name]["array"]]
+
+    def properties(self, pos: int) -> Dict[str, Any]:
+        props = {}
+        for name, spec in self.manifest["properties"].items():
+            value = self.arrays[spec["array"]][pos].item()
+            if spec["kind"] == "float" and value != value:  # NaN = tidak ada
+                value = None
+            elif spec["kind"] == "str" and value == "" and spec["nullable"]:
+                value = None
+            props[name] = value
+        return props
+
+    def geometry_index(
+        self, dictionary: RegionDictionary, kab_property: str = KAB_PROPERTY
+    ) -> GeometryIndex:
+        return GeometryIndex(
+            self.arrays["bbox"],
+            self.arrays["centroid"],
+            self.arrays["vertex_count"],
+            dictionary.encode_kabupaten(self.column(kab_property)),
+        )
+
+    def geometries(
+        self, positions: Sequence[int], level: str = FULL_LEVEL
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Geometry GeoJSON untuk `positions` pada `level` (satu tolist per fitur)."""
+        coords = self.arrays[f"coords_{level}"]
+        rings = self.arrays[f"ring_offsets_{level}"]
+        polys = self.arrays["polygon_offsets"]
+        feats = self.arrays["feature_offsets"]
+        types = self.arrays["geometry_type"]
+        out = []
+        for pos in positions:
+            gtype = GEOMETRY_TYPES[types[pos]]
+            if gtype is None:
+                out.append(None)
+                continue
+            p0, p1 = int(feats[pos]), int(feats[pos + 1])
+            r0, r1 = int(polys[p0]), int(polys[p1])
+            c0, c1 = int(rings[r0]), int(rings[r1])
+            points = coords[c0:c1].tolist()
+            rb = (rings[r0 : r1 + 1] - c0).tolist()
+            ring_list = [points[a:b] for a, b in zip(rb, rb[1:])]
+            pb = (polys[p0 : p1 + 1] - r0).tolist()
+            polygons = [ring_list[a:b] for a, b in zip(pb, pb[1:])]
+            out.append(
+                {
+                    "type": gtype,
+                    "coordinates": polygons[0] if gtype == "Polygon" else polygons,
+                }
+            )
+        return out
+
+
+# ==============================================================================
+# BUILD
+# ==============================================================================
+def _polygon_lists(geometry: Optional[Dict[str, Any]]):
+    if not geometry or geometry.get("type") not in GEOMETRY_TYPES[1:]:
+        return 0, []
+    coords = geometry.get("coordinates") or []
+    if geometry["type"] == "Polygon":
+        return 1, [coords]
+    return 2, coords
+
+
+def _pack(geometries: List[Optional[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    types, feature_offsets, polygon_offsets, ring_offsets = [], [0], [0], [0]
+    coords: List[Sequence[float]] = []
+    for geometry in geometries:
+        gtype, polygons = _polygon_lists(geometry)
+        types.append(gtype)
+        for poly in polygons:
+            for ring in poly:
+                coords.extend(c[:2] for c in ring)
+                ring_offsets.append(len(coords))
+            polygon_offsets.append(len(ring_offsets) - 1)
+        feature_offsets.append(len(polygon_offsets) - 1)
+    return {
+        "geometry_type": np.asarray(types, dtype=np.uint8),
+        "feature_offsets": np.asarray(feature_offsets, dtype=np.int64),
+        "polygon_offsets": np.asarray(polygon_offsets, dtype=np.int64),
+        "ring_offsets": np.asarray(ring_offsets, dtype=np.int64),
+        "coords": np.asarray(coords, dtype=np.float64).reshape(-1, 2),
+    }
+
+
+def _property_columns(features: List[Dict[str, Any]]):
+    """
+    Properti -> kolom: bilangan bulat (int64), angka (float64, NaN = kosong),
+    atau teks (unicode; null disimpan sebagai "" untuk kolom `nullable`).
+    """
+    names: List[str] = []
+    for f in features:
+        for name in (f.get("properties") or {}).keys():
+            if name not in names:
+                names.append(name)
+    specs, arrays = {}, {}
+    for i, name in enumerate(names):
+        values = [(f.get("properties") or {}).get(name) for f in features]
+        present = [v for v in values if v is not None]
+        numeric = present and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in present
+        )
+        array = f"prop_{i}"
+        if (
+            numeric
+            and len(present) == len(values)
+            and all(isinstance(v, int) for v in present)
+        ):
+            arrays[array] = np.asarray(values, dtype=np.int64)
+            specs[name] = {"array": array, "kind": "int"}
+        elif numeric:
+            arrays[array] = np.asarray(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+            specs[name] = {"array": array, "kind": "float"}
+        else:
+            arrays[array] = np.asarray(
+                ["" if v is None else str(v) for v in values], dtype=np.str_
+            )
+            specs[name] = {
+                "array": array,
+                "kind": "str",
+                "nullable": len(present) < len(values),
+            }
+    return specs, arrays
+
+
+def build(
+    features: List[Dict[str, Any]],
+    zooms: Sequence[int] = geometry_simplify.LOD_ZOOMS,
+) -> GeometryStore:
+    """Kemas fitur GeoJSON + level sederhana (geometry_simplify) ke array."""
+    full = _pack([f.get("geometry") for f in features])
+    arrays = {
+        "geometry_type": full["geometry_type"],
+        "feature_offsets": full["feature_offsets"],
+        "polygon_offsets": full["polygon_offsets"],
+        f"coords_{FULL_LEVEL}": full["coords"],
+        f"ring_offsets_{FULL_LEVEL}": full["ring_offsets"],
+    }
+    levels = []
+    for level in geometry_simplify.build_levels(features, zooms)["levels"]:
+        name = f"z{level['max_zoom']}"
+        packed = _pack(level["geometries"])
+        # Penyederhanaan mempertahankan semua ring -> struktur offset sama
+        assert np.array_equal(packed["polygon_offsets"], full["polygon_offsets"])
+        arrays[f"coords_{name}"] = packed["coords"]
+        arrays[f"ring_offsets_{name}"] = packed["ring_offsets"]
+        levels.append({k: v for k, v in level.items() if k != "geometries"})
+        levels[-1]["name"] = name
+
+    bbox, centroid, vertex_count = feature_arrays(features)
+    arrays.update(bbox=bbox, centroid=centroid, vertex_count=vertex_count)
+    specs, prop_arrays = _property_columns(features)
+    arrays.update(prop_arrays)
+    manifest = {
+        "features": len(features),
+        "vertices": int(len(full["coords"])),
+        "levels": levels,
+        "properties": specs,
+    }
+    return GeometryStore(manifest, arrays)
+
+
+def save(directory: str, store: GeometryStore) -> None:
+    """
+    Ditulis ke direktori sementara lalu di-rename, sehingga worker lain tidak
+    pernah membaca store parsial (bila kalah balapan, hasil sendiri dibuang).
+    """
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    for name, arr in store.arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+    manifest = {
+        **store.manifest,
+        "format": FORMAT_VERSION,
+        "arrays": sorted(store.arrays),
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load(directory: str, mmap: bool = True) -> GeometryStore:
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Format geostore tidak didukung: {manifest.get('format')}")
+    arrays = {
+        name: np.load(
+            os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None
+        )
+        for name in manifest["arrays"]
+    }
+    return GeometryStore(manifest, arrays)
+
+
+def store_path(geojson_path: str) -> str:
+    root, _ = os.path.splitext(str(geojson_path))
+    return root + STORE_SUFFIX
+
+
+def _is_fresh(directory: str, geojson_path: str) -> bool:
+    manifest = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest):
+        return False
+    if not os.path.exists(geojson_path):
+        return True  # hanya store yang di-deploy
+    return os.path.getmtime(manifest) >= os.path.getmtime(geojson_path)
+
+
+def is_available(geojson_path: str) -> bool:
+    """GeoJSON sumber atau store hasil build-nya ada."""
+    return os.path.exists(geojson_path) or os.path.exists(
+        os.path.join(store_path(geojson_path), MANIFEST_FILE)
+    )
+
+
+def build_from_file(geojson_path: str) -> GeometryStore:
+    with open(geojson_path, "r", encoding="utf-8") as f:
+        return build(json.load(f)["features"])
+
+
+def load_or_build(geojson_path: str) -> GeometryStore:
+    """Store ter-mmap; dibangun dari GeoJSON bila belum ada atau sudah basi."""
+    directory = store_path(geojson_path)
+    if not _is_fresh(directory, geojson_path):
+        store = build_from_file(geojson_path)
+        try:
+            save(directory, store)
+        except OSError:
+            return store  # direktori read-only: pakai hasil di memori
+    return load(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Kemas GeoJSON peta risiko ke geostore biner (multi-resolusi)"
+    )
+    parser.add_argument("geojson")
+    args = parser.parse_args()
+    store = build_from_file(args.geojson)
+    save(store_path(args.geojson), store)
+    print(f"{len(store)} fitur, {store.manifest['vertices']:,} verteks")
+    for level in store.levels:
+        print(
+            f"  {level['name']:<4} zoom <= {level['max_zoom']:>2}: "
+            f"toleransi {level['tolerance']:.2e}°, {level['vertices']:,} verteks"
+        )
+    print(f"-> {store_path(args.geojson)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# StuntLytics/src/insight_engine.py
+# Mesin percakapan InsightNow: konteks ringkas yang di-cache per filter dan
+# jendela riwayat ber-anggaran token agar ukuran prompt tetap datar.
+import json
+import math
+from typing import Any, Dict, List
+
+from src import elastic_client as es
+from src.query_cache import SHARED_CACHE, fingerprint
+
+SYSTEM_PROMPT = (
+    "Anda adalah seorang analis data kesehatan masyarakat senior yang ahli dalam "
+    "analisis stunting di Jawa Barat. Jawab HANYA berdasarkan konteks data yang "
+    "diberikan. Jawaban singkat, padat, berbasis data, dan langsung ke intinya. "
+    "Gunakan format Markdown untuk poin-poin jika perlu."
+)
+
+# Kunci filter yang relevan untuk prompt (field deteksi internal tidak dikirim)
+_PROMPT_FILTER_KEYS = ["date_from", "date_to", "wilayah", "kecamatan", "risk_level"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimasi kasar jumlah token (~4 karakter per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _round_floats(obj: Any, ndigits: int = 2) -> Any:
+    if isinstance(obj, float):
+        return round(obj, ndigits)
+    if isinstance(obj, dict):
+        return {k: _round_floats(v, ndigits) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_round_floats(v, ndigits) for v in obj]
+    return obj
+
+
+def active_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Hanya filter yang benar-benar terisi, untuk prompt dan fingerprint."""
+    return {k: filters[k] for k in _PROMPT_FILTER_KEYS if filters.get(k)}
+
+
+def get_summary_context(filters: Dict[str, Any]) -> str:
+    """
+    Konteks KPI terfilter dalam JSON ringkas. Di-cache per fingerprint filter
+    sehingga pertanyaan lanjutan tidak memicu query ulang ke Elasticsearch.
+    """
+    key = f"insight_context:{fingerprint(filters)}"
+
+    def build() -> str:
+        with es.accuracy(es.ACCURACY_EXACT):
+            summary = es.get_main_page_summary(filters)
+        context = {
+            "filter": active_filters(filters),
+            "kpi": _round_floats(summary.get("kpi", {})),
+        }
+        return compact_json(context)
+
+    return SHARED_CACHE.get_or_compute(key, build)
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    flat = " ".join(text.split())
+    for sep in (". ", "? ", "! "):
+        idx = flat.find(sep)
+        if 0 < idx < max_chars:
+            return flat[: idx + 1]
+    return flat if len(flat) <= max_chars else flat[: max_chars - 1] + "…"
+
+
+class InsightConversation:
+    """
+    Riwayat percakapan dengan jendela bergulir. Giliran terbaru dikirim utuh
+    selama muat di `history_token_budget`; giliran yang lebih tua dipadatkan
+    menjadi ringkasan ekstraktif dengan batas `summary_token_budget`.
+    """
+
+    def __init__(
+        self,
+        history_token_budget: int = 1200,
+        summary_token_budget: int = 300,
+        max_recent_turns: int = 6,
+    ):
+        self.history_token_budget = history_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_recent_turns = max_recent_turns
+        self.recent: List[Dict[str, str]] = []
+        self.summary_lines: List[str] = []
+
+    def add(self, role: str, content: str) -> None:
+        self.recent.append({"role": role, "content": content})
+        self._compact()
+
+    def _history_tokens(self) -> int:
+        return sum(estimate_tokens(t["content"]) for t in self.recent)
+
+    def _compact(self) -> None:
+        while self.recent and (
+            len(self.recent) > self.max_recent_turns
+            or self._history_tokens() > self.history_token_budget
+        ):
+            turn = self.recent.pop(0)
+            label = "T" if turn["role"] == "user" else "J"
+            limit = 160 if turn["role"] == "user" else 220
+            self.summary_lines.append(
+                f"{label}: {_first_sentence(turn['content'], limit)}"
+            )
+        # Ringkasan juga dibatasi: baris tertua dibuang lebih dulu
+        while (
+            self.summary_lines
+            and estimate_tokens("\n".join(self.summary_lines))
+            > self.summary_token_budget
+        ):
+            self.summary_lines.pop(0)
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def build_messages(
+        self,
+        context: str,
+        question: str,
+        system_prompt: str = SYSTEM_PROMPT,
+        context_label: str = "Konteks data terfilter",
+    ) -> List[Dict[str, str]]:
+        """
+        Susun pesan untuk model. Bagian system (instruksi + konteks) diletakkan di
+        depan agar stabil antar giliran; pertanyaan baru selalu di akhir.
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": f"{context_label} (JSON): {context}"},
+        ]
+        if self.summary_lines:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Ringkasan percakapan sebelumnya:\n{self.summary}",
+                }
+            )
+        messages.extend(self.recent)
+        messages.append({"role": "user", "content": question})
+        return messages
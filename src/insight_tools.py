@@ -0,0 +1,277 @@
+# StuntLytics/src/insight_tools.py
+# Mode tool-calling InsightNow: model hanya meminta agregat yang ia butuhkan.
+# Setiap tool memanggil fungsi elastic_client lewat query cache bersama.
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src import elastic_client as es
+from src import llm_client
+from src.insight_engine import InsightConversation, active_filters, compact_json
+from src.query_cache import cached
+
+MAX_TOOL_ROUNDS = 4
+
+TOOL_SYSTEM_PROMPT = (
+    "Anda adalah seorang analis data kesehatan masyarakat senior yang ahli dalam "
+    "analisis stunting di Jawa Barat. Anda TIDAK diberi data di awal: panggil tool "
+    "yang paling sempit yang cukup untuk menjawab, lalu jawab HANYA berdasarkan "
+    "hasil tool. Jawaban singkat, padat, dan berbasis data dalam format Markdown."
+)
+
+# --- Sumber data ter-cache (fingerprint = nama fungsi + filter) ---
+# Jawaban AI diperlakukan sebagai laporan: selalu pakai hitungan pasti
+_exact = es.with_accuracy(es.ACCURACY_EXACT)
+_cached_summary = cached("es.main_page_summary")(_exact(es.get_main_page_summary))
+_cached_trend = cached("es.monthly_trend")(_exact(es.get_monthly_trend))
+# Sudah di-cache di elastic_client; composite selalu menghitung pasti
+_cached_risk_map = es.get_risk_map_data
+_cached_top_counts = cached("es.top_counts")(
+    _exact(es.get_top_counts_for_explorer_chart)
+)
+
+
+def _tool_kpi_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
+    kpi = _cached_summary(filters)["kpi"]
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in kpi.items()}
+
+
+def _tool_monthly_trend(
+    filters: Dict[str, Any], last_n_months: int = 12
+) -> Dict[str, Any]:
+    df = _cached_trend(filters)
+    if df.empty:
+        return {"bulan": [], "stunting_pct": []}
+    tail = df.tail(max(1, min(int(last_n_months), 60)))
+    return {
+        "bulan": tail.index.tolist(),
+        "stunting_pct": tail["Stunting %"].round(2).tolist(),
+    }
+
+
+def _tool_risk_by_kecamatan(
+    filters: Dict[str, Any],
+    kabupaten: Optional[str] = None,
+    top_n: int = 10,
+    order: str = "tertinggi",
+) -> Dict[str, Any]:
+    df = _cached_risk_map(filters)
+    if df.empty:
+        return {"rows": []}
+    if kabupaten:
+        df = df[
+            df["kabupaten"].str.upper().str.contains(kabupaten.upper(), regex=False)
+        ]
+    df = df[df["total_anak"] > 0].assign(
+        prevalensi_pct=lambda d: (d["jumlah_stunting"] / d["total_anak"] * 100).round(2)
+    )
+    df = df.sort_values("prevalensi_pct", ascending=(order == "terendah"))
+    cols = ["kabupaten", "kecamatan", "prevalensi_pct", "jumlah_stunting", "total_anak"]
+    top = df.head(max(1, min(int(top_n), 25)))[cols]
+    return {"kolom": cols, "rows": top.values.tolist(), "jumlah_kecamatan": len(df)}
+
+
+def _tool_top_region_counts(filters: Dict[str, Any]) -> Dict[str, Any]:
+    df = _cached_top_counts(filters, {})
+    if df.empty:
+        return {"rows": []}
+    level = df.columns[0]
+    return {"level": level, "rows": df[[level, "Jumlah Data"]].values.tolist()}
+
+
+TOOL_HANDLERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "get_kpi_summary": _tool_kpi_summary,
+    "get_monthly_trend": _tool_monthly_trend,
+    "get_risk_by_kecamatan": _tool_risk_by_kecamatan,
+    "get_top_region_counts": _tool_top_region_counts,
+}
+
+TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_kpi_summary",
+            "description": "KPI utama wilayah terfilter: total bayi, jumlah stunting, nakes, cakupan imunisasi (%), akses air layak (%).",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_monthly_trend",
+            "description": "Tren prevalensi stunting (%) per bulan untuk wilayah terfilter.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "last_n_months": {
+                        "type": "integer",
+                        "description": "Jumlah bulan terakhir (1-60, default 12).",
+                    }
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_risk_by_kecamatan",
+            "description": "Prevalensi stunting per kecamatan, diurutkan. Gunakan untuk pertanyaan wilayah tertinggi/terendah.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "kabupaten": {
+                        "type": "string",
+                        "description": "Batasi ke satu kabupaten/kota (opsional).",
+                    },
+                    "top_n": {
+                        "type": "integer",
+                        "description": "Jumlah baris (1-25, default 10).",
+                    },
+                    "order": {"type": "string", "enum": ["tertinggi", "terendah"]},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_top_region_counts",
+            "description": "5 wilayah dengan jumlah data terbanyak pada level saat ini (kabupaten atau kecamatan).",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+]
+
+
+def execute_tool(name: str, arguments: str, filters: Dict[str, Any]) -> str:
+    """Jalankan satu tool call dan kembalikan hasilnya sebagai JSON ringkas."""
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        return compact_json({"error": f"Tool tidak dikenal: {name}"})
+    try:
+        kwargs = json.loads(arguments) if arguments else {}
+        return compact_json(handler(filters, **kwargs))
+    except Exception as e:
+        return compact_json({"error": str(e)})
+
+
+class ToolCallingStream:
+    """
+    Seperti `llm_client.ChatStream`, tetapi model boleh memanggil tool hingga
+    `MAX_TOOL_ROUNDS` kali sebelum menjawab. Semua putaran di-stream; teks
+    jawaban langsung diteruskan ke UI, tool call dikumpulkan lalu dieksekusi.
+    `client` dapat diganti dengan model palsu ber-skrip untuk pengujian.
+    """
+
+    def __init__(
+        self,
+        messages: List[Dict[str, Any]],
+        filters: Dict[str, Any],
+        timeout: float = 60,
+        client: Any = None,
+    ):
+        self.messages = list(messages)
+        self.filters = filters
+        self.timeout = timeout
+        self.client = client
+        self.metrics = llm_client.CallMetrics(
+            label="insightnow-tools", model=llm_client.DEFAULT_MODEL
+        )
+
+    def _round(self, client: Any, started: float, use_tools: bool):
+        """Satu putaran streaming. Menghasilkan teks; mengembalikan daftar tool call."""
+        stream = client.chat.completions.create(
+            model=self.metrics.model,
+            messages=self.messages,
+            tools=TOOLS,
+            tool_choice="auto" if use_tools else "none",
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=self.timeout,
+        )
+        calls: Dict[int, Dict[str, str]] = {}
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                m = self.metrics
+                m.prompt_tokens = (m.prompt_tokens or 0) + usage.prompt_tokens
+                m.completion_tokens = (
+                    m.completion_tokens or 0
+                ) + usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            for tc in getattr(delta, "tool_calls", None) or []:
+                slot = calls.setdefault(
+                    tc.index, {"id": "", "name": "", "arguments": ""}
+                )
+                slot["id"] = tc.id or slot["id"]
+                if tc.function is not None:
+                    slot["name"] += tc.function.name or ""
+                    slot["arguments"] += tc.function.arguments or ""
+            if delta.content:
+                if self.metrics.ttft_s is None:
+                    self.metrics.ttft_s = time.perf_counter() - started
+                self.metrics.chunks += 1
+                yield delta.content
+        return [calls[i] for i in sorted(calls)]
+
+    def __iter__(self) -> Iterator[str]:
+        started = time.perf_counter()
+        try:
+            client = self.client or llm_client.get_client()
+            for round_no in range(MAX_TOOL_ROUNDS + 1):
+                # Putaran terakhir dipaksa menjawab tanpa tool
+                calls = yield from self._round(
+                    client, started, use_tools=round_no < MAX_TOOL_ROUNDS
+                )
+                if not calls:
+                    break
+                self.messages.append(
+                    {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [
+                            {
+                                "id": c["id"],
+                                "type": "function",
+                                "function": {
+                                    "name": c["name"],
+                                    "arguments": c["arguments"],
+                                },
+                            }
+                            for c in calls
+                        ],
+                    }
+                )
+                for c in calls:
+                    self.metrics.tool_calls += 1
+                    self.messages.append(
+                        {
+                            "role": "tool",
+                            "tool_call_id": c["id"],
+                            "content": execute_tool(
+                                c["name"], c["arguments"], self.filters
+                            ),
+                        }
+                    )
+        except Exception as e:
+            self.metrics.error = str(e)
+            yield f"Gagal menghubungi server OpenAI. Mohon coba lagi nanti. Error: {e}"
+        finally:
+            self.metrics.total_s = time.perf_counter() - started
+            if self.metrics.completion_tokens is None and not self.metrics.error:
+                self.metrics.completion_tokens = self.metrics.chunks
+            llm_client.CALL_LOG.append(self.metrics)
+
+
+def build_tool_messages(
+    filters: Dict[str, Any], conversation: InsightConversation, question: str
+) -> List[Dict[str, Any]]:
+    """Prompt mode tool: hanya instruksi + filter aktif, tanpa blob KPI."""
+    return conversation.build_messages(
+        compact_json(active_filters(filters)),
+        question,
+        system_prompt=TOOL_SYSTEM_PROMPT,
+        context_label="Filter aktif",
+    )
@@ -0,0 +1,27 @@
+# StuntLytics/src/labels.py
+# Label stunting per dokumen, mengikuti definisi agregasi stunting di
+# elastic_client. Dipakai pelatihan (src/training) dan estimasi sampel
+# (src/sampling); sengaja tanpa dependensi modul src lain.
+import numpy as np
+import pandas as pd
+
+STATUS_FIELD = "Status Stunting (Biner)"
+ZSCORE_FIELDS = ["Z-Score TB/U", "ZScore TB/U"]
+POSITIVE_STATUS = {"stunting", "ya", "1", "true"}
+ZSCORE_CUTOFF = -2.0
+
+
+def extract_labels(source_df: pd.DataFrame) -> pd.Series:
+    """1 = stunting, 0 = tidak, NaN = tidak berlabel."""
+    label = pd.Series(np.nan, index=source_df.index)
+    if STATUS_FIELD in source_df:
+        status = source_df[STATUS_FIELD].astype("string").str.strip().str.lower()
+        label[status.notna().to_numpy()] = 0.0
+        label[status.isin(POSITIVE_STATUS).fillna(False).to_numpy()] = 1.0
+    for field in ZSCORE_FIELDS:
+        if field not in source_df:
+            continue
+        z = pd.to_numeric(source_df[field], errors="coerce")
+        label[(label.isna() & z.notna()).to_numpy()] = 0.0
+        label[(z <= ZSCORE_CUTOFF).fillna(False).to_numpy()] = 1.0
+    return label
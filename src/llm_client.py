@@ -0,0 +1,131 @@
+# StuntLytics/src/llm_client.py
+# Klien LLM bersama: streaming token ke UI + pencatatan metrik per panggilan.
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import openai
+import streamlit as st
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-nano")
+# Endpoint kompatibel OpenAI, mis. server palsu lokal (scripts/fake_openai_server.py)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Riwayat metrik panggilan terakhir (dibagi antar sesi dalam satu proses)
+CALL_LOG: Deque["CallMetrics"] = deque(maxlen=200)
+
+
+def get_api_key() -> str:
+    """Mencari OPENAI_API_KEY dari environment, lalu dari st.secrets."""
+    env_key = os.getenv("OPENAI_API_KEY", "")
+    if env_key:
+        return env_key
+    try:
+        return st.secrets.get("OPENAI_API_KEY", "")
+    except Exception:
+        return ""
+
+
+def get_client(api_key: Optional[str] = None) -> openai.OpenAI:
+    return openai.OpenAI(api_key=api_key or get_api_key(), base_url=OPENAI_BASE_URL)
+
+
+@dataclass
+class CallMetrics:
+    label: str
+    model: str
+    ttft_s: Optional[float] = None
+    total_s: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    chunks: int = 0
+    tool_calls: int = 0
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def caption(self) -> str:
+        """Ringkasan satu baris untuk ditampilkan di bawah jawaban."""
+        if self.error:
+            return f"Gagal setelah {self.total_s or 0:.2f} dtk"
+        ttft = f"{self.ttft_s:.2f} dtk" if self.ttft_s is not None else "-"
+        tokens = self.completion_tokens if self.completion_tokens is not None else "?"
+        text = (
+            f"Token pertama {ttft} · total {self.total_s or 0:.2f} dtk · "
+            f"{self.prompt_tokens or '?'} token prompt / {tokens} token jawaban"
+        )
+        if self.tool_calls:
+            text += f" · {self.tool_calls} tool call"
+        return text
+
+
+class ChatStream:
+    """
+    Iterable berisi potongan teks jawaban, siap dipakai `st.write_stream`.
+    Metrik (TTFT, latensi total, jumlah token) tersedia di `.metrics`
+    setelah iterasi selesai dan juga dicatat ke `CALL_LOG`.
+    """
+
+    def __init__(
+        self,
+        messages: List[Dict[str, str]],
+        label: str,
+        timeout: float = 60,
+        model: Optional[str] = None,
+        client: Optional[openai.OpenAI] = None,
+        error_prefix: str = "Gagal menghubungi server OpenAI. Mohon coba lagi nanti. Error: ",
+    ):
+        self.messages = messages
+        self.timeout = timeout
+        self.client = client
+        self.error_prefix = error_prefix
+        self.metrics = CallMetrics(label=label, model=model or DEFAULT_MODEL)
+
+    def __iter__(self) -> Iterator[str]:
+        started = time.perf_counter()
+        try:
+            client = self.client or get_client()
+            stream = client.chat.completions.create(
+                model=self.metrics.model,
+                messages=self.messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=self.timeout,
+            )
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    self.metrics.prompt_tokens = usage.prompt_tokens
+                    self.metrics.completion_tokens = usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                if self.metrics.ttft_s is None:
+                    self.metrics.ttft_s = time.perf_counter() - started
+                self.metrics.chunks += 1
+                yield text
+        except Exception as e:
+            self.metrics.error = str(e)
+            yield f"{self.error_prefix}{e}"
+        finally:
+            self.metrics.total_s = time.perf_counter() - started
+            # Server tanpa dukungan `include_usage`: satu chunk ~ satu token
+            if self.metrics.completion_tokens is None and not self.metrics.error:
+                self.metrics.completion_tokens = self.metrics.chunks
+            CALL_LOG.append(self.metrics)
+
+
+def stream_chat(
+    system_prompt: str, prompt: str, label: str, timeout: float = 60
+) -> ChatStream:
+    """Shortcut untuk pola system + user prompt yang dipakai semua halaman."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    return ChatStream(messages, label=label, timeout=timeout)
@@ -0,0 +1,339 @@
+# StuntLytics/src/model_registry.py
+# Registry model berversi:
+#
+#   models/registry/
+#   ├── CURRENT                  # nama versi aktif (ditukar atomik via os.replace)
+#   ├── 20261019-101500/
+#   │   ├── metadata.json
+#   │   └── manifest.json, *.npy # scorer terkompilasi, atau pipeline.joblib
+#   └── ...
+#
+# Pemakaian:
+#   python -m src.model_registry publish models/stunting_scorer
+#   python -m src.model_registry activate 20261019-101500
+#   python -m src.model_registry list
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import compiled_scorer
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = "models/registry"
+CURRENT_FILE = "CURRENT"
+METADATA_FILE = "metadata.json"
+PIPELINE_FILE = "pipeline.joblib"
+
+
+def version_dir(version: str, root: str = REGISTRY_DIR) -> str:
+    return os.path.join(root, version)
+
+
+def load_artifact(path: str) -> Any:
+    """Direktori versi -> objek dengan `predict_proba` (scorer di-mmap bila ada)."""
+    if os.path.exists(os.path.join(path, compiled_scorer.MANIFEST_FILE)):
+        return compiled_scorer.load(path)
+    import joblib
+
+    return joblib.load(os.path.join(path, PIPELINE_FILE))
+
+
+def read_metadata(version: str, root: str = REGISTRY_DIR) -> Dict[str, Any]:
+    with open(
+        os.path.join(version_dir(version, root), METADATA_FILE), "r", encoding="utf-8"
+    ) as f:
+        return json.load(f)
+
+
+def list_versions(root: str = REGISTRY_DIR) -> List[str]:
+    """Versi yang lengkap (punya metadata.json), urut nama."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, METADATA_FILE))
+    )
+
+
+def current_version(root: str = REGISTRY_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate(version: str, root: str = REGISTRY_DIR) -> None:
+    """Menjadikan `version` aktif; pembaca melihat versi lama atau baru, tidak pernah parsial."""
+    if version not in list_versions(root):
+        raise ValueError(f"Versi model tidak ditemukan di registry: {version}")
+    tmp = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def publish(
+    source: str,
+    version: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    root: str = REGISTRY_DIR,
+    make_current: bool = True,
+) -> str:
+    """
+    Menyalin artefak (direktori scorer terkompilasi atau file .joblib) ke registry
+    sebagai versi baru. Direktori disiapkan di lokasi sementara lalu di-rename,
+    sehingga versi hanya terlihat setelah lengkap.
+    """
+    version = version or datetime.now().strftime("%Y%m%d-%H%M%S")
+    target = version_dir(version, root)
+    if os.path.exists(target):
+        raise ValueError(f"Versi model sudah ada: {version}")
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".{version}.staging")
+    shutil.rmtree(staging, ignore_errors=True)
+
+    if os.path.isdir(source):
+        shutil.copytree(source, staging)
+        kind = "compiled"
+    else:
+        os.makedirs(staging)
+        shutil.copy2(source, os.path.join(staging, PIPELINE_FILE))
+        kind = "joblib"
+
+    meta = {
+        "version": version,
+        "kind": kind,
+        "source": os.path.abspath(source),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        **(metadata or {}),
+    }
+    manifest_path = os.path.join(staging, compiled_scorer.MANIFEST_FILE)
+    if kind == "compiled" and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        meta.setdefault("estimator", manifest.get("source"))
+        meta.setdefault("parity_max_abs_diff", manifest.get("parity_max_abs_diff"))
+    with open(os.path.join(staging, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    os.replace(staging, target)
+    if make_current:
+        activate(version, root)
+    return version
+
+
+class ModelRegistry:
+    """
+    Pemuat model dari registry untuk proses yang berjalan lama.
+    - Lazy: versi baru dimuat saat pertama kali diminta.
+    - LRU: paling banyak `max_loaded` versi tersimpan di memori; versi aktif tidak di-evict.
+    - Hot swap: perubahan file CURRENT (mtime) dicek paling sering tiap `check_interval_s`.
+      Pemanggil yang masih memegang model lama tetap bisa menyelesaikan prediksinya.
+      Versi baru dimuat & divalidasi di luar lock; versi rusak tidak menggantikan
+      versi lama.
+    """
+
+    def __init__(
+        self,
+        root: str = REGISTRY_DIR,
+        max_loaded: int = 2,
+        check_interval_s: float = 1.0,
+    ):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.check_interval_s = check_interval_s
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._current: Optional[str] = None
+        self._current_mtime: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._swap_lock = threading.Lock()
+        self.loads = 0
+        self.swaps = 0
+        self.load_errors = 0
+        self.last_error: Optional[str] = None
+
+    def _pending_swap(self) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """(versi, mtime) bila CURRENT menunjuk versi lain; dipanggil di bawah lock."""
+        now = time.monotonic()
+        if self._current and now - self._checked_at < self.check_interval_s:
+            return None
+        self._checked_at = now
+        try:
+            st = os.stat(os.path.join(self.root, CURRENT_FILE))
+            # os.replace membuat inode baru, jadi perubahan terdeteksi walau mtime sama
+            mtime = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        if mtime == self._current_mtime:
+            return None
+        version = current_version(self.root)
+        if not version or version == self._current:
+            self._current_mtime = mtime
+            return None
+        return version, mtime
+
+    def _load_validated(self, version: str) -> Any:
+        """Muat artefak lalu uji satu baris `predict_proba`; gagal -> exception."""
+        model = load_artifact(version_dir(version, self.root))
+        proba = np.asarray(
+            model.predict_proba(compiled_scorer.synthetic_sample(1)), dtype=float
+        )
+        if proba.shape != (1, 2) or not np.isfinite(proba).all():
+            raise ValueError(f"predict_proba tidak valid: shape {proba.shape}")
+        return model
+
+    def _refresh_current(self) -> Optional[str]:
+        """
+        Versi aktif. Versi baru di CURRENT dimuat & divalidasi di luar lock
+        (pemanggil lain tetap dilayani versi lama) dan baru ditukar bila berhasil;
+        bila gagal, versi lama tetap dipakai.
+        """
+        with self._lock:
+            pending = self._pending_swap()
+            current = self._current
+        if pending is None:
+            return current
+        version, mtime = pending
+        # Satu pemuat saja; tanpa versi lama, pemanggil menunggu pemuatan
+        if not self._swap_lock.acquire(blocking=current is None):
+            return current
+        try:
+            with self._lock:
+                if self._current_mtime == mtime:
+                    return self._current  # sudah ditangani pemanggil lain
+                model = self._models.get(version)
+            loaded = model is None
+            if loaded:
+                model = self._load_validated(version)
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+                self.last_error = f"{version}: {e}"
+                if current is not None:
+                    self._current_mtime = (
+                        mtime  # tidak dicoba ulang sampai CURRENT berubah
+                    )
+            if current is None:
+                raise
+            logger.error(
+                "Gagal memuat model %s, tetap memakai %s: %s", version, current, e
+            )
+            return current
+        else:
+            with self._lock:
+                if loaded:
+                    self.loads += 1
+                self._models[version] = model
+                self._models.move_to_end(version)
+                if self._current is not None:
+                    self.swaps += 1
+                self._current = version
+                self._current_mtime = mtime
+                self._evict()
+            return version
+        finally:
+            self._swap_lock.release()
+
+    def has_current(self) -> bool:
+        return self._refresh_current() is not None
+
+    def get_with_version(self, version: Optional[str] = None) -> Tuple[str, Any]:
+        """(versi, model); tanpa argumen memakai versi aktif."""
+        version = version or self._refresh_current()
+        if version is None:
+            raise LookupError(
+                f"Registry model kosong: {self.root}/{CURRENT_FILE} tidak ada"
+            )
+        with self._lock:
+            model = self._models.get(version)
+            if model is not None:
+                self._models.move_to_end(version)
+                return version, model
+        # Versi non-aktif yang diminta eksplisit: dimuat di luar lock
+        model = load_artifact(version_dir(version, self.root))
+        with self._lock:
+            if version not in self._models:
+                self.loads += 1
+                self._models[version] = model
+            self._models.move_to_end(version)
+            self._evict()
+            return version, self._models[version]
+
+    def get(self, version: Optional[str] = None) -> Any:
+        return self.get_with_version(version)[1]
+
+    def _evict(self) -> None:
+        while len(self._models) > self.max_loaded:
+            oldest = next(iter(self._models))
+            if oldest == self._current:
+                self._models.move_to_end(oldest)
+                oldest = next(iter(self._models))
+                if oldest == self._current:
+                    break
+            del self._models[oldest]
+
+    def loaded_versions(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "current": self._current,
+                "loaded": list(self._models),
+                "loads": self.loads,
+                "swaps": self.swaps,
+                "load_errors": self.load_errors,
+                "last_error": self.last_error,
+            }
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kelola registry model berversi")
+    parser.add_argument("--root", default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_publish = sub.add_parser("publish", help="tambahkan artefak sebagai versi baru")
+    p_publish.add_argument(
+        "source", help="direktori scorer terkompilasi atau file .joblib"
+    )
+    p_publish.add_argument("--version")
+    p_publish.add_argument("--no-activate", action="store_true")
+    p_activate = sub.add_parser("activate", help="jadikan versi aktif")
+    p_activate.add_argument("version")
+    sub.add_parser("list", help="daftar versi")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        version = publish(
+            args.source, args.version, root=args.root, make_current=not args.no_activate
+        )
+        print(f"Versi {version} dipublikasikan ke {args.root}")
+    elif args.command == "activate":
+        activate(args.version, args.root)
+        print(f"Versi aktif: {args.version}")
+    else:
+        current = current_version(args.root)
+        for version in list_versions(args.root):
+            meta = read_metadata(version, args.root)
+            marker = "*" if version == current else " "
+            print(
+                f"{marker} {version}  {meta.get('kind', '-'):8}  {meta.get('created_at', '-')}"
+            )
+
+
+if __name__ == "__main__":
+    main()
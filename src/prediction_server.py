@@ -0,0 +1,279 @@
+# StuntLytics/src/prediction_server.py
+# Server prediksi lokal: satu model di memori dipakai bersama oleh semua worker
+# Streamlit. Request yang masuk diantrekan lalu digabung menjadi micro-batch
+# (menunggu paling lama beberapa milidetik) dan diskor dengan satu panggilan
+# `predict_proba` per batch.
+#
+# Pemakaian:
+#   python -m src.prediction_server --port 8765 --max-wait-ms 2
+#   PREDICT_API_URL=http://127.0.0.1:8765/predict streamlit run app.py
+#
+# API:
+#   POST /predict  {"records": [{...18 field...}, ...]}   (atau {"record": {...}})
+#     -> {"model_version": ..., "probabilities": [p | null, ...],
+#         "errors": [{"baris": i, "field": ..., "nilai": ...}]}
+#   GET  /health   -> statistik batch & versi model
+import argparse
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import prediction_service
+
+# (versi model, probabilitas kelas positif (NaN = tidak valid), error per baris)
+ScoreResult = Tuple[str, np.ndarray, List[Dict[str, Any]]]
+
+
+@dataclass
+class _Pending:
+    records: List[Dict[str, Any]]
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """
+    Antrean request -> micro-batch. Thread tunggal mengambil request pertama,
+    lalu menampung request lain sampai `max_wait_ms` berlalu atau jumlah baris
+    mencapai `max_batch_rows`, kemudian memanggil `score_fn` sekali.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[Dict[str, Any]]], ScoreResult],
+        max_batch_rows: int = 4096,
+        max_wait_ms: float = 2.0,
+    ):
+        self.score_fn = score_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, records: List[Dict[str, Any]]) -> Future:
+        pending = _Pending(records)
+        self._queue.put(pending)
+        return pending.future
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        rows = len(batch[0].records)
+        deadline = time.monotonic() + self.max_wait_s
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item.records)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            records = [r for item in batch for r in item.records]
+            try:
+                version, proba, errors = self.score_fn(records)
+                self._distribute(batch, version, proba, errors)
+            except Exception as e:
+                # Thread ini satu-satunya pekerja: galat apa pun hanya menggagalkan
+                # request di batch ini, bukan seluruh server
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.rows += len(records)
+                self.max_batch_seen = max(self.max_batch_seen, len(records))
+
+    @staticmethod
+    def _distribute(
+        batch: List[_Pending],
+        version: str,
+        proba: np.ndarray,
+        errors: List[Dict[str, Any]],
+    ) -> None:
+        """Kembalikan potongan hasil milik tiap request (indeks baris lokal)."""
+        n_rows = sum(len(item.records) for item in batch)
+        if len(proba) != n_rows:
+            raise ValueError(
+                f"Jumlah probabilitas ({len(proba)}) != jumlah baris ({n_rows})"
+            )
+        errors_by_row: Dict[int, List[Dict[str, Any]]] = {}
+        for err in errors:
+            errors_by_row.setdefault(int(err["baris"]), []).append(err)
+        offset = 0
+        for item in batch:
+            n = len(item.records)
+            part = proba[offset : offset + n]
+            item.future.set_result(
+                {
+                    "model_version": version,
+                    "probabilities": [
+                        None if np.isnan(p) else round(float(p), 6) for p in part
+                    ],
+                    "errors": [
+                        {**err, "baris": i}
+                        for i in range(n)
+                        for err in errors_by_row.get(offset + i, [])
+                    ],
+                }
+            )
+            offset += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "rows": self.rows,
+                "avg_batch_rows": round(self.rows / max(self.batches, 1), 2),
+                "max_batch_rows": self.max_batch_seen,
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+_default_model = None
+
+
+def _current_model() -> Tuple[str, Any]:
+    """Versi aktif registry (hot swap); fallback ke file model bawaan."""
+    global _default_model
+    try:
+        return prediction_service.REGISTRY.get_with_version()
+    except LookupError:
+        if _default_model is None:
+            _default_model = prediction_service.load_model()
+        return "default", _default_model
+
+
+def score_records(records: List[Dict[str, Any]]) -> ScoreResult:
+    """Validasi + skoring satu micro-batch; baris tidak valid bernilai NaN."""
+    df = pd.DataFrame.from_records(records, columns=prediction_service.INPUT_FIELDS)
+    valid, errors_df = prediction_service.validate_batch(df)
+    version, model = _current_model()
+    proba = np.full(len(df), np.nan)
+    if len(valid):
+        scores = model.predict_proba(valid[prediction_service.INPUT_FIELDS])[:, 1]
+        proba[valid.index.to_numpy()] = scores
+    errors = [
+        {"baris": int(row.baris), "field": row.field, "nilai": str(row.nilai)}
+        for row in errors_df.itertuples(index=False)
+    ]
+    return version, proba, errors
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 agar klien (requests.Session) bisa memakai ulang koneksi
+    protocol_version = "HTTP/1.1"
+    batcher: MicroBatcher = None
+    request_timeout_s = 30.0
+
+    def setup(self):
+        super().setup()
+        # Header & body ditulis terpisah; tanpa TCP_NODELAY, Nagle + delayed ACK
+        # menambah ~40 ms per request keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        version = prediction_service.REGISTRY.stats().get("current") or "default"
+        self._send_json(200, {"model_version": version, **self.batcher.stats()})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body harus berupa objek JSON")
+            records = body["records"] if "records" in body else [body["record"]]
+            if not isinstance(records, list) or not all(
+                isinstance(r, dict) for r in records
+            ):
+                raise ValueError("`records` harus berupa list objek")
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Body tidak valid: {e}"})
+            return
+        if not records:
+            self._send_json(200, {"probabilities": [], "errors": []})
+            return
+        try:
+            result = self.batcher.submit(records).result(self.request_timeout_s)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, result)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    max_batch_rows: int = 4096,
+    max_wait_ms: float = 2.0,
+) -> ThreadingHTTPServer:
+    """Membuat server (belum berjalan); panggil `.serve_forever()`."""
+    _current_model()  # muat model di awal, bukan saat request pertama
+    PredictionHandler.batcher = MicroBatcher(score_records, max_batch_rows, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), PredictionHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Server prediksi stunting (micro-batch)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-rows", type=int, default=4096)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    server = serve(args.host, args.port, args.max_batch_rows, args.max_wait_ms)
+    print(f"Server prediksi di http://{args.host}:{args.port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,241 @@
+import io
 import pandas as pd
+import numpy as np
 import joblib
 import streamlit as st
 import os
+from typing import Iterator, Tuple
+
+from src import compiled_scorer, config, model_registry, utils
 
 PIPELINE_PATH = "models/stunting_pipeline.joblib"
+# Hasil `python -m src.compiled_scorer`; dipakai bila ada (tanpa impor sklearn)
+SCORER_DIR = "models/stunting_scorer"
+# Registry berversi bersama dalam satu proses (lazy load + hot swap)
+REGISTRY = model_registry.ModelRegistry()
+
+# --- Skema input (18 field, sama dengan form di pages/family_prediction.py) ---
+NUMERIC_FIELDS = {
+    "tinggi_badan_ibu_cm": (130, 200),
+    "lila_saat_hamil_cm": (15.0, 40.0),
+    "bmi_pra_hamil": (10.0, 40.0),
+    "hb_g_dl": (5.0, 20.0),
+    "kenaikan_bb_hamil_kg": (0, 30),
+    "usia_ibu_saat_hamil_tahun": (15, 50),
+    "jarak_kehamilan_sebelumnya_bulan": (0, 120),
+    "kunjungan_anc_x": (0, 20),
+    "jumlah_anak": (0, 15),
+}
+CATEGORICAL_FIELDS = {
+    "kepatuhan_ttd": ["Rutin", "Tidak Rutin"],
+    "pendidikan_ibu": ["SD", "SMP", "SMA", "Diploma", "S1", "S2/S3", "Tidak Sekolah"],
+    "jenis_pekerjaan_orang_tua": [
+        "Buruh",
+        "Lainnya",
+        "Nelayan",
+        "PNS/TNI/Polri",
+        "Petani/Buruh Tani",
+        "TKI/TKW",
+        "Wiraswasta",
+    ],
+    "status_pernikahan": ["Menikah", "Cerai"],
+    "kepesertaan_program_bantuan": ["Ya", "Tidak"],
+    "akses_air_bersih": ["Ya", "Tidak"],
+    "paparan_asap_rokok": ["Ya", "Tidak"],
+}
+BINARY_FIELDS = ["hipertensi_ibu", "diabetes_ibu"]
+INPUT_FIELDS = list(NUMERIC_FIELDS) + list(CATEGORICAL_FIELDS) + BINARY_FIELDS
+
+BATCH_CHUNK_SIZE = 50_000
+_BINARY_MAP = {"1": 1, "0": 0, "ya": 1, "tidak": 0, "true": 1, "false": 0}
+
+# --- Pemetaan field dokumen Elasticsearch -> fitur model ---
+ES_FEATURE_FIELDS = {
+    "tinggi_badan_ibu_cm": "Tinggi Badan Ibu (cm)",
+    "lila_saat_hamil_cm": "LiLA saat Hamil (cm)",
+    "bmi_pra_hamil": "BMI Pra-Hamil",
+    "hb_g_dl": "Hb (g/dL)",
+    "kenaikan_bb_hamil_kg": "Kenaikan BB Hamil (kg)",
+    "usia_ibu_saat_hamil_tahun": "Usia Ibu saat Hamil (tahun)",
+    "jarak_kehamilan_sebelumnya_bulan": "Jarak Kehamilan Sebelumnya (bulan)",
+    "kunjungan_anc_x": "Kunjungan ANC (x)",
+    "jumlah_anak": "Jumlah Anak",
+    "kepatuhan_ttd": "Kepatuhan TTD",
+    "pendidikan_ibu": "Pendidikan Ibu",
+    "jenis_pekerjaan_orang_tua": "Jenis Pekerjaan Orang Tua",
+    "status_pernikahan": "Status Pernikahan",
+    "kepesertaan_program_bantuan": "Kepesertaan Program Bantuan",
+    "akses_air_bersih": "Akses Air Bersih",
+    "paparan_asap_rokok": "Paparan Asap Rokok",
+    "hipertensi_ibu": "Hipertensi Ibu",
+    "diabetes_ibu": "Diabetes Ibu",
+}
+# Variasi nilai di index yang berbeda dari kosakata form
+_ES_VALUE_MAPS = {
+    "pendidikan_ibu": {"D3": "Diploma", "S1+": "S1", "S2": "S2/S3", "S3": "S2/S3"},
+    "kepatuhan_ttd": {"Ya": "Rutin", "Tidak": "Tidak Rutin"},
+}
+_YA_VALUES = {"ya", "layak", "ada", "bersih", "aman", "true", "1"}
+_YA_TIDAK_FIELDS = [
+    "kepesertaan_program_bantuan",
+    "akses_air_bersih",
+    "paparan_asap_rokok",
+]
+
+
+def es_source_to_features(source_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mengubah `_source` dokumen ES (nama kolom asli index) menjadi 18 kolom input
+    model. Kolom yang tidak ada diisi NaN sehingga baris tersebut gagal validasi.
+    """
+    out = pd.DataFrame(index=source_df.index)
+    for feature, es_field in ES_FEATURE_FIELDS.items():
+        out[feature] = source_df[es_field] if es_field in source_df else np.nan
+    for col, mapping in _ES_VALUE_MAPS.items():
+        out[col] = out[col].replace(mapping)
+    for col in _YA_TIDAK_FIELDS:
+        raw = out[col].astype("string").str.strip().str.lower()
+        out[col] = np.where(raw.isin(_YA_VALUES).fillna(False), "Ya", "Tidak")
+        out.loc[raw.isna().to_numpy(), col] = np.nan
+    return out
+
+
+def load_model(pipeline_path: str = PIPELINE_PATH, scorer_dir: str = SCORER_DIR):
+    """
+    Memuat model tanpa Streamlit: scorer terkompilasi bila tersedia,
+    jika tidak pipeline .joblib. Keduanya punya `predict_proba`.
+    """
+    if os.path.exists(os.path.join(scorer_dir, compiled_scorer.MANIFEST_FILE)):
+        return compiled_scorer.load(scorer_dir)
+    return joblib.load(pipeline_path)
 
 
 @st.cache_resource(show_spinner="Memuat pipeline prediksi...")
-def load_pipeline():
+def _load_default_pipeline():
     """
-    Memuat pipeline lengkap dari satu file .joblib.
+    Memuat scorer terkompilasi (models/stunting_scorer) atau pipeline lengkap .joblib.
     """
     try:
-        if not os.path.exists(PIPELINE_PATH):
+        if not os.path.exists(PIPELINE_PATH) and not os.path.isdir(SCORER_DIR):
             st.error(f"File pipeline tidak ditemukan. Pastikan '{PIPELINE_PATH}' ada.")
             return None
 
-        pipeline = joblib.load(PIPELINE_PATH)
+        pipeline = load_model()
         return pipeline
     except Exception as e:
         st.error(f"Gagal memuat pipeline: {e}")
         return None
 
 
+class RemotePredictor:
+    """
+    Klien server prediksi (src/prediction_server.py) dengan antarmuka yang sama
+    seperti pipeline lokal, sehingga halaman tidak perlu tahu lokasi model.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _score(self, records: list) -> np.ndarray:
+        response = utils.request_json(
+            self.url, {"records": records}, timeout=self.timeout
+        )
+        if response.get("errors"):
+            first = response["errors"][0]
+            raise ValueError(
+                f"Input tidak valid pada baris {first['baris']}: "
+                f"{first['field']} = {first['nilai']}"
+            )
+        return np.asarray(response["probabilities"], dtype=np.float64)
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        p1 = self._score(X[INPUT_FIELDS].to_dict("records"))
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict_one(self, record: dict) -> float:
+        return float(self._score([record])[0])
+
+
+def load_pipeline():
+    """
+    Bila `config.DEFAULT_PREDICT_API` diisi, prediksi dikirim ke server prediksi bersama.
+    Jika tidak, memakai model versi aktif dari registry (models/registry/CURRENT);
+    versi baru langsung terpakai tanpa restart. Bila registry kosong, memakai
+    file model bawaan.
+    """
+    if config.DEFAULT_PREDICT_API:
+        return RemotePredictor(config.DEFAULT_PREDICT_API)
+    try:
+        return REGISTRY.get()
+    except LookupError:
+        return _load_default_pipeline()
+    except Exception as e:
+        st.error(f"Gagal memuat model dari registry: {e}")
+        return None
+
+
+# --- Analisis sensitivitas (what-if) untuk hasil form ---
+# Faktor yang bisa diintervensi petugas: numerik -> (min, maks, langkah) dalam
+# rentang realistis; kategorik (None) -> semua nilai di CATEGORICAL_FIELDS.
+SENSITIVITY_FACTORS = {
+    "hb_g_dl": (8.0, 14.0, 0.5),
+    "kunjungan_anc_x": (0, 10, 1),
+    "kenaikan_bb_hamil_kg": (4, 20, 2),
+    "lila_saat_hamil_cm": (20.0, 30.0, 1.0),
+    "bmi_pra_hamil": (16.0, 30.0, 1.0),
+    "jarak_kehamilan_sebelumnya_bulan": (6, 60, 6),
+    "kepatuhan_ttd": None,
+    "kepesertaan_program_bantuan": None,
+    "akses_air_bersih": None,
+    "paparan_asap_rokok": None,
+}
+
+
+def sensitivity_grid(input_data: dict) -> pd.DataFrame:
+    """
+    Salinan input dengan satu faktor diubah per baris (faktor lain tetap).
+    Kolom tambahan: `faktor` dan `nilai` (nilai alternatif faktor tersebut).
+    """
+    base = pd.DataFrame([input_data])[INPUT_FIELDS]
+    frames = []
+    for field, spec in SENSITIVITY_FACTORS.items():
+        if spec is None:
+            values = pd.Series(CATEGORICAL_FIELDS[field], dtype=object)
+        else:
+            lo, hi, step = spec
+            values = pd.Series(np.round(np.arange(lo, hi + step / 2, step), 2))
+        grid = base.loc[base.index.repeat(len(values))].reset_index(drop=True)
+        grid[field] = values.to_numpy()
+        grid["faktor"] = field
+        grid["nilai"] = values.astype(object).to_numpy()
+        frames.append(grid)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_sensitivity(pipeline: object, input_data: dict) -> pd.DataFrame:
+    """
+    Skor seluruh grid what-if dengan satu panggilan `predict_proba`.
+    Mengembalikan faktor, label, nilai, probabilitas (%) dan selisih (poin persen)
+    terhadap prediksi input asli.
+    """
+    grid = sensitivity_grid(input_data)
+    base = pd.DataFrame([input_data])[INPUT_FIELDS]
+    proba = pipeline.predict_proba(pd.concat([base, grid[INPUT_FIELDS]]))[:, 1] * 100
+    return pd.DataFrame(
+        {
+            "faktor": grid["faktor"],
+            "label": grid["faktor"].map(ES_FEATURE_FIELDS),
+            "nilai": grid["nilai"],
+            "saat_ini": [
+                input_data.get(f) == v for f, v in zip(grid["faktor"], grid["nilai"])
+            ],
+            "probabilitas": proba[1:],
+            "selisih": proba[1:] - proba[0],
+        }
+    )
+
+
 def run_prediction(pipeline: object, input_data: dict) -> dict:
     """
     Menjalankan prediksi menggunakan pipeline yang sudah dimuat.
@@ -32,11 +245,15 @@ def run_prediction(pipeline: object, input_data: dict) -> dict:
         return {"error": "Pipeline tidak berhasil dimuat."}
 
     try:
-        # Konversi dictionary input menjadi DataFrame dengan satu baris
-        input_df = pd.DataFrame([input_data])
+        if hasattr(pipeline, "predict_one"):
+            # Scorer terkompilasi: langsung dari dict, tanpa DataFrame
+            prediction_proba_raw = pipeline.predict_one(input_data)
+        else:
+            # Konversi dictionary input menjadi DataFrame dengan satu baris
+            input_df = pd.DataFrame([input_data])
 
-        # Pipeline akan menangani semua preprocessing (scaling, encoding) secara otomatis
-        prediction_proba_raw = pipeline.predict_proba(input_df)[0][1]
+            # Pipeline akan menangani semua preprocessing (scaling, encoding) secara otomatis
+            prediction_proba_raw = pipeline.predict_proba(input_df)[0][1]
         prediction_result = (
             "Risiko Stunting" if prediction_proba_raw > 0.5 else "Risiko Rendah"
         )
@@ -48,3 +265,94 @@ def run_prediction(pipeline: object, input_data: dict) -> dict:
         }
     except Exception as e:
         return {"probability": 0, "result": "Gagal Prediksi", "error": str(e)}
+
+
+# --- Prediksi Batch (kohort hasil upload) ---
+def read_batch_file(uploaded_file) -> pd.DataFrame:
+    """Membaca file CSV/Parquet hasil upload menjadi DataFrame."""
+    name = getattr(uploaded_file, "name", str(uploaded_file)).lower()
+    if name.endswith((".parquet", ".pq")):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
+def validate_batch(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Validasi vektor seluruh kolom input sekaligus.
+    Mengembalikan (baris valid yang sudah dinormalisasi, daftar error per baris/field).
+    Kolom wajib yang tidak ada memicu ValueError.
+    """
+    missing = [c for c in INPUT_FIELDS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}")
+
+    # Kolom dikumpulkan dulu lalu dibuat sekali: overhead tetap per panggilan
+    # penting untuk micro-batch kecil di src/prediction_server.py
+    clean_cols = {}
+    invalid_masks = {}
+
+    for col, (lo, hi) in NUMERIC_FIELDS.items():
+        values = pd.to_numeric(df[col], errors="coerce")
+        clean_cols[col] = values
+        invalid_masks[col] = ~values.between(lo, hi)
+
+    for col, allowed in CATEGORICAL_FIELDS.items():
+        values = df[col].astype("string").str.strip()
+        clean_cols[col] = values
+        invalid_masks[col] = ~values.isin(allowed).fillna(False)
+
+    for col in BINARY_FIELDS:
+        # 0/1 numerik dulu: kolom CSV 0/1 dengan sel kosong terbaca float (1.0)
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        labels = df[col].astype("string").str.strip().str.lower().map(_BINARY_MAP)
+        values = numeric.where(numeric.isin([0, 1])).fillna(labels)
+        clean_cols[col] = values
+        invalid_masks[col] = values.isna()
+
+    errors = [
+        pd.DataFrame(
+            {"baris": df.index[mask], "field": col, "nilai": df.loc[mask, col]}
+        )
+        for col, mask in invalid_masks.items()
+        if mask.any()
+    ]
+    errors_df = (
+        pd.concat(errors, ignore_index=True)
+        if errors
+        else pd.DataFrame(columns=["baris", "field", "nilai"])
+    )
+
+    any_invalid = np.logical_or.reduce([m.to_numpy() for m in invalid_masks.values()])
+    clean = pd.DataFrame(clean_cols, index=df.index)
+    valid = clean.loc[~any_invalid]
+    valid = valid.astype(
+        {
+            **{c: "int64" for c in BINARY_FIELDS},
+            **{c: object for c in CATEGORICAL_FIELDS},
+        }
+    )
+    return valid, errors_df
+
+
+def predict_batch(
+    pipeline: object, df: pd.DataFrame, chunk_size: int = BATCH_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Skoring per potongan (chunk) dengan satu panggilan `predict_proba` per chunk.
+    Menghasilkan DataFrame input + kolom probabilitas & kategori untuk tiap chunk.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start : start + chunk_size]
+        proba = pipeline.predict_proba(chunk[INPUT_FIELDS])[:, 1]
+        yield chunk.assign(
+            probabilitas_stunting=np.round(proba * 100, 2),
+            kategori=np.where(proba > 0.5, "Risiko Stunting", "Risiko Rendah"),
+        )
+
+
+def batch_results_to_csv(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    """Serialisasi hasil batch ke CSV secara bertahap (header hanya sekali)."""
+    for i, chunk in enumerate(chunks):
+        buf = io.StringIO()
+        chunk.to_csv(buf, index=True, index_label="baris", header=(i == 0))
+        yield buf.getvalue().encode("utf-8")
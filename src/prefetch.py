@@ -0,0 +1,246 @@
+# StuntLytics/src/prefetch.py
+# Prefetch spekulatif drill-down. Setelah kabupaten dipilih di sidebar, petugas
+# hampir selalu membuka salah satu kecamatannya berikutnya. Tampilan kecamatan
+# anak yang paling mungkin dibuka (paling sering dipilih sebelumnya, lalu
+# jumlah dokumen terbanyak) dihitung oleh satu thread latar ke cache bersama
+# (src/query_cache.py), sehingga klik berikutnya langsung hit cache.
+#
+# - Prioritas rendah: job hanya jalan bila tidak ada query pengguna selama
+#   PREFETCH_IDLE_S. Batch terbaru dikerjakan lebih dulu, dan job yang basi
+#   atau sudah ada di cache dilewati.
+# - Mundur eksponensial (hingga PREFETCH_MAX_BACKOFF_S) bila ES menolak
+#   (429/5xx/timeout) atau job prefetch lebih lambat dari PREFETCH_SLOW_S.
+# - `stats()` melaporkan hit rate, yaitu bagian hasil prefetch yang benar-benar
+#   dipakai pengguna, untuk menyetel jumlah anak yang di-prefetch.
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src import config, elastic_client as es
+from src.query_cache import SHARED_CACHE, QueryCache, cache_key
+
+# (fungsi ber-@cached, args, kwargs): dipanggil persis seperti halaman memanggilnya
+Job = Tuple[Callable, Tuple, Dict[str, Any]]
+# Filter satu tampilan -> job yang dibutuhkan halaman untuk merendernya
+View = Callable[[Dict[str, Any]], List[Job]]
+
+MAX_QUEUE = 64
+MAX_AGE_S = 60.0  # pilihan pengguna sudah berpindah; job lebih tua dibuang
+TRACKED_KEYS = 1024  # hasil prefetch yang ditunggu pemakaiannya
+
+
+def job(fn: Callable, *args, **kwargs) -> Job:
+    return (fn, args, kwargs)
+
+
+class Prefetcher:
+    """Antrean prefetch berprioritas dengan satu thread pekerja (dimulai saat perlu)."""
+
+    def __init__(
+        self,
+        cache: QueryCache = SHARED_CACHE,
+        idle_s: float = config.PREFETCH_IDLE_S,
+        slow_s: float = config.PREFETCH_SLOW_S,
+        max_backoff_s: float = config.PREFETCH_MAX_BACKOFF_S,
+        max_queue: int = MAX_QUEUE,
+        max_age_s: float = MAX_AGE_S,
+    ):
+        self.cache = cache
+        self.idle_s = idle_s
+        self.slow_s = slow_s
+        self.max_backoff_s = max_backoff_s
+        self.max_queue = max_queue
+        self.max_age_s = max_age_s
+        self.backoff_s = 0.0
+        self.counters: Counter = Counter()
+        self._queue: List[Tuple] = []  # heap (-batch, rank, waktu antre, key, job)
+        self._pending = set()  # key di antrean atau sedang dihitung
+        self._prefetched: "OrderedDict[str, float]" = OrderedDict()
+        self._choices: Counter = Counter()  # (kabupaten, kecamatan) -> kali dipilih
+        self._batches = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._error_seen = es.load_snapshot()["last_error_s"]
+        cache.add_listener(self._on_lookup)
+
+    # --- Antrean ---
+    def submit(self, jobs: Sequence[Job]) -> int:
+        """Antrekan satu batch (urut peluang); hasil: jumlah job yang ditambahkan."""
+        if not config.PREFETCH_ENABLED:
+            return 0
+        batch = -next(self._batches)
+        now = time.monotonic()
+        added = 0
+        with self._cond:
+            for rank, (fn, args, kwargs) in enumerate(jobs):
+                key = cache_key(fn.cache_namespace, args, kwargs)
+                if key in self._pending or self.cache.contains(key):
+                    continue
+                if len(self._queue) >= self.max_queue:
+                    # Penuh: buang job batch tertua/peluang terkecil
+                    worst = max(self._queue)
+                    self._queue.remove(worst)
+                    heapq.heapify(self._queue)
+                    self._pending.discard(worst[3])
+                    self.counters["dropped"] += 1
+                heapq.heappush(self._queue, (batch, rank, now, key, (fn, args, kwargs)))
+                self._pending.add(key)
+                added += 1
+            self.counters["submitted"] += added
+            if added:
+                self._ensure_worker()
+                self._cond.notify()
+        return added
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._loop, name="prefetch", daemon=True
+            )
+            self._thread.start()
+
+    def _pop(self) -> Optional[Tuple[str, Job]]:
+        with self._cond:
+            while self._queue:
+                _, _, queued_at, key, item = heapq.heappop(self._queue)
+                if time.monotonic() - queued_at > self.max_age_s:
+                    self.counters["stale"] += 1
+                elif self.cache.contains(key):
+                    self.counters["skipped"] += 1  # sudah dihitung halaman
+                else:
+                    return key, item
+                self._pending.discard(key)
+        return None
+
+    # --- Pekerja ---
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+            self._wait_for_idle()
+            popped = self._pop()
+            if popped is None:
+                continue
+            key, (fn, args, kwargs) = popped
+            start = time.monotonic()
+            try:
+                with es.background():
+                    fn(*args, **kwargs)
+            except Exception:
+                self.counters["failed"] += 1
+            else:
+                self.counters["completed"] += 1
+                with self._cond:
+                    self._prefetched[key] = time.monotonic()
+                    while len(self._prefetched) > TRACKED_KEYS:
+                        self._prefetched.popitem(last=False)
+            finally:
+                with self._cond:
+                    self._pending.discard(key)
+            load = es.load_snapshot()
+            slow = time.monotonic() - start > self.slow_s
+            self._error_seen = max(self._error_seen, load["last_error_s"])
+            self._backoff(slow or load["last_error_s"] >= start)
+
+    def _wait_for_idle(self) -> None:
+        """Tunggu hingga tidak ada query pengguna berjalan selama `idle_s`."""
+        while True:
+            load = es.load_snapshot()
+            if load["last_error_s"] > self._error_seen:
+                # ES menolak query (siapa pun): mundur sebelum menambah beban
+                self._error_seen = load["last_error_s"]
+                self._backoff(True)
+                continue
+            quiet = time.monotonic() - load["last_foreground_s"]
+            if not load["inflight"] and quiet >= self.idle_s:
+                return
+            time.sleep(max(self.idle_s - quiet, 0.05) if not load["inflight"] else 0.1)
+
+    def _backoff(self, overloaded: bool) -> None:
+        if not overloaded:
+            self.backoff_s = 0.0
+            return
+        self.backoff_s = min(self.max_backoff_s, max(1.0, self.backoff_s * 2))
+        self.counters["backoffs"] += 1
+        time.sleep(self.backoff_s)
+
+    # --- Statistik ---
+    def _on_lookup(self, key: str, hit: bool) -> None:
+        if threading.current_thread() is self._thread:
+            return
+        with self._cond:
+            if key in self._prefetched:
+                del self._prefetched[key]
+                self.counters["used" if hit else "expired"] += 1
+            elif not hit and key in self._pending:
+                self.counters["late"] += 1  # diminta sebelum prefetch selesai
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = {
+                name: self.counters[name]
+                for name in (
+                    "submitted",
+                    "completed",
+                    "used",
+                    "expired",
+                    "late",
+                    "failed",
+                    "stale",
+                    "skipped",
+                    "dropped",
+                    "backoffs",
+                )
+            }
+            out["queued"] = len(self._queue)
+        out["backoff_s"] = self.backoff_s
+        out["hit_rate"] = out["used"] / out["completed"] if out["completed"] else 0.0
+        return out
+
+    # --- Peluang drill-down ---
+    def record_choice(self, kabupaten: Sequence[str], kecamatan: Sequence[str]) -> None:
+        with self._cond:
+            for kab in kabupaten:
+                for kec in kecamatan:
+                    self._choices[(kab, kec)] += 1
+
+    def rank_children(
+        self, kabupaten: Sequence[str], child_counts: Dict[str, int]
+    ) -> List[str]:
+        """Kecamatan anak urut peluang: sering dipilih, lalu jumlah dokumen."""
+        with self._cond:
+            chosen = {
+                child: sum(self._choices[(kab, child)] for kab in kabupaten)
+                for child in child_counts
+            }
+        return sorted(child_counts, key=lambda c: (-chosen[c], -child_counts[c], c))
+
+
+PREFETCHER = Prefetcher()
+
+
+def drilldown(
+    children: List[Dict[str, Any]],
+    view: View,
+    prefetcher: Prefetcher = PREFETCHER,
+) -> int:
+    """
+    Antrekan job `view` untuk filter tampilan anak (urut peluang). Prefetch
+    hanya upaya terbaik: galat saat menyusun job tidak mengganggu halaman.
+    """
+    jobs: List[Job] = []
+    try:
+        for child in children:
+            jobs.extend(view(child))
+    except Exception:
+        return 0
+    return prefetcher.submit(jobs)
+
+
+def summary_view(filters: Dict[str, Any]) -> List[Job]:
+    """Halaman utama (app.py): ringkasan KPI & grafik."""
+    return [job(es.get_cached_main_page_summary, filters, es.get_accuracy())]
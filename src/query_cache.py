@@ -0,0 +1,132 @@
+# StuntLytics/src/query_cache.py
+# Cache hasil query bersama (per proses) dengan kunci fingerprint filter.
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _canonical(obj: Any, unordered: bool = False) -> Any:
+    """
+    Bentuk kanonik filter: tanggal -> ISO. Urutan pilihan multiselect (list di
+    dalam dict filter) diabaikan; urutan argumen posisional tetap dihormati.
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v, unordered=True) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        items = [_canonical(v) for v in obj]
+        scalars = all(
+            isinstance(v, (str, int, float, bool)) or v is None for v in items
+        )
+        if (unordered or isinstance(obj, set)) and scalars:
+            return sorted(items, key=lambda v: (v is None, str(v)))
+        return items
+    return obj
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash pendek dan stabil untuk kombinasi filter/argumen apa pun."""
+    raw = json.dumps(
+        _canonical(list(parts)), sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(namespace: str, args: Tuple = (), kwargs: Optional[Dict] = None) -> str:
+    """Kunci entri fungsi `cached(namespace)` untuk argumen tersebut."""
+    return f"{namespace}:{fingerprint(tuple(args), kwargs or {})}"
+
+
+class QueryCache:
+    """LRU + TTL sederhana dan thread-safe. Nilai yang dikembalikan jangan dimutasi."""
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, bool], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def add_listener(self, listener: Callable[[str, bool], None]) -> None:
+        """`listener(key, hit)` dipanggil setiap `get` (mis. statistik prefetch)."""
+        self._listeners.append(listener)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            hit = entry is not None and entry[0] >= time.monotonic()
+            if hit:
+                self._data.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+        for listener in self._listeners:
+            listener(key, hit)
+        return (True, entry[1]) if hit else (False, None)
+
+    def contains(self, key: str) -> bool:
+        """Entri masih berlaku; tidak dihitung sebagai hit/miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def put(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], Any], ttl_s: Optional[float] = None
+    ) -> Any:
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.put(key, value, ttl_s)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+SHARED_CACHE = QueryCache()
+
+
+def cached(
+    namespace: str, ttl_s: Optional[float] = None, cache: QueryCache = SHARED_CACHE
+):
+    """Dekorator: hasil fungsi di-cache per fingerprint (namespace, args, kwargs)."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = cache_key(namespace, args, kwargs)
+            return cache.get_or_compute(key, lambda: fn(*args, **kwargs), ttl_s)
+
+        wrapper.cache_namespace = namespace
+        return wrapper
+
+    return decorator
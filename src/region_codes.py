@@ -0,0 +1,399 @@
+# StuntLytics/src/region_codes.py
+# Kamus wilayah kanonik: setiap ejaan nama kabupaten/kecamatan/desa (properti
+# GeoJSON, nama BPS, isian index ES) -> kode bilangan bulat yang stabil.
+# Kode berjenjang:
+#   kabupaten  k                     (1..999)
+#   kecamatan  kode_kab * 1000 + i
+#   desa       kode_kec * 1000 + j
+# sehingga kode induk cukup `kode // 1000`. Kamus disimpan di
+# geojson/region_codes.json dan hanya bertambah: kode lama tidak pernah berubah,
+# nama baru mendapat nomor berikutnya di bawah induknya. Normalisasi string
+# dilakukan sekali per ejaan unik; join, filter, dan group-by memakai kode.
+#
+# Pemakaian:
+#   python -m src.region_codes build geojson/jawa-barat.geojson --bps bps.csv
+#   python -m src.region_codes ingest --chunk-size 5000   # tulis kode_* ke ES
+import argparse
+import functools
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, "geojson", "region_codes.json")
+FORMAT_VERSION = 1
+
+# Prefix administratif per level (yang pertama cocok dibuang). "KOTA" sengaja
+# TIDAK dibuang: Kota Bogor dan Kabupaten Bogor adalah wilayah berbeda. Prefix
+# wajib diikuti spasi/titik agar nama seperti "KECAPI" atau "DESAKOLOT" utuh.
+_PREFIX_PATTERNS = {
+    "kabupaten": r"^(?:KABUPATEN\s|KAB\.\s*|KAB\s)",
+    "kecamatan": r"^(?:KECAMATAN\s|KEC\.\s*|KEC\s)",
+    "desa": r"^(?:DESA\s|KELURAHAN\s|KEL\.\s*|KEL\s)",
+}
+
+KAB_PROPERTY = "KABKOT"
+KEC_PROPERTY = "KECAMATAN"
+DESA_PROPERTY = "DESA"
+# Kolom nama wilayah pada data BPS (jumlah balita per kecamatan, dst.)
+BPS_COLUMNS = (
+    "bps_nama_kabupaten_kota",
+    "bps_nama_kecamatan",
+    "bps_nama_desa_kelurahan",
+)
+
+LEVELS = ("kabupaten", "kecamatan", "desa")
+CODE_FIELDS = {"kabupaten": "kode_kab", "kecamatan": "kode_kec", "desa": "kode_desa"}
+CHILD_SPAN = 1000
+UNKNOWN = -1
+
+
+def normalize_names(values, level: str = "kabupaten") -> pd.Series:
+    """'Kab. Bogor ' -> 'BOGOR', 'Kota  Bogor' -> 'KOTA BOGOR'; kosong -> ''."""
+    s = pd.Series(values, dtype="object").fillna("").astype(str)
+    s = s.str.upper().str.replace(r"\s+", " ", regex=True).str.strip()
+    return s.str.replace(_PREFIX_PATTERNS[level], "", n=1, regex=True).str.strip()
+
+
+def normalize_name(value: Optional[str], level: str = "kabupaten") -> str:
+    return normalize_names([value], level).iloc[0]
+
+
+def parent_codes(codes) -> np.ndarray:
+    """Kode kecamatan -> kode kabupaten, kode desa -> kode kecamatan."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return np.where(codes >= 0, codes // CHILD_SPAN, UNKNOWN)
+
+
+def _as_series(values) -> pd.Series:
+    if isinstance(values, pd.Series):
+        return values.reset_index(drop=True)
+    return pd.Series(np.asarray(values, dtype=object))
+
+
+class RegionDictionary:
+    """
+    Per level: kode -> (kode induk, nama ternormalisasi); kabupaten berinduk 0.
+    `aliases[level]` memetakan ejaan (sesudah normalisasi) ke nama kanonik,
+    untuk varian yang tidak tertangani normalisasi prefix.
+    """
+
+    def __init__(
+        self,
+        entries: Optional[Dict[str, Dict[int, Tuple[int, str]]]] = None,
+        aliases: Optional[Dict[str, Dict[str, str]]] = None,
+    ):
+        self.entries = {lv: dict((entries or {}).get(lv, {})) for lv in LEVELS}
+        self.aliases = {lv: dict((aliases or {}).get(lv, {})) for lv in LEVELS}
+        self._lookup = {
+            lv: {key: code for code, key in self.entries[lv].items()} for lv in LEVELS
+        }
+        self._last: Dict[Tuple[str, int], int] = {}
+        for lv in LEVELS:
+            for code, (parent, _) in self.entries[lv].items():
+                slot = (lv, parent)
+                self._last[slot] = max(self._last.get(slot, 0), self._index(lv, code))
+
+    def __len__(self) -> int:
+        return sum(len(e) for e in self.entries.values())
+
+    @staticmethod
+    def _index(level: str, code: int) -> int:
+        return code if level == "kabupaten" else code % CHILD_SPAN
+
+    def _canonical(self, level: str, names) -> pd.Series:
+        norm = normalize_names(names, level)
+        aliases = self.aliases[level]
+        return norm.map(lambda n: aliases.get(n, n)) if aliases else norm
+
+    def _add(self, level: str, parent: int, name: str) -> int:
+        index = self._last.get((level, parent), 0) + 1
+        if index >= CHILD_SPAN:
+            raise ValueError(f"Kode {level} di bawah {parent} sudah penuh.")
+        code = index if level == "kabupaten" else parent * CHILD_SPAN + index
+        self._last[(level, parent)] = index
+        self.entries[level][code] = (parent, name)
+        self._lookup[level][(parent, name)] = code
+        return code
+
+    def _encode(self, level: str, parents: np.ndarray, names) -> np.ndarray:
+        """(kode induk, nama mentah) per baris -> kode; tak dikenal -> UNKNOWN."""
+        name_idx, uniques = pd.factorize(_as_series(names))
+        canonical = self._canonical(level, np.asarray(uniques, dtype=object)).tolist()
+        # Pasangan (induk, nama) unik saja yang dicari di kamus
+        span = len(canonical) + 1
+        pairs = np.asarray(parents, dtype=np.int64) * span + (name_idx + 1)
+        pair_idx, unique_pairs = pd.factorize(pairs)
+        lookup = self._lookup[level]
+        codes = np.full(len(unique_pairs), UNKNOWN, dtype=np.int64)
+        for i, pair in enumerate(unique_pairs.tolist()):
+            parent, name = divmod(pair, span)
+            if parent >= 0 and name > 0:
+                codes[i] = lookup.get((parent, canonical[name - 1]), UNKNOWN)
+        return codes[pair_idx] if len(codes) else np.full(len(pairs), UNKNOWN)
+
+    def encode_kabupaten(self, kabupaten) -> np.ndarray:
+        return self._encode("kabupaten", np.zeros(len(kabupaten), np.int64), kabupaten)
+
+    def encode_kecamatan(self, kabupaten, kecamatan) -> np.ndarray:
+        return self._encode("kecamatan", self.encode_kabupaten(kabupaten), kecamatan)
+
+    def encode_desa(self, kabupaten, kecamatan, desa) -> np.ndarray:
+        return self._encode("desa", self.encode_kecamatan(kabupaten, kecamatan), desa)
+
+    def encode(self, kabupaten, kecamatan=None, desa=None) -> Dict[str, np.ndarray]:
+        """Kode semua level yang diberikan, mis. {"kabupaten": ..., "kecamatan": ...}."""
+        out = {"kabupaten": self.encode_kabupaten(kabupaten)}
+        if kecamatan is not None:
+            out["kecamatan"] = self._encode("kecamatan", out["kabupaten"], kecamatan)
+        if kecamatan is not None and desa is not None:
+            out["desa"] = self._encode("desa", out["kecamatan"], desa)
+        return out
+
+    def names(self, level: str, codes) -> np.ndarray:
+        """Kode -> nama kanonik (None untuk kode tak dikenal)."""
+        uniq, inverse = np.unique(
+            np.asarray(codes, dtype=np.int64), return_inverse=True
+        )
+        table = self.entries[level]
+        labels = np.array(
+            [table.get(int(c), (None, None))[1] for c in uniq], dtype=object
+        )
+        return labels[inverse.reshape(-1)]
+
+    def extend(self, kabupaten, kecamatan=None, desa=None) -> int:
+        """Beri kode pada nama yang belum dikenal; hasil: jumlah kode baru."""
+        columns = {"kabupaten": _as_series(kabupaten)}
+        if kecamatan is not None:
+            columns["kecamatan"] = _as_series(kecamatan)
+            if desa is not None:
+                columns["desa"] = _as_series(desa)
+        rows = pd.DataFrame(columns).drop_duplicates()
+        parents = np.zeros(len(rows), dtype=np.int64)
+        added = 0
+        for level, raw in rows.items():
+            codes = []
+            for parent, name in zip(parents.tolist(), self._canonical(level, raw)):
+                code = UNKNOWN
+                if parent != UNKNOWN and name:
+                    code = self._lookup[level].get((parent, name), UNKNOWN)
+                    if code == UNKNOWN:
+                        code = self._add(level, parent, name)
+                        added += 1
+                codes.append(code)
+            parents = np.asarray(codes, dtype=np.int64)
+        return added
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": FORMAT_VERSION,
+            "levels": {
+                lv: [[code, parent, name] for code, (parent, name) in sorted(e.items())]
+                for lv, e in self.entries.items()
+            },
+            "aliases": self.aliases,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RegionDictionary":
+        if data.get("format") != FORMAT_VERSION:
+            raise ValueError(
+                f"Format kamus wilayah tidak didukung: {data.get('format')}"
+            )
+        entries = {
+            lv: {int(code): (int(parent), name) for code, parent, name in rows}
+            for lv, rows in data.get("levels", {}).items()
+        }
+        return cls(entries, data.get("aliases"))
+
+    @classmethod
+    def from_names(cls, kabupaten, kecamatan=None, desa=None) -> "RegionDictionary":
+        dictionary = cls()
+        dictionary.extend(kabupaten, kecamatan, desa)
+        return dictionary
+
+
+def filter_codes(
+    dictionary: RegionDictionary,
+    wilayah: Sequence[str],
+    kecamatan: Optional[Sequence[str]] = None,
+) -> Dict[str, List[int]]:
+    """
+    Pilihan sidebar (nama) -> {field kode: [kode, ...]} untuk filter ES. Level
+    yang salah satu namanya tidak dikenal kamus tidak diikutkan (tetap difilter
+    per nama).
+    """
+    out: Dict[str, List[int]] = {}
+    kab = dictionary.encode_kabupaten(list(wilayah or []))
+    if len(kab) and (kab >= 0).all():
+        out[CODE_FIELDS["kabupaten"]] = sorted(set(kab.tolist()))
+    if kecamatan and len(kab) and (kab >= 0).all():
+        # Nama kecamatan bisa sama di beberapa kabupaten: ambil semua pasangan
+        parents = np.repeat(kab, len(kecamatan))
+        names = np.tile(np.asarray(kecamatan, dtype=object), len(kab))
+        kec = dictionary._encode("kecamatan", parents, names).reshape(len(kab), -1)
+        if (kec >= 0).any(axis=0).all():
+            out[CODE_FIELDS["kecamatan"]] = sorted(set(kec[kec >= 0].tolist()))
+    return out
+
+
+# ==============================================================================
+# PERSISTENSI
+# ==============================================================================
+def save(dictionary: RegionDictionary, path: str = DEFAULT_PATH) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dictionary.to_dict(), f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def load(path: str = DEFAULT_PATH) -> RegionDictionary:
+    with open(path, "r", encoding="utf-8") as f:
+        return RegionDictionary.from_dict(json.load(f))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cached(path: str, mtime: float) -> RegionDictionary:
+    return load(path)
+
+
+def load_default(path: str = DEFAULT_PATH) -> Optional[RegionDictionary]:
+    """Kamus tersimpan (dibaca ulang bila file berubah), atau None."""
+    try:
+        return _load_cached(path, os.path.getmtime(path))
+    except FileNotFoundError:
+        return None
+
+
+def extend_from_geojson(dictionary: RegionDictionary, geojson_path: str) -> int:
+    """Tambahkan nama wilayah fitur GeoJSON (dibaca lewat geostore)."""
+    from src import geometry_store
+
+    store = geometry_store.load_or_build(geojson_path)
+    names = store.property_names
+    return dictionary.extend(
+        store.column(KAB_PROPERTY),
+        store.column(KEC_PROPERTY),
+        store.column(DESA_PROPERTY) if DESA_PROPERTY in names else None,
+    )
+
+
+def extend_from_bps(dictionary: RegionDictionary, frame: pd.DataFrame) -> int:
+    """Tambahkan nama BPS (kolom BPS_COLUMNS yang ada di `frame`)."""
+    kab, kec, desa = (frame[c] if c in frame else None for c in BPS_COLUMNS)
+    if kab is None:
+        return 0
+    return dictionary.extend(kab, kec, desa)
+
+
+def load_or_build(
+    geojson_paths: Sequence[str], path: str = DEFAULT_PATH
+) -> RegionDictionary:
+    """
+    Kamus tersimpan, dilengkapi nama dari GeoJSON yang tersedia. Disimpan ulang
+    bila ada kode baru; bila direktori read-only, hasil di memori dipakai.
+    """
+    from src import geometry_store
+
+    dictionary = load(path) if os.path.exists(path) else RegionDictionary()
+    added = sum(
+        extend_from_geojson(dictionary, p)
+        for p in geojson_paths
+        if geometry_store.is_available(str(p))
+    )
+    if added or not os.path.exists(path):
+        try:
+            save(dictionary, path)
+        except OSError:
+            pass
+    return dictionary
+
+
+# ==============================================================================
+# INGEST: tulis kode_* ke dokumen index stunting
+# ==============================================================================
+def ingest(
+    dictionary: RegionDictionary,
+    chunk_size: int = 5000,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Scroll index stunting, beri kode tiap dokumen dari nama wilayahnya, dan
+    tulis `kode_kab`/`kode_kec`/`kode_desa` via partial `_bulk` update. Nama
+    yang tidak dikenal kamus dilewati dan dilaporkan (tambahkan sebagai alias).
+    """
+    from src import elastic_client as es
+
+    index = es.STUNTING_INDEX
+    desa_field = es.resolve_desa_field()
+    fields = ["nama_kabupaten_kota", "Kecamatan"] + ([desa_field] if desa_field else [])
+    stats: Dict[str, Any] = {"scanned": 0, "coded": 0, "unknown": 0, "errors": 0}
+    unknown: Counter = Counter()
+    started = time.perf_counter()
+    if not dry_run:
+        es.put_mapping(index, {f: {"type": "integer"} for f in CODE_FIELDS.values()})
+
+    for hits in es.scan_documents(index, source=fields, batch_size=chunk_size):
+        stats["scanned"] += len(hits)
+        source = pd.DataFrame([h.get("_source", {}) for h in hits], columns=fields)
+        codes = dictionary.encode(*(source[f] for f in fields))
+        kec = codes["kecamatan"]
+        missing = kec < 0
+        stats["unknown"] += int(missing.sum())
+        unknown.update(
+            zip(
+                source["nama_kabupaten_kota"][missing].tolist(),
+                source["Kecamatan"][missing].tolist(),
+            )
+        )
+        # Level yang dikenal tetap ditulis (mis. kabupaten benar, kecamatan salah eja)
+        updates = []
+        for i in np.flatnonzero(codes["kabupaten"] >= 0).tolist():
+            doc = {CODE_FIELDS[lv]: int(c[i]) for lv, c in codes.items() if c[i] >= 0}
+            updates.append((hits[i]["_id"], doc))
+        stats["coded"] += len(updates)
+        if not dry_run:
+            stats["errors"] += es.bulk_update(index, updates)["errors"]
+        print(f"\r{stats['scanned']:,} dokumen dipindai", end="", flush=True)
+
+    print()
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    stats["top_unknown"] = unknown.most_common(10)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kamus kode wilayah kanonik")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="bangun/lengkapi kamus dari GeoJSON & BPS")
+    build_cmd.add_argument("geojson", nargs="+")
+    build_cmd.add_argument("--bps", action="append", default=[], help="CSV nama BPS")
+    build_cmd.add_argument("--out", default=DEFAULT_PATH)
+    ingest_cmd = sub.add_parser("ingest", help="tulis kode_* ke index stunting")
+    ingest_cmd.add_argument("--dictionary", default=DEFAULT_PATH)
+    ingest_cmd.add_argument("--chunk-size", type=int, default=5000)
+    ingest_cmd.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        dictionary = load(args.out) if os.path.exists(args.out) else RegionDictionary()
+        added = sum(extend_from_geojson(dictionary, p) for p in args.geojson)
+        for csv in args.bps:
+            added += extend_from_bps(dictionary, pd.read_csv(csv, dtype=str))
+        save(dictionary, args.out)
+        counts = ", ".join(f"{len(e):,} {lv}" for lv, e in dictionary.entries.items())
+        print(f"{added:,} kode baru ({counts}) -> {args.out}")
+        return
+
+    stats = ingest(load(args.dictionary), args.chunk_size, args.dry_run)
+    for key, value in stats.items():
+        print(f"{key:>12}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# StuntLytics/src/region_hierarchy.py
+# Pohon kabupaten -> kecamatan dengan jumlah dokumen per hari, untuk filter
+# bertingkat di sidebar. Dimuat sekali dari satu agregasi composite
+# (elastic_client.get_region_hierarchy) dan di-cache selama isi index tidak
+# berubah. Opsi beserta jumlahnya untuk rentang tanggal atau pilihan kabupaten
+# apa pun dihitung lokal (NumPy), tanpa query ke ES per rerun.
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+MISSING_DAY = np.iinfo(np.int32).min  # dokumen tanpa tanggal
+_EPOCH = date(1970, 1, 1)
+
+
+def day_number(value: date) -> int:
+    """Tanggal -> hari sejak 1970-01-01 (kunci date_histogram / 86_400_000 ms)."""
+    return (value - _EPOCH).days
+
+
+class RegionHierarchy:
+    """
+    Baris = kombinasi (kabupaten, kecamatan, hari) dengan jumlah dokumennya.
+    Nama disimpan sekali; baris memakai indeks nama (-1 = tidak ada nilai).
+    """
+
+    def __init__(
+        self,
+        wilayah_field: Optional[str],
+        kecamatan_field: Optional[str],
+        kab_names: Sequence[str],
+        kec_names: Sequence[str],
+        kab: Sequence[int],
+        kec: Sequence[int],
+        day: Sequence[int],
+        count: Sequence[int],
+    ):
+        self.wilayah_field = wilayah_field
+        self.kecamatan_field = kecamatan_field
+        self.kab_names = np.asarray(kab_names, dtype=object)
+        self.kec_names = np.asarray(kec_names, dtype=object)
+        self.kab = np.asarray(kab, dtype=np.int32)
+        self.kec = np.asarray(kec, dtype=np.int32)
+        self.day = np.asarray(day, dtype=np.int32)
+        self.count = np.asarray(count, dtype=np.int64)
+
+    @classmethod
+    def empty(cls) -> "RegionHierarchy":
+        return cls(None, None, [], [], [], [], [], [])
+
+    @classmethod
+    def from_rows(
+        cls,
+        wilayah_field: Optional[str],
+        kecamatan_field: Optional[str],
+        kabupaten: Sequence[Optional[str]],
+        kecamatan: Sequence[Optional[str]],
+        day: Sequence[int],
+        count: Sequence[int],
+    ) -> "RegionHierarchy":
+        """Dari kolom bucket composite (nama None = missing bucket)."""
+        kab, kab_names = pd.factorize(pd.Series(kabupaten, dtype=object), sort=True)
+        kec, kec_names = pd.factorize(pd.Series(kecamatan, dtype=object), sort=True)
+        return cls(
+            wilayah_field,
+            kecamatan_field,
+            list(kab_names),
+            list(kec_names),
+            kab,
+            kec,
+            day,
+            count,
+        )
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def _mask(
+        self, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> np.ndarray:
+        """Baris dalam rentang tanggal (inklusif), seperti range filter build_query."""
+        mask = np.ones(len(self), dtype=bool)
+        if date_from or date_to:
+            mask &= self.day != MISSING_DAY
+        if date_from:
+            mask &= self.day >= day_number(date_from)
+        if date_to:
+            mask &= self.day <= day_number(date_to)
+        return mask
+
+    @staticmethod
+    def _counts(codes: np.ndarray, count: np.ndarray, names: np.ndarray):
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], weights=count[valid], minlength=len(names))
+        present = np.flatnonzero(totals)
+        return {names[i]: int(totals[i]) for i in present}
+
+    def kabupaten_counts(
+        self, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Dict[str, int]:
+        """Opsi kabupaten/kota (urut nama) -> jumlah dokumen."""
+        mask = self._mask(date_from, date_to)
+        return self._counts(self.kab[mask], self.count[mask], self.kab_names)
+
+    def kecamatan_counts(
+        self,
+        kabupaten: List[str],
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Opsi kecamatan di `kabupaten` (urut nama) -> jumlah dokumen."""
+        codes = np.flatnonzero(np.isin(self.kab_names, list(kabupaten)))
+        mask = self._mask(date_from, date_to) & np.isin(self.kab, codes)
+        return self._counts(self.kec[mask], self.count[mask], self.kec_names)
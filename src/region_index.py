@@ -0,0 +1,131 @@
+# StuntLytics/src/region_index.py
+# Indeks wilayah untuk GeoJSON peta risiko: kode wilayah (src/region_codes.py)
+# tiap fitur -> posisi fitur. Dibangun sekali saat GeoJSON dimuat; setiap render
+# cukup melakukan join vektor kode hasil agregasi ES ke indeks ini tanpa
+# menyentuh objek GeoJSON yang di-cache maupun menormalisasi nama per baris.
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.region_codes import (
+    CODE_FIELDS,
+    KAB_PROPERTY,
+    KEC_PROPERTY,
+    RegionDictionary,
+)
+
+
+class RegionIndex:
+    """Posisi fitur GeoJSON per kode wilayah."""
+
+    def __init__(
+        self,
+        dictionary: RegionDictionary,
+        kab_codes: Sequence[int],
+        kec_codes: Sequence[int],
+        desa_codes: Optional[Sequence[int]] = None,
+    ):
+        self.dictionary = dictionary
+        self.kab_codes = np.asarray(kab_codes, dtype=np.int64)
+        self.kec_codes = np.asarray(kec_codes, dtype=np.int64)
+        self.desa_codes = (
+            None if desa_codes is None else np.asarray(desa_codes, dtype=np.int64)
+        )
+        self.level = "kecamatan" if self.desa_codes is None else "desa"
+        self._keys = pd.Index(
+            self.kec_codes if self.desa_codes is None else self.desa_codes
+        )
+
+    @classmethod
+    def from_features(
+        cls,
+        dictionary: RegionDictionary,
+        features: List[Dict[str, Any]],
+        kab_property: str = KAB_PROPERTY,
+        kec_property: str = KEC_PROPERTY,
+        desa_property: Optional[str] = None,
+    ) -> "RegionIndex":
+        props = [f.get("properties") or {} for f in features]
+        return cls.from_names(
+            dictionary,
+            [p.get(kab_property) for p in props],
+            [p.get(kec_property) for p in props],
+            [p.get(desa_property) for p in props] if desa_property else None,
+        )
+
+    @classmethod
+    def from_names(cls, dictionary, kabupaten, kecamatan, desa=None) -> "RegionIndex":
+        """Dari kolom nama mentah (mis. kolom properti geostore)."""
+        codes = dictionary.encode(kabupaten, kecamatan, desa)
+        return cls(
+            dictionary, codes["kabupaten"], codes["kecamatan"], codes.get("desa")
+        )
+
+    def __len__(self) -> int:
+        return len(self.kab_codes)
+
+    def agg_codes(
+        self,
+        agg_df: pd.DataFrame,
+        kab_col: str = "kabupaten",
+        kec_col: str = "kecamatan",
+        desa_col: str = "desa",
+    ) -> np.ndarray:
+        """Kode level indeks per baris agregasi: kolom kode_* bila ada, atau dari nama."""
+        code_col = CODE_FIELDS[self.level]
+        if code_col in agg_df:
+            return agg_df[code_col].to_numpy(dtype=np.int64)
+        desa = agg_df[desa_col] if self.level == "desa" else None
+        codes = self.dictionary.encode(agg_df[kab_col], agg_df[kec_col], desa)
+        return codes[self.level]
+
+    def join(self, agg_df: pd.DataFrame, **columns) -> pd.DataFrame:
+        """
+        Agregasi per (kabupaten, kecamatan[, desa]) -> satu baris per fitur
+        (urutan fitur). Prevalensi tidak dibulatkan; fitur tanpa data, atau total anak
+        0, bernilai NaN/0.
+        """
+        n = len(self)
+        out = pd.DataFrame(
+            {
+                "prevalensi_stunting": np.full(n, np.nan),
+                "jumlah_stunting": np.zeros(n, dtype=np.int64),
+                "total_anak_terdata": np.zeros(n, dtype=np.int64),
+            }
+        )
+        if agg_df.empty:
+            return out
+
+        agg_keys = pd.Index(self.agg_codes(agg_df, **columns))
+        # Kunci ganda di hasil agregasi: baris terakhir yang dipakai; kode tak
+        # dikenal (-1) tidak pernah cocok
+        last = ~agg_keys.duplicated(keep="last") & (agg_keys >= 0)
+        rows = agg_keys[last].get_indexer(self._keys)
+        total = agg_df["total_anak"].to_numpy()[last]
+        stunting = agg_df["jumlah_stunting"].to_numpy()[last]
+
+        hit = (rows >= 0) & (self._keys >= 0)
+        hit[hit] = total[rows[hit]] > 0
+        matched = rows[hit]
+        out.loc[hit, "total_anak_terdata"] = total[matched].astype(np.int64)
+        out.loc[hit, "jumlah_stunting"] = stunting[matched].astype(np.int64)
+        out.loc[hit, "prevalensi_stunting"] = stunting[matched] / total[matched] * 100
+        return out
+
+    def select(
+        self, kabupaten: Optional[List[str]], kecamatan: Optional[List[str]]
+    ) -> np.ndarray:
+        """Posisi fitur untuk pilihan sidebar (item pertama, seperti sebelumnya)."""
+        if not kabupaten and not kecamatan:
+            return np.arange(len(self))
+        if not kabupaten:
+            return np.empty(0, dtype=np.int64)  # kecamatan tanpa kabupaten
+        codes = self.dictionary.encode(
+            kabupaten[:1], kecamatan[:1] if kecamatan else None
+        )
+        key = self.kab_codes if not kecamatan else self.kec_codes
+        code = codes["kecamatan" if kecamatan else "kabupaten"][0]
+        if code < 0:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(key == code)
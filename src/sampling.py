@@ -0,0 +1,297 @@
+# StuntLytics/src/sampling.py
+# Sampel acak (opsional berstrata per kabupaten/kota) dari index stunting, dengan
+# ukuran sampel yang diturunkan dari target interval kepercayaan, bukan angka
+# tetap. Estimator berbobot + galat baku dipakai halaman untuk menampilkan
+# error bar.
+#
+# Pengacakan memakai `function_score.random_score` dengan seed (hasil dapat
+# diulang); semua strata diambil dalam satu request `_msearch`.
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src import elastic_client as es
+from src.labels import extract_labels
+from src.query_cache import cached
+
+STRATUM_FIELD = "nama_kabupaten_kota"
+MISSING_STRATUM = "(tanpa wilayah)"
+OTHER_STRATUM = "(lainnya)"  # nilai di luar MAX_STRATA terbesar, digabung
+ALL_STRATUM = "Semua"
+MAX_WINDOW = 10_000  # index.max_result_window bawaan ES (per strata)
+MAX_STRATA = 100
+CACHE_TTL_S = 600.0
+
+
+@dataclass(frozen=True)
+class SamplingPlan:
+    """
+    Target presisi sampel. `margin` adalah setengah lebar interval kepercayaan:
+    absolut untuk proporsi (0.02 = ±2 poin persen) dan koefisien korelasi.
+    """
+
+    margin: float = 0.02
+    confidence: float = 0.95
+    stratify: bool = True
+    seed: int = 42
+    kind: str = "proportion"  # "proportion" | "correlation"
+
+
+@dataclass
+class Sample:
+    df: pd.DataFrame  # _source + kolom _strata & _bobot (N_h / n_h)
+    strata: pd.DataFrame  # index strata; kolom N (populasi), n (sampel)
+    plan: SamplingPlan
+
+    @property
+    def population(self) -> int:
+        return int(self.strata["N"].sum())
+
+    @property
+    def size(self) -> int:
+        return len(self.df)
+
+
+def z_value(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def sample_size(plan: SamplingPlan, population: int) -> int:
+    """
+    Ukuran sampel acak sederhana untuk mencapai `plan.margin`:
+    - proporsi (kasus terburuk p = 0,5): n0 = z^2 * p(1-p) / e^2
+    - korelasi (transformasi Fisher, r ~ 0): n0 = (z / atanh(e))^2 + 3
+    lalu dikoreksi populasi hingga (FPC).
+    """
+    if population <= 0:
+        return 0
+    z = z_value(plan.confidence)
+    if plan.kind == "correlation":
+        n0 = (z / math.atanh(min(plan.margin, 0.99))) ** 2 + 3
+    else:
+        n0 = z * z * 0.25 / (plan.margin * plan.margin)
+    n = n0 / (1 + (n0 - 1) / population)
+    return int(min(population, math.ceil(n)))
+
+
+def allocate(counts: Dict[str, int], n: int) -> Dict[str, int]:
+    """
+    Alokasi proporsional (sisa terbesar), minimal 2 per strata agar varians
+    strata dapat diestimasi, dan tidak melebihi ukuran strata.
+    """
+    total = sum(counts.values())
+    if total == 0 or n <= 0:
+        return {k: 0 for k in counts}
+    exact = {k: n * c / total for k, c in counts.items()}
+    alloc = {k: min(counts[k], max(2, math.floor(v))) for k, v in exact.items()}
+    remaining = n - sum(alloc.values())
+    for k in sorted(exact, key=lambda k: exact[k] - math.floor(exact[k]), reverse=True):
+        if remaining <= 0:
+            break
+        if alloc[k] < counts[k]:
+            alloc[k] += 1
+            remaining -= 1
+    return {k: min(v, MAX_WINDOW) for k, v in alloc.items()}
+
+
+def _stratum_counts(query: Dict[str, Any], field: Optional[str]) -> Dict[str, int]:
+    body = {"size": 0, "track_total_hits": True, "query": query}
+    if field:
+        body["aggs"] = {
+            "strata": {"terms": {"field": field, "size": MAX_STRATA}},
+            "missing": {"missing": {"field": field}},
+        }
+    data = es.search(body)
+    if not field:
+        return {ALL_STRATUM: data.get("hits", {}).get("total", {}).get("value", 0)}
+    aggs = data.get("aggregations", {})
+    counts = {b["key"]: b["doc_count"] for b in aggs["strata"]["buckets"]}
+    if aggs["strata"].get("sum_other_doc_count"):
+        # Tanpa strata sisa, dokumen ini hilang dari populasi N maupun sampel
+        counts[OTHER_STRATUM] = aggs["strata"]["sum_other_doc_count"]
+    if aggs.get("missing", {}).get("doc_count"):
+        counts[MISSING_STRATUM] = aggs["missing"]["doc_count"]
+    return counts
+
+
+def _stratum_query(
+    query: Dict[str, Any], field: Optional[str], key: str, named: List[str]
+) -> Dict:
+    """Query satu strata; `named` = strata bernilai (untuk strata sisa)."""
+    if not field or key == ALL_STRATUM:
+        return query
+    if key == MISSING_STRATUM:
+        clause = {"bool": {"must_not": {"exists": {"field": field}}}}
+    elif key == OTHER_STRATUM:
+        clause = {
+            "bool": {
+                "filter": {"exists": {"field": field}},
+                "must_not": {"terms": {field: named}},
+            }
+        }
+    else:
+        clause = {"term": {field: key}}
+    return {"bool": {"filter": [query, clause]}}
+
+
+@cached("sampling.draw", ttl_s=CACHE_TTL_S)
+def draw(
+    query: Dict[str, Any],
+    plan: SamplingPlan,
+    source: List[str],
+    stratum_field: Optional[str] = STRATUM_FIELD,
+) -> Sample:
+    """Mengambil sampel acak ber-seed sesuai `plan` untuk dokumen yang cocok `query`."""
+    field = stratum_field if plan.stratify else None
+    counts = _stratum_counts(query, field)
+    alloc = allocate(counts, sample_size(plan, sum(counts.values())))
+    keys = [k for k, n in alloc.items() if n > 0]
+    named = [k for k in counts if k not in (MISSING_STRATUM, OTHER_STRATUM)]
+    bodies = [
+        {
+            "size": alloc[k],
+            "_source": source,
+            "query": {
+                "function_score": {
+                    "query": _stratum_query(query, field, k, named),
+                    "random_score": {"seed": plan.seed, "field": "_seq_no"},
+                    "boost_mode": "replace",
+                }
+            },
+        }
+        for k in keys
+    ]
+    frames = []
+    taken = {}
+    for key, res in zip(keys, es.msearch(bodies)):
+        hits = res.get("hits", {}).get("hits", [])
+        taken[key] = len(hits)
+        frame = pd.DataFrame([h.get("_source", {}) for h in hits])
+        frame["_strata"] = key
+        frame["_bobot"] = counts[key] / max(len(hits), 1)
+        frames.append(frame)
+    df = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=source + ["_strata", "_bobot"])
+    )
+    strata = (
+        pd.DataFrame({"N": pd.Series(counts), "n": pd.Series(taken)})
+        .fillna(0)
+        .astype(int)
+    )
+    return Sample(df=df, strata=strata, plan=plan)
+
+
+def _interval(estimate: float, variance: float, n: int, confidence: float) -> Dict:
+    se = math.sqrt(max(variance, 0.0))
+    half = z_value(confidence) * se
+    return {
+        "estimate": estimate,
+        "se": se,
+        "lower": estimate - half,
+        "upper": estimate + half,
+        "margin": half,
+        "n": n,
+    }
+
+
+def estimate_mean(sample: Sample, values: pd.Series) -> Dict[str, float]:
+    """
+    Estimator rata-rata berstrata: sum W_h * ybar_h, dengan
+    Var = sum W_h^2 * (1 - n_h/N_h) * s_h^2 / n_h. Nilai kosong diabaikan.
+    Untuk proporsi, kirim deret 0/1.
+    """
+    values = pd.to_numeric(values, errors="coerce")
+    frame = pd.DataFrame({"y": values, "h": sample.df["_strata"]}).dropna()
+    if frame.empty:
+        return _interval(float("nan"), float("nan"), 0, sample.plan.confidence)
+    g = frame.groupby("h")["y"].agg(["mean", "var", "count"])
+    N_h = sample.strata["N"].reindex(g.index).astype(float)
+    W = N_h / N_h.sum()
+    fpc = (1 - g["count"] / N_h).clip(lower=0)
+    var_h = g["var"].fillna(0.0) * fpc / g["count"]
+    return _interval(
+        float((W * g["mean"]).sum()),
+        float((W * W * var_h).sum()),
+        int(g["count"].sum()),
+        sample.plan.confidence,
+    )
+
+
+def estimate_prevalence(sample: Sample) -> Dict[str, float]:
+    """Proporsi stunting (definisi label sama dengan agregasi ES)."""
+    return estimate_mean(sample, extract_labels(sample.df))
+
+
+def estimate_by_stratum(sample: Sample, values: pd.Series) -> pd.DataFrame:
+    """Rata-rata/proporsi per strata (acak sederhana di dalam strata) + interval."""
+    values = pd.to_numeric(values, errors="coerce")
+    frame = pd.DataFrame({"y": values, "h": sample.df["_strata"]}).dropna()
+    g = frame.groupby("h")["y"].agg(["mean", "var", "count"])
+    N_h = sample.strata["N"].reindex(g.index).astype(float)
+    fpc = (1 - g["count"] / N_h).clip(lower=0)
+    half = z_value(sample.plan.confidence) * np.sqrt(
+        g["var"].fillna(0.0) * fpc / g["count"]
+    )
+    return pd.DataFrame(
+        {
+            "estimasi": g["mean"],
+            "bawah": g["mean"] - half,
+            "atas": g["mean"] + half,
+            "n": g["count"],
+            "N": N_h.astype(int),
+        }
+    )
+
+
+def prevalence_by_stratum(sample: Sample) -> pd.DataFrame:
+    return estimate_by_stratum(sample, extract_labels(sample.df))
+
+
+def correlation_interval(r: float, n: int, confidence: float) -> Dict[str, float]:
+    """Interval kepercayaan korelasi Pearson via transformasi Fisher."""
+    if n <= 3 or not np.isfinite(r):
+        return {"estimate": r, "lower": np.nan, "upper": np.nan, "n": n}
+    zr = math.atanh(max(min(r, 0.999999), -0.999999))
+    half = z_value(confidence) / math.sqrt(n - 3)
+    return {
+        "estimate": r,
+        "lower": math.tanh(zr - half),
+        "upper": math.tanh(zr + half),
+        "n": n,
+    }
+
+
+def sample_correlations(sample: Sample, target: str, fields: List[str]) -> pd.DataFrame:
+    """
+    Korelasi target vs field dari sampel (pairwise-complete) beserta interval
+    Fisher. Sampel berstrata proporsional sehingga tidak diberi bobot.
+    """
+    numeric = sample.df.reindex(columns=[target] + fields).apply(
+        pd.to_numeric, errors="coerce"
+    )
+    y = numeric[target]
+    rows = []
+    for f in fields:
+        pair = pd.concat([y, numeric[f]], axis=1).dropna()
+        if len(pair) < 3 or pair.iloc[:, 1].nunique() < 2 or y.nunique() < 2:
+            continue
+        r = float(pair.iloc[:, 0].corr(pair.iloc[:, 1]))
+        ci = correlation_interval(r, len(pair), sample.plan.confidence)
+        rows.append(
+            {
+                "faktor": f,
+                "korelasi": r,
+                "bawah": ci["lower"],
+                "atas": ci["upper"],
+                "n": len(pair),
+            }
+        )
+    return pd.DataFrame(
+        rows, columns=["faktor", "korelasi", "bawah", "atas", "n"]
+    ).set_index("faktor")
@@ -0,0 +1,183 @@
+# StuntLytics/src/scoring_job.py
+# Job offline: skor seluruh dokumen STUNTING_INDEX dengan model (scorer terkompilasi
+# bila ada, lihat src/compiled_scorer.py), lalu tulis balik `risk_score` & `risk_zone` via partial `_bulk` update.
+#
+# Pemakaian:
+#   python -m src.scoring_job --workers 4 --chunk-size 5000
+#   python -m src.scoring_job --dry-run      # hanya hitung, tanpa menulis ke ES
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import config, elastic_client as es, model_registry, prediction_service
+
+_WORKER_PIPELINE = None
+
+
+def _init_worker(pipeline_path: str, scorer_dir: str) -> None:
+    """
+    Initializer process pool: setiap worker memuat model sekali saja. Scorer
+    terkompilasi di-mmap (dibagi antar worker) dan tidak mengimpor sklearn.
+    """
+    global _WORKER_PIPELINE
+    _WORKER_PIPELINE = prediction_service.load_model(pipeline_path, scorer_dir)
+
+
+def _score_chunk(
+    ids: List[str], features: pd.DataFrame
+) -> Tuple[List[str], np.ndarray]:
+    proba = _WORKER_PIPELINE.predict_proba(features[prediction_service.INPUT_FIELDS])
+    return ids, proba[:, 1]
+
+
+def assign_zones(scores: np.ndarray) -> np.ndarray:
+    """risk_score -> label zona (config.RISK_ZONES), vektor untuk satu chunk."""
+    conditions, labels = [], []
+    for label, (lo, hi) in config.RISK_ZONES.items():
+        cond = np.ones(len(scores), dtype=bool)
+        if lo is not None:
+            cond &= scores >= lo
+        if hi is not None:
+            cond &= scores < hi
+        conditions.append(cond)
+        labels.append(label)
+    return np.select(conditions, labels, default="")
+
+
+def _prepare(hits: List[Dict]) -> Tuple[List[str], pd.DataFrame, int]:
+    """Hits ES -> (id valid, fitur valid, jumlah baris tidak valid)."""
+    ids = [h["_id"] for h in hits]
+    source_df = pd.DataFrame([h.get("_source", {}) for h in hits])
+    features = prediction_service.es_source_to_features(source_df)
+    valid, _ = prediction_service.validate_batch(features)
+    valid_ids = [ids[i] for i in valid.index]
+    return valid_ids, valid.reset_index(drop=True), len(hits) - len(valid)
+
+
+def _write_back(
+    index: str, ids: List[str], scores: np.ndarray, dry_run: bool
+) -> Dict[str, int]:
+    if dry_run:
+        return {"updated": 0, "errors": 0}
+    zones = assign_zones(scores)
+    updates = (
+        (
+            doc_id,
+            {
+                es.RISK_SCORE_FIELD: round(float(score), 4),
+                es.RISK_ZONE_FIELD: str(zone),
+            },
+        )
+        for doc_id, score, zone in zip(ids, scores, zones)
+    )
+    return es.bulk_update(index, updates)
+
+
+def run(
+    index: str = es.STUNTING_INDEX,
+    pipeline_path: str = prediction_service.PIPELINE_PATH,
+    scorer_dir: str = prediction_service.SCORER_DIR,
+    model_version: Optional[str] = None,
+    workers: int = max(1, (os.cpu_count() or 2) - 1),
+    chunk_size: int = 5000,
+    dry_run: bool = False,
+) -> Dict[str, float]:
+    """
+    Scroll seluruh index, skor per chunk di process pool, tulis balik hasilnya.
+    Jumlah chunk yang sedang diproses dibatasi (2x worker) agar memori tetap datar.
+    Model dikunci ke satu versi registry (default: CURRENT) selama job berjalan;
+    bila registry kosong, memakai `pipeline_path`/`scorer_dir`.
+    """
+    stats = {"scanned": 0, "invalid": 0, "scored": 0, "updated": 0, "errors": 0}
+    model_version = model_version or model_registry.current_version()
+    if model_version:
+        scorer_dir = model_registry.version_dir(model_version)
+        pipeline_path = os.path.join(scorer_dir, model_registry.PIPELINE_FILE)
+    started = time.perf_counter()
+    source_fields = list(prediction_service.ES_FEATURE_FIELDS.values())
+    max_in_flight = workers * 2
+    if not dry_run:
+        es.put_mapping(
+            index,
+            {
+                es.RISK_SCORE_FIELD: {"type": "float"},
+                es.RISK_ZONE_FIELD: {"type": "keyword"},
+            },
+        )
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(pipeline_path, scorer_dir),
+    ) as pool:
+        pending = set()
+
+        def drain(block_until: int) -> None:
+            nonlocal pending
+            while len(pending) > block_until:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    ids, scores = fut.result()
+                    stats["scored"] += len(ids)
+                    result = _write_back(index, ids, scores, dry_run)
+                    stats["updated"] += result["updated"]
+                    stats["errors"] += result["errors"]
+
+        for hits in es.scan_documents(
+            index, source=source_fields, batch_size=chunk_size
+        ):
+            stats["scanned"] += len(hits)
+            ids, features, invalid = _prepare(hits)
+            stats["invalid"] += invalid
+            if ids:
+                pending.add(pool.submit(_score_chunk, ids, features))
+            drain(max_in_flight - 1)
+            print(
+                f"\r{stats['scanned']:,} dokumen dipindai, {stats['scored']:,} diskor",
+                end="",
+                flush=True,
+            )
+        drain(0)
+
+    stats["model_version"] = model_version or "-"
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    stats["docs_per_s"] = round(stats["scanned"] / max(stats["elapsed_s"], 1e-9), 1)
+    print()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Skoring risiko seluruh index stunting"
+    )
+    parser.add_argument("--index", default=es.STUNTING_INDEX)
+    parser.add_argument("--pipeline", default=prediction_service.PIPELINE_PATH)
+    parser.add_argument("--scorer", default=prediction_service.SCORER_DIR)
+    parser.add_argument("--model-version", help="versi registry (default: CURRENT)")
+    parser.add_argument(
+        "--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1)
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    stats = run(
+        index=args.index,
+        pipeline_path=args.pipeline,
+        scorer_dir=args.scorer,
+        model_version=args.model_version,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+    )
+    for key, value in stats.items():
+        print(f"{key:>12}: {value}")
+
+
+if __name__ == "__main__":
+    main()
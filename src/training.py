@@ -0,0 +1,406 @@
+# StuntLytics/src/training.py
+# Pelatihan ulang out-of-core dari STUNTING_INDEX dengan RAM terbatas:
+#   1. Scroll seluruh index per chunk -> fitur (es_source_to_features + validate_batch)
+#      + label, di-encode dengan encoder scorer terkompilasi lalu ditulis ke
+#      matriks float32 di disk (memmap); StandardScaler di-fit bertahap (partial_fit).
+#   2. SGDClassifier (log loss) dilatih per chunk via partial_fit selama beberapa
+#      epoch; bobot terbaik dipilih dari log loss data validasi.
+#   3. Hasil ditulis dalam format src/compiled_scorer lalu dipublikasikan ke
+#      registry model (src/model_registry) beserta metrik throughput & waktu.
+#
+# Pemakaian:
+#   python -m src.training --epochs 5 --chunk-size 5000
+#   python -m src.training --activate          # langsung jadikan versi aktif
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import (
+    compiled_scorer,
+    elastic_client as es,
+    model_registry,
+    prediction_service,
+)
+from src.labels import STATUS_FIELD, ZSCORE_FIELDS, extract_labels
+
+
+def _feature_encoder() -> compiled_scorer.CompiledScorer:
+    """
+    Encoder dengan skema form: numerik apa adanya (belum diskalakan), kategorik
+    & biner one-hot. Urutan kolom sama dengan scorer akhir.
+    """
+    numeric = list(prediction_service.NUMERIC_FIELDS)
+    categorical = [
+        {"name": col, "numeric": False, "categories": list(values)}
+        for col, values in prediction_service.CATEGORICAL_FIELDS.items()
+    ] + [
+        {"name": col, "numeric": True, "categories": [0.0, 1.0]}
+        for col in prediction_service.BINARY_FIELDS
+    ]
+    n = len(numeric)
+    manifest = {
+        "numeric": numeric,
+        "categorical": categorical,
+        "n_features": n + sum(len(c["categories"]) for c in categorical),
+        "estimator": "linear",
+        "intercept": 0.0,
+    }
+    arrays = {
+        "num_fill": np.full(n, np.nan),
+        "num_mean": np.zeros(n),
+        "num_scale": np.ones(n),
+        "coef": np.zeros(manifest["n_features"]),
+    }
+    return compiled_scorer.CompiledScorer(manifest, arrays)
+
+
+def _is_validation(doc_id: str, val_pct: int) -> bool:
+    # Split deterministik dari _id: dokumen yang sama selalu di sisi yang sama
+    return zlib.crc32(doc_id.encode("utf-8")) % 100 < val_pct
+
+
+class _SpillFile:
+    """Matriks float32 + label uint8 yang ditulis append-only ke disk."""
+
+    def __init__(self, path: str, n_features: int):
+        self.path, self.n_features, self.rows = path, n_features, 0
+        self._x = open(f"{path}.X.f32", "wb")
+        self._y = open(f"{path}.y.u8", "wb")
+
+    def append(self, X: np.ndarray, y: np.ndarray) -> None:
+        X.astype(np.float32).tofile(self._x)
+        y.astype(np.uint8).tofile(self._y)
+        self.rows += len(y)
+
+    def close(self) -> None:
+        self._x.close()
+        self._y.close()
+
+    def open_memmap(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.rows == 0:
+            return np.empty((0, self.n_features), np.float32), np.empty(0, np.uint8)
+        X = np.memmap(
+            f"{self.path}.X.f32", np.float32, "r", shape=(self.rows, self.n_features)
+        )
+        y = np.memmap(f"{self.path}.y.u8", np.uint8, "r", shape=(self.rows,))
+        return X, y
+
+
+def extract(
+    index: str,
+    workdir: str,
+    chunk_size: int = 5000,
+    val_pct: int = 10,
+    query: Optional[Dict[str, Any]] = None,
+):
+    """Pass 1: scroll index -> file fitur train/val di disk + scaler numerik."""
+    from sklearn.preprocessing import StandardScaler
+
+    encoder = _feature_encoder()
+    n_numeric = len(encoder.numeric)
+    scaler = StandardScaler()
+    train = _SpillFile(os.path.join(workdir, "train"), encoder.manifest["n_features"])
+    val = _SpillFile(os.path.join(workdir, "val"), encoder.manifest["n_features"])
+    stats = {"scanned": 0, "invalid": 0, "unlabeled": 0, "positives": 0}
+    source = list(prediction_service.ES_FEATURE_FIELDS.values()) + [
+        STATUS_FIELD,
+        *ZSCORE_FIELDS,
+    ]
+    started = time.perf_counter()
+
+    for hits in es.scan_documents(index, query, source=source, batch_size=chunk_size):
+        stats["scanned"] += len(hits)
+        ids = np.array([h["_id"] for h in hits], dtype=object)
+        source_df = pd.DataFrame([h.get("_source", {}) for h in hits])
+        labels = extract_labels(source_df)
+        features = prediction_service.es_source_to_features(source_df)
+        valid, _ = prediction_service.validate_batch(features)
+        stats["invalid"] += len(hits) - len(valid)
+
+        y = labels.loc[valid.index]
+        labeled = y.notna().to_numpy()
+        stats["unlabeled"] += int((~labeled).sum())
+        if not labeled.any():
+            continue
+        valid, y = valid[labeled], y[labeled].to_numpy().astype(np.uint8)
+        X = encoder.transform(valid)
+        stats["positives"] += int(y.sum())
+
+        is_val = np.array(
+            [_is_validation(i, val_pct) for i in ids[valid.index.to_numpy()]],
+            dtype=bool,
+        )
+        if (~is_val).any():
+            scaler.partial_fit(X[~is_val, :n_numeric])
+            train.append(X[~is_val], y[~is_val])
+        if is_val.any():
+            val.append(X[is_val], y[is_val])
+        print(
+            f"\r{stats['scanned']:,} dokumen dipindai, "
+            f"{train.rows:,} train / {val.rows:,} validasi",
+            end="",
+            flush=True,
+        )
+    print()
+    train.close()
+    val.close()
+    stats["extract_s"] = round(time.perf_counter() - started, 2)
+    stats["extract_docs_per_s"] = round(
+        stats["scanned"] / max(stats["extract_s"], 1e-9), 1
+    )
+    stats["train_rows"], stats["val_rows"] = train.rows, val.rows
+    return encoder, scaler, train, val, stats
+
+
+def _scaled_chunks(
+    X: np.ndarray,
+    y: np.ndarray,
+    mean: np.ndarray,
+    scale: np.ndarray,
+    chunk_rows: int,
+    rng: Optional[np.random.Generator] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Potongan matriks memmap yang diskalakan; urutan diacak bila `rng` diberikan."""
+    n_numeric = len(mean)
+    starts = np.arange(0, len(y), chunk_rows)
+    if rng is not None:
+        rng.shuffle(starts)
+    for start in starts:
+        Xc = np.array(X[start : start + chunk_rows], dtype=np.float64)
+        yc = np.asarray(y[start : start + chunk_rows])
+        Xc[:, :n_numeric] = (Xc[:, :n_numeric] - mean) / scale
+        if rng is not None:
+            order = rng.permutation(len(yc))
+            Xc, yc = Xc[order], yc[order]
+        yield Xc, yc
+
+
+def _evaluate(clf, X, y, mean, scale, chunk_rows) -> Dict[str, float]:
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    if len(y) == 0:
+        return {}
+    proba = np.concatenate(
+        [
+            clf.predict_proba(Xc)[:, 1]
+            for Xc, _ in _scaled_chunks(X, y, mean, scale, chunk_rows)
+        ]
+    )
+    y = np.asarray(y)
+    metrics = {
+        "log_loss": round(float(log_loss(y, proba, labels=[0, 1])), 5),
+        "accuracy": round(float(((proba > 0.5) == y).mean()), 4),
+    }
+    if 0 < y.sum() < len(y):
+        metrics["roc_auc"] = round(float(roc_auc_score(y, proba)), 4)
+    return metrics
+
+
+def train_sgd(
+    train: _SpillFile,
+    val: _SpillFile,
+    scaler,
+    epochs: int = 5,
+    chunk_rows: int = 50_000,
+    alpha: float = 1e-4,
+    balanced: bool = False,
+    seed: int = 42,
+):
+    """Pass 2: SGDClassifier.partial_fit per chunk; simpan bobot epoch terbaik."""
+    from sklearn.linear_model import SGDClassifier
+
+    X_train, y_train = train.open_memmap()
+    X_val, y_val = val.open_memmap()
+    if len(y_train) == 0:
+        raise ValueError("Tidak ada baris latih yang valid dan berlabel")
+    mean, scale = scaler.mean_, scaler.scale_
+    class_weight = None
+    if balanced:
+        pos = float(np.asarray(y_train).mean())
+        class_weight = {0: 0.5 / max(1 - pos, 1e-9), 1: 0.5 / max(pos, 1e-9)}
+    clf = SGDClassifier(
+        loss="log_loss", alpha=alpha, class_weight=class_weight, random_state=seed
+    )
+    rng = np.random.default_rng(seed)
+    history, best = [], None
+    for epoch in range(1, epochs + 1):
+        started = time.perf_counter()
+        for Xc, yc in _scaled_chunks(X_train, y_train, mean, scale, chunk_rows, rng):
+            clf.partial_fit(Xc, yc, classes=np.array([0, 1]))
+        elapsed = time.perf_counter() - started
+        metrics = _evaluate(clf, X_val, y_val, mean, scale, chunk_rows)
+        history.append(
+            {
+                "epoch": epoch,
+                "train_s": round(elapsed, 2),
+                "train_rows_per_s": round(len(y_train) / max(elapsed, 1e-9), 1),
+                **{f"val_{k}": v for k, v in metrics.items()},
+            }
+        )
+        print(f"Epoch {epoch}/{epochs}: {history[-1]}")
+        score = metrics.get("log_loss", -epoch)
+        if best is None or score < best[0]:
+            best = (score, epoch, clf.coef_.copy(), clf.intercept_.copy())
+    _, best_epoch, clf.coef_, clf.intercept_ = best
+    return clf, history, best_epoch
+
+
+def build_scorer(
+    encoder: compiled_scorer.CompiledScorer, scaler, clf
+) -> compiled_scorer.CompiledScorer:
+    """Encoder + scaler + bobot SGD -> scorer terkompilasi (format src/compiled_scorer)."""
+    manifest = {
+        **encoder.manifest,
+        "intercept": float(clf.intercept_[0]),
+        "source": type(clf).__name__,
+    }
+    arrays = {
+        **encoder.arrays,
+        "num_mean": scaler.mean_.astype(np.float64),
+        "num_scale": scaler.scale_.astype(np.float64),
+        "coef": clf.coef_[0].astype(np.float64),
+    }
+    return compiled_scorer.CompiledScorer(manifest, arrays)
+
+
+def run(
+    index: str = es.STUNTING_INDEX,
+    chunk_size: int = 5000,
+    epochs: int = 5,
+    train_chunk_rows: int = 50_000,
+    alpha: float = 1e-4,
+    val_pct: int = 10,
+    balanced: bool = False,
+    seed: int = 42,
+    workdir: Optional[str] = None,
+    keep_workdir: bool = False,
+    version: Optional[str] = None,
+    activate: bool = False,
+) -> Dict[str, Any]:
+    """Ekstraksi -> pelatihan -> publikasi ke registry. Mengembalikan metrik."""
+    started = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="stuntlytics-train-", dir=workdir)
+    try:
+        encoder, scaler, train, val, stats = extract(
+            index, workdir, chunk_size, val_pct
+        )
+        clf, history, best_epoch = train_sgd(
+            train, val, scaler, epochs, train_chunk_rows, alpha, balanced, seed
+        )
+        scorer = build_scorer(encoder, scaler, clf)
+
+        # Cek paritas scorer vs SGD pada data validasi (fitur sudah ter-encode)
+        X_val, y_val = val.open_memmap()
+        max_diff = 0.0
+        for Xc, _ in _scaled_chunks(
+            X_val, y_val, scaler.mean_, scaler.scale_, train_chunk_rows
+        ):
+            diff = np.abs(scorer.decision(Xc) - clf.predict_proba(Xc)[:, 1]).max()
+            max_diff = max(max_diff, float(diff))
+        if max_diff > compiled_scorer.PARITY_TOLERANCE:
+            raise ValueError(f"Paritas scorer gagal: selisih maksimum {max_diff:.3e}")
+
+        metrics = {
+            **stats,
+            "epochs": history,
+            "best_epoch": best_epoch,
+            "val": {
+                k[4:]: v
+                for k, v in history[best_epoch - 1].items()
+                if k.startswith("val_")
+            },
+            "positive_rate": round(
+                stats["positives"] / max(stats["train_rows"] + stats["val_rows"], 1), 4
+            ),
+            "total_s": round(time.perf_counter() - started, 2),
+        }
+        artifact = os.path.join(workdir, "artifact")
+        compiled_scorer.save(
+            artifact,
+            {
+                **scorer.manifest,
+                "parity_max_abs_diff": max_diff,
+                "parity_rows": int(len(y_val)),
+            },
+            scorer.arrays,
+        )
+        params = {
+            "index": index,
+            "epochs": epochs,
+            "alpha": alpha,
+            "val_pct": val_pct,
+            "balanced": balanced,
+            "seed": seed,
+        }
+        metrics["version"] = model_registry.publish(
+            artifact,
+            version,
+            metadata={"training": params, "metrics": metrics},
+            make_current=activate,
+        )
+        return metrics
+    finally:
+        if keep_workdir:
+            print(f"File kerja disimpan di {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Latih ulang model stunting dari Elasticsearch"
+    )
+    parser.add_argument("--index", default=es.STUNTING_INDEX)
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="dokumen per halaman scroll"
+    )
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--train-chunk-rows", type=int, default=50_000)
+    parser.add_argument("--alpha", type=float, default=1e-4)
+    parser.add_argument("--val-pct", type=int, default=10)
+    parser.add_argument("--balanced", action="store_true", help="bobot kelas seimbang")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="lokasi file memmap sementara")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--version")
+    parser.add_argument("--activate", action="store_true", help="jadikan versi aktif")
+    args = parser.parse_args(argv)
+
+    metrics = run(
+        index=args.index,
+        chunk_size=args.chunk_size,
+        epochs=args.epochs,
+        train_chunk_rows=args.train_chunk_rows,
+        alpha=args.alpha,
+        val_pct=args.val_pct,
+        balanced=args.balanced,
+        seed=args.seed,
+        workdir=args.workdir,
+        keep_workdir=args.keep_workdir,
+        version=args.version,
+        activate=args.activate,
+    )
+    print(f"Versi {metrics['version']} dipublikasikan ke {model_registry.REGISTRY_DIR}")
+    for key in (
+        "scanned",
+        "invalid",
+        "unlabeled",
+        "train_rows",
+        "val_rows",
+        "extract_docs_per_s",
+        "best_epoch",
+        "val",
+        "total_s",
+    ):
+        print(f"{key:>20}: {metrics[key]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,40 @@
 from typing import Dict, Any, List, Optional
+import threading
 import pandas as pd
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+
+# Satu Session per proses: koneksi keep-alive dipakai ulang antar request/rerun
+HTTP_POOL_SIZE = 32
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Session requests bersama dengan connection pool (thread-safe untuk dibuat sekali)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def request_json(
+    url: str, payload: Dict[str, Any], timeout: float = 10.0
+) -> Dict[str, Any]:
+    """POST JSON lewat session bersama; status non-2xx memicu exception."""
+    r = get_session().post(url, json=payload, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
+
 
 def post_json(url: str, payload: Dict[str, Any], timeout: float = 10.0) -> Optional[Dict[str, Any]]:
     """
@@ -9,7 +42,7 @@ def post_json(url: str, payload: Dict[str, Any], timeout: float = 10.0) -> Optio
     Menampilkan warning di UI jika gagal.
     """
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = get_session().post(url, json=payload, timeout=timeout)
         if r.status_code == 200:
             return r.json()
         else:
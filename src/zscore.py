@@ -0,0 +1,165 @@
+# StuntLytics/src/zscore.py
+# Z-score antropometri WHO (metode LMS), tervektorisasi penuh dengan NumPy.
+#
+#   z = ((X / M) ** L - 1) / (L * S)      (L != 0)
+#   z = ln(X / M) / S                     (L == 0)
+#
+# L, M, S diinterpolasi linear antar bulan dari tabel data/who/*.csv sehingga usia
+# pecahan (mis. dari tanggal lahir) tetap akurat. Untuk BB/U, |z| > 3 dihitung
+# ulang dengan prosedur "restricted" WHO (jarak SD di luar ±3 SD).
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+WHO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "who")
+MAX_AGE_MONTHS = 60
+DAYS_PER_MONTH = 30.4375
+
+# indikator -> (file tabel, pakai koreksi |z| > 3)
+INDICATORS = {
+    "lhfa": ("lhfa.csv", False),  # Panjang/Tinggi Badan menurut Umur (TB/U)
+    "wfa": ("wfa.csv", True),  # Berat Badan menurut Umur (BB/U)
+}
+
+# Kategori TB/U (Permenkes No. 2 Tahun 2020): < -3, -3 s.d. < -2, -2 s.d. +3, > +3
+HFA_LABELS = ["Sangat Pendek", "Pendek", "Normal", "Tinggi"]
+STUNTING_CUTOFF = -2.0
+
+_SEX_MAP = {
+    "1": 1,
+    "l": 1,
+    "laki-laki": 1,
+    "laki laki": 1,
+    "lk": 1,
+    "m": 1,
+    "male": 1,
+    "2": 2,
+    "p": 2,
+    "perempuan": 2,
+    "pr": 2,
+    "f": 2,
+    "female": 2,
+}
+
+
+@lru_cache(maxsize=None)
+def load_table(indicator: str, who_dir: str = WHO_DIR) -> Dict[str, np.ndarray]:
+    """
+    Tabel LMS sebagai array (2, 61): baris = jenis kelamin (1/2), kolom = bulan 0..60.
+    Hanya dibaca sekali per proses.
+    """
+    filename, _ = INDICATORS[indicator]
+    df = pd.read_csv(os.path.join(who_dir, filename))
+    table = {}
+    for col in ("L", "M", "S"):
+        grid = np.full((2, MAX_AGE_MONTHS + 1), np.nan)
+        grid[df["sex"].to_numpy() - 1, df["month"].to_numpy()] = df[col].to_numpy()
+        if np.isnan(grid).any():
+            raise ValueError(
+                f"Tabel {filename} tidak lengkap untuk bulan 0..{MAX_AGE_MONTHS}"
+            )
+        table[col] = grid
+    return table
+
+
+def normalize_sex(values) -> np.ndarray:
+    """'L'/'Laki-laki'/1 -> 1, 'P'/'Perempuan'/2 -> 2, lainnya -> 0 (tidak valid)."""
+    s = (
+        pd.Series(np.asarray(values, dtype=object))
+        .astype("string")
+        .str.strip()
+        .str.lower()
+    )
+    s = s.str.replace(r"\.0$", "", regex=True)
+    return s.map(_SEX_MAP).fillna(0).to_numpy(dtype=np.int8)
+
+
+def _lms_at(
+    table: Dict[str, np.ndarray], sex: np.ndarray, age: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Interpolasi linear L, M, S pada usia (bulan, pecahan) per baris."""
+    lower = np.minimum(age.astype(np.intp), MAX_AGE_MONTHS - 1)
+    frac = age - lower
+    # Satu indeks datar dipakai bersama untuk L, M dan S
+    flat = (sex.astype(np.intp) - 1) * (MAX_AGE_MONTHS + 1) + lower
+    out = []
+    for col in ("L", "M", "S"):
+        grid = table[col].ravel()
+        lo = grid.take(flat)
+        out.append(lo + (grid.take(flat + 1) - lo) * frac)
+    return out[0], out[1], out[2]
+
+
+def compute(indicator: str, measurement, age_months, sex) -> np.ndarray:
+    """
+    Z-score vektor untuk satu indikator. `sex` berupa kode 1/2 (lihat normalize_sex).
+    Baris dengan usia di luar 0–60 bulan, jenis kelamin tidak valid, atau
+    pengukuran kosong/<= 0 menghasilkan NaN.
+    """
+    _, restricted = INDICATORS[indicator]
+    x = np.asarray(measurement, dtype=np.float64)
+    age = np.asarray(age_months, dtype=np.float64)
+    sex = np.asarray(sex)
+    valid = (age >= 0) & (age <= MAX_AGE_MONTHS) & ((sex == 1) | (sex == 2)) & (x > 0)
+    z = np.full(x.shape, np.nan)
+    if not valid.any():
+        return z
+
+    x, age, sex = x[valid], age[valid], sex[valid]
+    L, M, S = _lms_at(load_table(indicator), sex, age)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zv = np.where(L == 0, np.log(x / M) / S, (np.power(x / M, L) - 1.0) / (L * S))
+        if restricted:
+            # Prosedur WHO: di luar ±3 SD, jarak dihitung dengan selisih SD2-SD3
+            def sd(k):
+                return M * np.power(1.0 + L * S * k, 1.0 / L)
+
+            sd3p, sd3n = sd(3.0), sd(-3.0)
+            zv = np.where(zv > 3, 3.0 + (x - sd3p) / (sd3p - sd(2.0)), zv)
+            zv = np.where(zv < -3, -3.0 + (x - sd3n) / (sd(-2.0) - sd3n), zv)
+    z[valid] = zv
+    return z
+
+
+def height_for_age(height_cm, age_months, sex) -> np.ndarray:
+    """Z-score TB/U (WHO lhfa)."""
+    return compute("lhfa", height_cm, age_months, sex)
+
+
+def weight_for_age(weight_kg, age_months, sex) -> np.ndarray:
+    """Z-score BB/U (WHO wfa)."""
+    return compute("wfa", weight_kg, age_months, sex)
+
+
+def classify_hfa(z: np.ndarray) -> np.ndarray:
+    """Kategori TB/U; NaN -> string kosong."""
+    z = np.asarray(z, dtype=np.float64)
+    conditions = [z < -3.0, z < -2.0, z <= 3.0, z > 3.0]
+    return np.select(conditions, HFA_LABELS, default="")
+
+
+def add_zscores(
+    df: pd.DataFrame,
+    age_col: str,
+    sex_col: str,
+    height_col: Optional[str] = None,
+    weight_col: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Menambahkan kolom `zscore_tb_u`, `kategori_tb_u` dan/atau `zscore_bb_u`
+    ke salinan `df`. Kolom pengukuran yang tidak ada dilewati.
+    """
+    out = df.copy()
+    age = pd.to_numeric(df[age_col], errors="coerce").to_numpy()
+    sex = normalize_sex(df[sex_col])
+    if height_col and height_col in df:
+        z = height_for_age(pd.to_numeric(df[height_col], errors="coerce"), age, sex)
+        out["zscore_tb_u"] = np.round(z, 2)
+        out["kategori_tb_u"] = classify_hfa(z)
+    if weight_col and weight_col in df:
+        z = weight_for_age(pd.to_numeric(df[weight_col], errors="coerce"), age, sex)
+        out["zscore_bb_u"] = np.round(z, 2)
+    return out